@@ -0,0 +1,102 @@
+"""
+Compara os backends de reamostragem de menezcale_backends em lotes de
+imagens do mesmo tamanho: Pillow em loop, Pillow em pool de threads (o que
+o apply_downscale_batch faz) e NumPy empilhado. Pesos de Lanczos já em
+cache (quente).
+
+Uso:
+    python benchmarks/bench_backends.py [--sizes 1024 2048] [--factors 2 4] [--batch 1 8]
+                                        [--method Lanczos]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import menezcale_backends  # noqa: E402
+from quality import synthetic_image  # noqa: E402
+
+RESAMPLE = {"Lanczos": Image.Resampling.LANCZOS, "Bicubic": Image.Resampling.BICUBIC}
+
+
+def _median_time(fn, repeat: int) -> float:
+    fn()  # aquecimento (pesos em cache, threads do pool criadas)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def _max_diff(images, reference) -> int:
+    return max(
+        int(np.abs(np.asarray(a, dtype=np.int16) - np.asarray(b, dtype=np.int16)).max())
+        for a, b in zip(images, reference)
+    )
+
+
+def bench(images, target, method: str, repeat: int, workers: int) -> dict:
+    resample = RESAMPLE[method]
+    count = len(images)
+    row = {}
+
+    reference = [img.resize(target, resample) for img in images]
+    row["pillow loop"] = _median_time(lambda: [img.resize(target, resample) for img in images], repeat)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        row["pillow pool"] = _median_time(
+            lambda: list(executor.map(lambda img: img.resize(target, resample), images)), repeat
+        )
+
+    numpy_backend = menezcale_backends.get("numpy")
+    if numpy_backend.available():
+        row["numpy"] = _median_time(lambda: numpy_backend.resize_stack(images, target, method), repeat)
+        row["numpy Δ"] = _max_diff(numpy_backend.resize_stack(images, target, method), reference)
+
+    return {key: value if key.endswith("Δ") else value * 1000 / count for key, value in row.items()}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1024, 2048])
+    parser.add_argument("--factors", nargs="+", type=int, default=[2, 4])
+    parser.add_argument("--batch", nargs="+", type=int, default=[1, 8])
+    parser.add_argument("--method", choices=sorted(RESAMPLE), default="Lanczos")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+
+    available = [backend.name for backend in menezcale_backends.BACKENDS.values() if backend.available()]
+    print(
+        f"{args.method}, {args.workers} threads no pool do Pillow, backends disponíveis: {', '.join(available)}; "
+        "tempos em ms por imagem, Δ = diferença máxima para o Pillow (0-255)"
+    )
+    header = None
+    for size in args.sizes:
+        for batch in args.batch:
+            images = [synthetic_image(size, size, seed=i) for i in range(batch)]
+            for factor in args.factors:
+                target = (size // factor, size // factor)
+                row = bench(images, target, args.method, args.repeat, args.workers)
+                if header is None:
+                    header = list(row)
+                    print(f"{'origem':>11} {'fator':>5} {'lote':>4} " + " ".join(f"{key:>11}" for key in header))
+                cells = " ".join(
+                    f"{row[key]:>11}" if key.endswith("Δ") else f"{row[key]:>11.1f}" for key in header
+                )
+                print(f"{size}x{size:<6} {factor:>5} {batch:>4} {cells}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
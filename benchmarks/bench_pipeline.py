@@ -0,0 +1,236 @@
+"""
+Suíte de benchmark reprodutível do pipeline Menezcale fora do WebUI.
+
+Usa o stand-in de `modules` em benchmarks/stubs (opts, sd_upscalers com um
+"FSRCNN" bicúbico, face_restoration) e mede, numa grade de tamanhos base e
+fatores de redução:
+
+- detect_original_size (frio = cache de metadados vazio, quente = em cache)
+- compute_target_size
+- apply_downscale para cada método fixo do dropdown
+- o caminho do botão "Aplicar Downscale" (MenezcaleScript._render_full dentro
+  de _run_job, com o cache de resultados vazio a cada amostra)
+
+"Auto" sai em linhas próprias (auto_*): a calibração roda uma vez antes da
+suíte, é medida à parte (stage "calibrate") e fica num menezcale_cache.json
+temporário, nunca no da extensão.
+
+O resultado vai para JSON para comparar entre versões:
+
+    python benchmarks/bench_pipeline.py --output bench.json
+    python benchmarks/bench_pipeline.py --compare bench.json --threshold 0.15
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+# Stubs primeiro: nunca usar um `modules` real que esteja no sys.path.
+sys.path.insert(0, os.path.join(BENCH_DIR, "stubs"))
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+sys.path.insert(0, BENCH_DIR)
+
+import PIL  # noqa: E402
+from PIL import Image  # noqa: E402
+
+import menezcale_autoselect  # noqa: E402
+import menezcale_core  # noqa: E402
+import menezcale_telemetry  # noqa: E402
+from menezcale_core import (  # noqa: E402
+    DOWNSCALE_METHODS,
+    apply_downscale,
+    compute_target_size,
+    detect_original_size,
+    is_auto_method,
+)
+from menezcale_result_cache import results as result_cache  # noqa: E402
+from menezcale_script import MenezcaleScript  # noqa: E402
+from quality import synthetic_image  # noqa: E402
+
+DEFAULT_BASE_SIZES = ["512x512", "832x1216", "1024x1024"]
+DEFAULT_FACTORS = [2, 4]
+
+
+def _parse_size(text: str):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+def _measure(fn, repeat: int, setup=None) -> dict:
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+    return {
+        "median_ms": statistics.median(timings) * 1000,
+        "min_ms": min(timings) * 1000,
+        "repeat": repeat,
+    }
+
+
+def _hires_image(base_size, factor: int) -> Image.Image:
+    width, height = base_size
+    image = synthetic_image(width * factor, height * factor)
+    image.info["parameters"] = (
+        "a photo of a cat, highly detailed\n"
+        "Negative prompt: blurry\n"
+        f"Steps: 25, Sampler: DPM++ 2M, CFG scale: 7, Seed: 1, Size: {width}x{height}, "
+        f"Denoising strength: 0.4, Hires upscale: {factor}, Hires upscaler: 4x-UltraSharp"
+    )
+    return image
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def run_suite(base_sizes, factors, repeat: int) -> dict:
+    menezcale_telemetry.reset()
+    results = []
+    script = MenezcaleScript()
+    fixed_methods = [method for method in DOWNSCALE_METHODS if not is_auto_method(method)]
+    auto_methods = [method for method in DOWNSCALE_METHODS if is_auto_method(method)]
+
+    def add(case, stage, method, stats):
+        results.append({"case": case, "stage": stage, "method": method, **stats})
+
+    def render_full(method):
+        return script._run_job(lambda: script._render_full(image, method, 1.0, False, True, 0, 0))
+
+    if auto_methods:
+        # Uma amostra só: é o custo que o primeiro "Auto" paga sem cache em disco.
+        add("-", "calibrate", None, _measure(menezcale_autoselect.get_calibration, 1))
+
+    for base_size in base_sizes:
+        for factor in factors:
+            image = _hires_image(base_size, factor)
+            case = f"{base_size[0]}x{base_size[1]}/{factor}x"
+            print(f"[bench] {case} (entrada {image.width}x{image.height})", file=sys.stderr)
+
+            detect = lambda: detect_original_size(None, image, True, 0, 0)  # noqa: E731
+            add(case, "detect_original_size_cold", None,
+                _measure(detect, repeat, setup=menezcale_core._metadata_cache.clear))
+            add(case, "detect_original_size_warm", None, _measure(detect, repeat))
+
+            original_size = detect()
+            add(case, "compute_target_size", None,
+                _measure(lambda: compute_target_size(image, original_size, 1.0, False), repeat))
+
+            for method in fixed_methods:
+                add(case, "apply_downscale", method,
+                    _measure(lambda: apply_downscale(image, method, original_size, dict(image.info)), repeat))
+                add(case, "render_full", method,
+                    _measure(lambda: render_full(method), repeat, setup=result_cache.clear))
+
+            # Auto com a calibração já carregada: só a escolha + o método escolhido.
+            for method in auto_methods:
+                chosen = menezcale_core.resolve_down_method(method, image.size, original_size)
+                label = f"{method} -> {chosen}"
+                add(case, "auto_apply_downscale", label,
+                    _measure(lambda: apply_downscale(image, method, original_size, dict(image.info)), repeat))
+                add(case, "auto_render_full", label,
+                    _measure(lambda: render_full(method), repeat, setup=result_cache.clear))
+
+    return {
+        "meta": {
+            "revision": _git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "pillow": PIL.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": repeat,
+            "face_restoration_model": menezcale_core.get_opt("face_restoration_model", None),
+        },
+        "results": results,
+        "telemetry": menezcale_telemetry.snapshot(),
+    }
+
+
+def _key(row):
+    return row["case"], row["stage"], row["method"]
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> int:
+    previous = {_key(row): row for row in baseline.get("results", [])}
+    regressions = 0
+    for row in current["results"]:
+        old = previous.get(_key(row))
+        if not old or not old["median_ms"]:
+            continue
+        ratio = row["median_ms"] / old["median_ms"]
+        if ratio > 1.0 + threshold:
+            regressions += 1
+            flag = "REGRESSÃO"
+        elif ratio < 1.0 - threshold:
+            flag = "melhora"
+        else:
+            continue
+        print(
+            f"{flag:>10} {row['case']:<16} {row['stage']:<26} {row['method'] or '-':<50} "
+            f"{old['median_ms']:.1f} -> {row['median_ms']:.1f} ms ({ratio:.2f}x)"
+        )
+    print(f"{regressions} regressões acima de {threshold:.0%} em relação a {baseline['meta'].get('revision')}")
+    return 1 if regressions else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_BASE_SIZES, help="Tamanhos base WxH.")
+    parser.add_argument("--factors", nargs="+", type=int, default=DEFAULT_FACTORS)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Grava o resultado em JSON.")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparar.")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Variação relativa tolerada.")
+    parser.add_argument(
+        "--face-restore",
+        action="store_true",
+        help="Liga o face restoration do stub (mede o custo do encadeamento, não de um modelo real).",
+    )
+    args = parser.parse_args(argv)
+
+    if args.face_restore:
+        from modules import shared
+
+        shared.opts.face_restoration_model = "stub"
+
+    with tempfile.TemporaryDirectory(prefix="menezcale-bench-") as cache_dir:
+        # Calibração do Auto e demais entradas de cache ficam fora da pasta da extensão.
+        menezcale_core.CACHE_PATH = os.path.join(cache_dir, "menezcale_cache.json")
+        report = run_suite([_parse_size(size) for size in args.sizes], args.factors, args.repeat)
+
+    for row in report["results"]:
+        print(f"{row['case']:<16} {row['stage']:<26} {row['method'] or '-':<50} {row['median_ms']:>9.2f} ms")
+    print(menezcale_telemetry.format_summary(), file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fp:
+            json.dump(report, fp, indent=2, ensure_ascii=False)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as fp:
+            return compare(report, json.load(fp), args.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
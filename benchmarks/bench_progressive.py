@@ -0,0 +1,84 @@
+"""
+Mede o modo Progressivo (reduce + Lanczos final) contra o Lanczos puro:
+tempo, speedup e diferença de qualidade (PSNR/SSIM tendo o Lanczos puro
+como referência).
+
+Uso:
+    python benchmarks/bench_progressive.py [--sizes 2048 4096] [--factors 2 4 8] [IMAGENS...]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import time
+
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from menezcale_core import downscale_progressive  # noqa: E402
+from quality import psnr, ssim, synthetic_image  # noqa: E402
+
+
+def _time(fn, repeat: int):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def bench(image: Image.Image, factor: int, repeat: int) -> dict:
+    target = (max(1, image.width // factor), max(1, image.height // factor))
+    lanczos_s, reference = _time(
+        lambda: image.resize(target, resample=Image.Resampling.LANCZOS), repeat
+    )
+    progressive_s, candidate = _time(
+        lambda: downscale_progressive(image, target[0], target[1]), repeat
+    )
+    return {
+        "source": f"{image.width}x{image.height}",
+        "factor": factor,
+        "lanczos_ms": lanczos_s * 1000,
+        "progressive_ms": progressive_s * 1000,
+        "speedup": lanczos_s / progressive_s if progressive_s else float("inf"),
+        "psnr_db": psnr(reference, candidate),
+        "ssim": ssim(reference, candidate),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="*", help="Imagens reais (padrão: imagens sintéticas).")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[2048, 4096])
+    parser.add_argument("--factors", nargs="+", type=int, default=[2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    if args.images:
+        sources = [Image.open(path).convert("RGB") for path in args.images]
+    else:
+        sources = [synthetic_image(size, size) for size in args.sizes]
+
+    print(f"{'origem':>11} {'fator':>5} {'lanczos ms':>11} {'progr. ms':>10} {'speedup':>8} {'PSNR dB':>8} {'SSIM':>7}")
+    for image in sources:
+        for factor in args.factors:
+            row = bench(image, factor, args.repeat)
+            print(
+                f"{row['source']:>11} {row['factor']:>5} {row['lanczos_ms']:>11.1f} "
+                f"{row['progressive_ms']:>10.1f} {row['speedup']:>7.2f}x "
+                f"{row['psnr_db']:>8.2f} {row['ssim']:>7.4f}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
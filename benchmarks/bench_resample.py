@@ -0,0 +1,93 @@
+"""
+Compara o motor NumPy (pesos em cache + pilha) com o Pillow para lotes de
+imagens do mesmo tamanho: Pillow em loop, Pillow em pool de threads e
+NumPy empilhado (frio = inclui cálculo dos pesos; quente = pesos em cache).
+
+Uso:
+    python benchmarks/bench_resample.py [--sizes 1024 2048] [--factors 2 4] [--batch 1 8]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import menezcale_resample  # noqa: E402
+from quality import synthetic_image  # noqa: E402
+
+RESAMPLE = {"Lanczos": Image.Resampling.LANCZOS, "Bicubic": Image.Resampling.BICUBIC}
+
+
+def _median_time(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def bench(images, target, method: str, repeat: int, workers: int) -> dict:
+    resample = RESAMPLE[method]
+
+    pillow_loop = _median_time(lambda: [img.resize(target, resample) for img in images], repeat)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pillow_pool = _median_time(
+            lambda: list(executor.map(lambda img: img.resize(target, resample), images)), repeat
+        )
+
+    menezcale_resample.filter_weights.cache_clear()
+    start = time.perf_counter()
+    numpy_out = menezcale_resample.resize_stack(images, target, method)
+    numpy_cold = time.perf_counter() - start
+    numpy_warm = _median_time(lambda: menezcale_resample.resize_stack(images, target, method), repeat)
+
+    reference = np.asarray(images[0].resize(target, resample), dtype=np.int16)
+    max_diff = int(np.abs(np.asarray(numpy_out[0], dtype=np.int16) - reference).max())
+    count = len(images)
+    return {
+        "pillow_loop_ms": pillow_loop * 1000 / count,
+        "pillow_pool_ms": pillow_pool * 1000 / count,
+        "numpy_cold_ms": numpy_cold * 1000 / count,
+        "numpy_warm_ms": numpy_warm * 1000 / count,
+        "max_diff": max_diff,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1024, 2048])
+    parser.add_argument("--factors", nargs="+", type=int, default=[2, 4])
+    parser.add_argument("--batch", nargs="+", type=int, default=[1, 8])
+    parser.add_argument("--method", choices=sorted(RESAMPLE), default="Lanczos")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+
+    print(f"{args.method}, {args.workers} threads no pool; tempos em ms por imagem")
+    print(f"{'origem':>11} {'fator':>5} {'lote':>4} {'pil loop':>9} {'pil pool':>9} {'np frio':>8} {'np quente':>9} {'Δmax':>5}")
+    for size in args.sizes:
+        for batch in args.batch:
+            images = [synthetic_image(size, size, seed=i) for i in range(batch)]
+            for factor in args.factors:
+                target = (size // factor, size // factor)
+                row = bench(images, target, args.method, args.repeat, args.workers)
+                print(
+                    f"{size}x{size:<6} {factor:>5} {batch:>4} {row['pillow_loop_ms']:>9.1f} "
+                    f"{row['pillow_pool_ms']:>9.1f} {row['numpy_cold_ms']:>8.1f} "
+                    f"{row['numpy_warm_ms']:>9.1f} {row['max_diff']:>5}"
+                )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,4 @@
+"""
+Stand-in de `gradio` para importar menezcale_script fora do WebUI: o
+benchmark chama os métodos do script direto e nunca monta a UI.
+"""
@@ -0,0 +1,4 @@
+"""
+Stand-in mínimo do pacote `modules` do SD-WebUI/Forge para rodar o
+Menezcale fora do WebUI (benchmarks). Só implementa o que a extensão usa.
+"""
@@ -0,0 +1,8 @@
+from modules import shared
+
+
+def restore_faces(np_image):
+    """Sem modelo: devolve uma cópia, só para exercitar o fluxo."""
+    if not shared.opts.face_restoration_model:
+        return np_image
+    return np_image.copy()
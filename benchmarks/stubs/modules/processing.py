@@ -0,0 +1,17 @@
+class StableDiffusionProcessing:
+    def __init__(self, width=512, height=512, enable_hr=True, hr_scale=2.0, hr_resize_x=0, hr_resize_y=0, batch_size=1):
+        self.width = width
+        self.height = height
+        self.enable_hr = enable_hr
+        self.hr_scale = hr_scale
+        self.hr_resize_x = hr_resize_x
+        self.hr_resize_y = hr_resize_y
+        self.batch_size = batch_size
+
+
+class Processed:
+    def __init__(self, p, images, index_of_first_image=0):
+        self.images = images
+        self.index_of_first_image = index_of_first_image
+        self.width = p.width
+        self.height = p.height
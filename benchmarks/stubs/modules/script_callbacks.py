@@ -0,0 +1,9 @@
+callbacks = {"ui_settings": [], "app_started": []}
+
+
+def on_ui_settings(callback):
+    callbacks["ui_settings"].append(callback)
+
+
+def on_app_started(callback):
+    callbacks["app_started"].append(callback)
@@ -0,0 +1,6 @@
+AlwaysVisible = object()
+
+
+class Script:
+    def title(self):
+        return ""
@@ -0,0 +1,41 @@
+from types import SimpleNamespace
+
+from PIL import Image
+
+
+class OptionInfo:
+    def __init__(self, default=None, label="", component=None, component_args=None, section=None, **kwargs):
+        self.default = default
+        self.label = label
+        self.component = component
+        self.component_args = component_args
+        self.section = section
+
+
+class Options(SimpleNamespace):
+    def add_option(self, key, info):
+        if not hasattr(self, key):
+            setattr(self, key, info.default)
+
+
+class _StubFsrcnnScaler:
+    """Faz o papel de um ESRGAN/FSRCNN x2: o "modelo" é um resize bicúbico."""
+
+    def load_model(self, path):
+        return SimpleNamespace(scale=2, path=path)
+
+    def do_upscale(self, img, path):
+        return img.resize((img.width * 2, img.height * 2), Image.Resampling.BICUBIC)
+
+
+opts = Options(
+    face_restoration_model=None,
+    ESRGAN_tile=192,
+    ESRGAN_tile_overlap=8,
+)
+state = SimpleNamespace(interrupted=False, skipped=False, job_count=0)
+sd_upscalers = [
+    SimpleNamespace(name="FSRCNN_x2", data_path="stub/FSRCNN_x2.pth", scaler=_StubFsrcnnScaler()),
+]
+# Flags de linha de comando que a extensão lê (--api, --nowebui, --api-auth).
+cmd_opts = SimpleNamespace(api=False, nowebui=False, api_auth=None)
@@ -0,0 +1,6 @@
+from PIL import Image
+
+
+def upscale_with_model(model, img, *, tile_size, tile_overlap=0, desc="tiled upscale"):
+    scale = getattr(model, "scale", 2)
+    return img.resize((img.width * scale, img.height * scale), Image.Resampling.BICUBIC)
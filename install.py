@@ -1,31 +1,87 @@
 """
-Instala dependências leves opcionais para a extensão Menezcale.
-Atualmente apenas sd-parsers é necessário para parsear metadados SD
-quando disponível. A instalação é resiliente para ambientes offline.
+Verifica as dependências leves opcionais da extensão Menezcale.
+Atualmente apenas sd-parsers, usado para parsear metadados SD quando
+disponível (sem ele o regex de fallback continua funcionando).
+
+Na inicialização do WebUI só se verifica se o módulo importa (nada de
+pip nem subprocesso); o resultado fica em menezcale_cache.json. Para
+instalar, rode uma vez, com o Python do WebUI:
+
+    python extensions/Menezcale/install.py --install
 """
 
+import importlib.util
+import json
+import os
 import subprocess
 import sys
+import time
+
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "menezcale_cache.json")
+OPTIONAL_PACKAGES = ["sd-parsers"]
+PIP_TIMEOUT_SECONDS = 120
 
 
-def ensure_package(pkg: str):
+def read_cache() -> dict:
     try:
-        __import__(pkg.replace("-", "_"))
-        print(f"[Menezcale] Dependência '{pkg}' já instalada.")
-        return
+        with open(CACHE_PATH, "r", encoding="utf-8") as fp:
+            data = json.load(fp)
+        return data if isinstance(data, dict) else {}
     except Exception:
-        pass
+        return {}
+
+
+def write_cache(key: str, available: bool):
+    data = read_cache()
+    data[key] = {
+        "available": available,
+        "python": sys.executable,
+        "checked_at": time.time(),
+    }
+    try:
+        with open(CACHE_PATH, "w", encoding="utf-8") as fp:
+            json.dump(data, fp, indent=2)
+    except Exception as err:
+        print(f"[Menezcale] Não foi possível gravar {CACHE_PATH}: {err}")
+
+
+def check_package(pkg: str) -> bool:
+    """Record whether `pkg` is importable (no import, no subprocess)."""
+    module_name = pkg.replace("-", "_")
+    available = importlib.util.find_spec(module_name) is not None
+    entry = read_cache().get(module_name) or {}
+    if entry.get("available") is not available or entry.get("python") != sys.executable:
+        write_cache(module_name, available)
+        if not available:
+            print(
+                f"[Menezcale] '{pkg}' não instalado (opcional). Para instalar: "
+                f"{sys.executable} {os.path.abspath(__file__)} --install"
+            )
+    return available
+
 
+def install_package(pkg: str) -> bool:
+    """Explicit user action: pip install `pkg` with the current interpreter."""
     try:
         print(f"[Menezcale] Instalando '{pkg}' via pip...")
-        subprocess.check_call([sys.executable, "-m", "pip", "install", pkg])
+        subprocess.check_call(
+            [sys.executable, "-m", "pip", "install", pkg],
+            timeout=PIP_TIMEOUT_SECONDS,
+        )
         print(f"[Menezcale] '{pkg}' instalada com sucesso.")
     except Exception as err:
         print(f"[Menezcale] Não foi possível instalar '{pkg}': {err}")
+    importlib.invalidate_caches()
+    return check_package(pkg)
 
 
-def main():
-    ensure_package("sd-parsers")
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    for pkg in OPTIONAL_PACKAGES:
+        if "--install" in argv:
+            install_package(pkg)
+        else:
+            check_package(pkg)
 
 
 if __name__ == "__main__":
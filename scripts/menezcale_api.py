@@ -0,0 +1,294 @@
+"""
+API HTTP do Menezcale, registrada no app do WebUI (on_app_started) só
+quando a API do WebUI está ligada (`--api` ou `--nowebui`), com a mesma
+autenticação HTTP Basic dela (`--api-auth usuario:senha,...`).
+
+    POST /menezcale/v1/downscale
+    {
+        "images": ["<PNG/JPEG/WebP em base64, com ou sem prefixo data:>"],
+        "paths": ["outputs/txt2img-images/2024-01-01/00001-123.png"],
+        "down_method": "Lanczos",
+        "use_auto_original": true,
+        "format": "PNG",
+        "save": false
+    }
+
+As imagens rodam em paralelo (pool de threads, no máximo 2x workers em
+voo) e a resposta é NDJSON em streaming: uma linha por imagem assim que
+ela termina (`index` aponta para a posição na requisição: primeiro
+`images`, depois `paths`) e uma linha final com `"done": true` e os
+totais. Com `save` o resultado é gravado na pasta do Menezcale e a linha
+traz `path` em vez da imagem.
+
+`timeout_s` é o prazo de cada imagem (padrão: "Configurações >
+Menezcale > Prazo por job"); estourado, a imagem sai em Bicubic e sem face
+restoration, com `"fallback": true`. Se o cliente desconectar, as imagens
+em andamento param na próxima etapa (`"status": "cancelled"`).
+
+`paths` só é aceito dentro das pastas de "Configurações > Menezcale >
+Pastas que a API pode ler". Face restoration (modelo compartilhado) roda
+uma imagem por vez.
+
+    GET /menezcale/v1/methods  -> métodos de downscale aceitos
+"""
+
+import base64
+import binascii
+import io
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from secrets import compare_digest
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPBasic, HTTPBasicCredentials
+from PIL import Image
+from pydantic import BaseModel, Field
+
+from menezcale_core import DOWNSCALE_METHODS, apply_downscale, get_opt, is_hires_allowed
+import menezcale_cancel
+import menezcale_pipeline
+import menezcale_save
+import menezcale_telemetry as telemetry
+
+try:
+    from modules import shared
+except Exception:
+    shared = None
+
+ROUTE_PREFIX = "/menezcale/v1"
+DEFAULT_PATH_ROOTS = "outputs"
+
+# Face restoration usa um modelo compartilhado (GPU): uma imagem por vez.
+_face_lock = threading.Lock()
+
+
+class DownscaleRequest(BaseModel):
+    images: List[str] = Field(default=[], description="Imagens em base64 (PNG guarda os metadados do WebUI).")
+    paths: List[str] = Field(default=[], description="Arquivos no servidor, dentro das pastas permitidas.")
+    down_method: str = Field(default="Lanczos", description="Lanczos, FSRCNN, Progressivo ou Bicubic.")
+    down_factor: float = Field(
+        default=0.5, gt=0, le=1, description="Fração do tamanho atual (0-1], usada com use_manual_down."
+    )
+    use_manual_down: bool = False
+    use_auto_original: bool = Field(default=True, description="Voltar ao tamanho base detectado nos metadados.")
+    manual_width: int = 0
+    manual_height: int = 0
+    require_hires: bool = Field(default=True, description="Ignorar imagens sem Hires Fix nos metadados.")
+    format: str = Field(default="PNG", description="PNG, WEBP ou JPEG.")
+    quality: int = menezcale_save.DEFAULT_QUALITY
+    save: bool = Field(default=False, description="Gravar na pasta do Menezcale e devolver o caminho.")
+    workers: int = Field(default=0, description="Imagens em paralelo (0 = número de núcleos).")
+    timeout_s: Optional[float] = Field(
+        default=None,
+        description="Prazo por imagem em segundos (vazio = configuração do Menezcale, 0 = sem limite); "
+        "estourado, a imagem sai em Bicubic e sem face restoration (`fallback: true`).",
+    )
+
+
+def resolve_method(name: str) -> str:
+    """Full dropdown label for `name` (case-insensitive prefix, e.g. "lanczos")."""
+    wanted = str(name or "").strip().lower()
+    for method in DOWNSCALE_METHODS:
+        if wanted and method.lower().startswith(wanted):
+            return method
+    raise HTTPException(status_code=422, detail=f"down_method inválido: {name!r}. Use um de {DOWNSCALE_METHODS}.")
+
+
+def allowed_roots() -> List[str]:
+    roots = str(get_opt("menezcale_api_path_roots", DEFAULT_PATH_ROOTS) or "")
+    return [os.path.realpath(root.strip()) for root in roots.split(";") if root.strip()]
+
+
+def check_path(path: str) -> str:
+    """Real path of `path` if it lies inside an allowed root; ValueError otherwise."""
+    real = os.path.realpath(path)
+    for root in allowed_roots():
+        if os.path.commonpath([root, real]) == root:
+            return real
+    raise ValueError("fora das pastas permitidas")
+
+
+def decode_image(data: str) -> Image.Image:
+    if data.startswith("data:"):
+        data = data.split(",", 1)[-1]
+    try:
+        raw = base64.b64decode(data, validate=True)
+    except (binascii.Error, ValueError) as err:
+        raise ValueError(f"base64 inválido ({err})") from None
+    image = Image.open(io.BytesIO(raw))
+    image.load()
+    return image
+
+
+def _load(kind: str, source: str) -> Image.Image:
+    if kind == "image":
+        return decode_image(source)
+    with Image.open(check_path(source)) as image:
+        image.load()
+        return image
+
+
+def _process_one(request: DownscaleRequest, down_method: str, index: int, kind: str, source: str) -> dict:
+    started = time.perf_counter()
+    entry = {"index": index, "source": source if kind == "path" else f"images[{index}]"}
+    timeout_s = request.timeout_s if request.timeout_s is not None else get_opt("menezcale_job_timeout_s", 0)
+    try:
+        with menezcale_cancel.job(timeout_s) as job:
+            _run_one(request, down_method, index, kind, source, entry)
+        if job.degraded:
+            entry["fallback"] = True
+    except menezcale_cancel.JobCancelled:
+        telemetry.incr("api_cancelled")
+        entry.update(status="cancelled")
+    except Exception as err:
+        telemetry.incr("api_failed")
+        entry.update(status="failed", error=str(err))
+    entry["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return entry
+
+
+def _run_one(request: DownscaleRequest, down_method: str, index: int, kind: str, source: str, entry: dict) -> None:
+    image = _load(kind, source)
+    if request.require_hires and not is_hires_allowed(image):
+        entry.update(status="skipped", detail="sem Hires Fix nos metadados")
+        return
+
+    original_info, original_size, target_size = menezcale_pipeline.prepare_target(
+        image,
+        None,
+        request.down_factor,
+        request.use_manual_down,
+        request.use_auto_original,
+        request.manual_width,
+        request.manual_height,
+    )
+    result = apply_downscale(image, down_method, target_size, original_info)
+    with _face_lock:
+        result = menezcale_pipeline.finish_image(
+            result, original_info, original_size, target_size, down_method, request.use_manual_down
+        )
+
+    fmt = menezcale_save.normalize_format(request.format)
+    entry.update(status="processed", width=result.width, height=result.height, format=fmt)
+    if request.save:
+        if kind == "path":
+            basename = os.path.splitext(os.path.basename(source))[0] + "-menezcale"
+        else:
+            basename = f"{menezcale_save.default_basename()}-{index}"
+        entry["path"] = menezcale_save.save_image(
+            result,
+            get_opt("menezcale_save_dir", "") or os.path.join("outputs", "menezcale"),
+            basename,
+            fmt=fmt,
+            compress_level=get_opt("menezcale_png_compress_level", menezcale_save.DEFAULT_COMPRESS_LEVEL),
+            quality=request.quality,
+        )
+    else:
+        buffer = io.BytesIO()
+        with telemetry.stage("encode_api", format=fmt):
+            menezcale_save.encode(
+                result,
+                buffer,
+                fmt,
+                result.info,
+                get_opt("menezcale_png_compress_level", menezcale_save.DEFAULT_COMPRESS_LEVEL),
+                request.quality,
+            )
+        entry["image"] = base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def iter_results(request: DownscaleRequest) -> Iterator[bytes]:
+    """Run the batch and yield one NDJSON line per image as it finishes, then a summary line."""
+    down_method = resolve_method(request.down_method)
+    items: List[Tuple[str, str]] = [("image", data) for data in request.images]
+    items += [("path", path) for path in request.paths]
+    workers = max(1, min(request.workers or os.cpu_count() or 1, len(items) or 1))
+    totals = {"processed": 0, "skipped": 0, "failed": 0, "cancelled": 0}
+    # Um job para a requisição inteira: cancelado se o cliente desconectar.
+    request_job = menezcale_cancel.Job()
+    process_one = menezcale_cancel.bind(_process_one, request_job)
+    started = time.perf_counter()
+    telemetry.debug(f"API: lote de {len(items)} imagens com {workers} threads ({down_method})")
+
+    def finish(future) -> bytes:
+        entry = future.result()
+        totals[entry["status"]] += 1
+        return (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="menezcale-api")
+    in_flight = set()
+    try:
+        for index, (kind, source) in enumerate(items):
+            if len(in_flight) >= workers * 2:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                yield from map(finish, done)
+            in_flight.add(executor.submit(process_one, request, down_method, index, kind, source))
+        while in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            yield from map(finish, done)
+    finally:
+        # Cliente desconectado: o que não começou é descartado e o que está
+        # rodando para na próxima etapa.
+        request_job.cancel()
+        for future in in_flight:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+    telemetry.incr("api_images", len(items))
+    summary = {"done": True, **totals, "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}
+    yield (json.dumps(summary) + "\n").encode("utf-8")
+
+
+def downscale(request: DownscaleRequest):
+    if not request.images and not request.paths:
+        raise HTTPException(status_code=422, detail="Envie ao menos uma imagem em `images` ou `paths`.")
+    resolve_method(request.down_method)
+    return StreamingResponse(iter_results(request), media_type="application/x-ndjson")
+
+
+def methods() -> dict:
+    return {"methods": list(DOWNSCALE_METHODS)}
+
+
+def api_enabled() -> bool:
+    """Same switch as the WebUI's own API: --api, or --nowebui (API only)."""
+    cmd_opts = getattr(shared, "cmd_opts", None)
+    return bool(getattr(cmd_opts, "api", False) or getattr(cmd_opts, "nowebui", False))
+
+
+def api_credentials() -> Dict[str, str]:
+    """user -> password from --api-auth ("user:password,user2:password2"), like modules.api."""
+    credentials = {}
+    for entry in str(getattr(getattr(shared, "cmd_opts", None), "api_auth", None) or "").split(","):
+        user, sep, password = entry.strip().partition(":")
+        if sep:
+            credentials[user] = password
+    return credentials
+
+
+def _auth_dependency(credentials: Dict[str, str]):
+    def auth(given: HTTPBasicCredentials = Depends(HTTPBasic())) -> bool:
+        expected = credentials.get(given.username)
+        if expected is not None and compare_digest(given.password, expected):
+            return True
+        raise HTTPException(
+            status_code=401, detail="Incorrect username or password", headers={"WWW-Authenticate": "Basic"}
+        )
+
+    return auth
+
+
+def register(app: FastAPI) -> None:
+    """Add the Menezcale routes to the WebUI app (once per app), only with the WebUI API enabled."""
+    if not api_enabled() or getattr(app.state, "menezcale_api", False):
+        return
+    app.state.menezcale_api = True
+    credentials = api_credentials()
+    dependencies = [Depends(_auth_dependency(credentials))] if credentials else None
+    app.add_api_route(f"{ROUTE_PREFIX}/downscale", downscale, methods=["POST"], dependencies=dependencies)
+    app.add_api_route(f"{ROUTE_PREFIX}/methods", methods, methods=["GET"], dependencies=dependencies)
@@ -0,0 +1,220 @@
+"""
+Método "Auto": melhor qualidade que cabe no orçamento de tempo.
+
+Uma calibração única mede, nesta máquina, cada método de apply_downscale
+em imagens sintéticas de 512x512 e 1024x1024 reduzidas 2x e 4x, e ajusta
+por mínimos quadrados um modelo linear de custo:
+
+    ms = ms_por_MP_origem * MP_origem + ms_por_MP_saida * MP_saida
+
+Com uma origem só, os dois termos não se separam; com duas, se o ajuste
+ainda der custo de origem zero (ruído de medição), vale só o custo por MP
+de origem (ms medido / MP de origem).
+
+O resultado fica no menezcale_cache.json (chave "calibration") e é refeito
+quando o ambiente muda (Python, Pillow, núcleos, motor de reamostragem,
+modelo FSRCNN). O ambiente é calculado uma vez por motor escolhido e
+refeito quando o modelo FSRCNN resolvido muda. Para cada imagem, choose_method percorre os métodos do
+melhor para o pior em qualidade e devolve o primeiro cuja previsão cabe no
+orçamento ("Configurações > Menezcale"); se nenhum couber, o mais rápido.
+"""
+
+import os
+import platform
+import statistics
+import sys
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import PIL
+from PIL import Image
+
+import menezcale_cancel
+import menezcale_core
+import menezcale_telemetry as telemetry
+
+DEFAULT_BUDGET_MS = 1000
+CALIBRATION_SIDES = (512, 1024)
+CALIBRATION_FACTORS = (2, 4)
+CALIBRATION_REPEAT = 3
+CACHE_KEY = "calibration"
+# Do melhor para o pior em qualidade (Progressivo ~41 dB do Lanczos em 4x).
+QUALITY_ORDER = ("fsrcnn", "lanczos", "progressiv", "bicubic")
+
+_calibration: Optional[dict] = None
+_calibration_lock = threading.Lock()
+# Ambiente por motor de reamostragem; invalidate_environment() limpa (modelo FSRCNN trocado).
+_environments: Dict[str, dict] = {}
+
+
+def _method_for(key: str) -> Optional[str]:
+    for method in menezcale_core.DOWNSCALE_METHODS:
+        if key in method.lower():
+            return method
+    return None
+
+
+def _environment() -> dict:
+    """
+    Fingerprint the calibration is valid for. Cached per resample engine
+    (read from the settings on every call): the FSRCNN lookup scans the
+    upscaler list, and predict_ms runs once per method per image.
+    """
+    engine = str(menezcale_core.get_opt("menezcale_resample_engine", "Pillow"))
+    environment = _environments.get(engine)
+    if environment is None:
+        upscaler = menezcale_core.find_fsrcnn_upscaler()
+        environment = {
+            "python": sys.version.split()[0],
+            "pillow": PIL.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "engine": engine,
+            "fsrcnn": menezcale_core._upscaler_model_path(upscaler) if upscaler is not None else None,
+        }
+        _environments[engine] = environment
+    return environment
+
+
+def invalidate_environment() -> None:
+    """Recompute the environment on the next call (the FSRCNN model changed)."""
+    _environments.clear()
+
+
+def _calibration_image(side: int) -> Image.Image:
+    noise = Image.effect_noise((side, side), 48)
+    gradient = Image.linear_gradient("L").resize((side, side))
+    return Image.merge("RGB", (noise, gradient, gradient.transpose(Image.Transpose.ROTATE_90)))
+
+
+def _measure_ms(method: str, image: Image.Image, target: Tuple[int, int]) -> float:
+    menezcale_core.apply_downscale(image, method, target, {})  # aquecimento
+    times = []
+    for _ in range(CALIBRATION_REPEAT):
+        start = time.perf_counter()
+        menezcale_core.apply_downscale(image, method, target, {})
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def calibrate() -> dict:
+    """
+    Benchmark every available method on this machine and store the cost
+    model on disk. Runs as its own job without a deadline: under the
+    caller's job a passed deadline would time the Bicubic fallback and
+    mark the caller's result degraded. Raises JobCancelled on Cancelar or
+    Interrupt; a degraded run is kept in memory only.
+    """
+    state = menezcale_cancel.Job()
+    calibration = menezcale_cancel.bind(_calibrate, state)()
+    if state.degraded:
+        telemetry.warning("Calibração do método Auto com fallback; não gravada em disco, refeita na próxima sessão.")
+    else:
+        menezcale_core.write_disk_cache(CACHE_KEY, calibration)
+    return calibration
+
+
+def _fit(samples) -> Dict[str, float]:
+    """
+    Least-squares ms = a * source_mp + b * output_mp over (source_mp,
+    output_mp, ms) samples, both terms >= 0. A fit with no source cost is
+    rejected (every image would look almost free to predict_ms): the model
+    falls back to the mean ms per source MP.
+    """
+    s_ss = sum(src * src for src, _, _ in samples)
+    s_oo = sum(out * out for _, out, _ in samples)
+    s_so = sum(src * out for src, out, _ in samples)
+    s_sm = sum(src * ms for src, _, ms in samples)
+    s_om = sum(out * ms for _, out, ms in samples)
+    det = s_ss * s_oo - s_so * s_so
+    if det > 0:
+        per_source_mp = (s_sm * s_oo - s_om * s_so) / det
+        per_output_mp = (s_om * s_ss - s_sm * s_so) / det
+        if per_output_mp < 0:
+            per_source_mp, per_output_mp = s_sm / s_ss, 0.0
+        if per_source_mp > 0:
+            return {"ms_per_source_mp": per_source_mp, "ms_per_output_mp": per_output_mp}
+    telemetry.incr("calibration_fit_rejected")
+    per_source_mp = statistics.mean(ms / src for src, _, ms in samples)
+    return {"ms_per_source_mp": per_source_mp, "ms_per_output_mp": 0.0}
+
+
+def _calibrate() -> dict:
+    images = [_calibration_image(side) for side in CALIBRATION_SIDES]
+    fsrcnn_ready = menezcale_core.get_fsrcnn_model()[0] is not None
+    costs: Dict[str, dict] = {}
+    with telemetry.stage("calibrate"):
+        for key in QUALITY_ORDER:
+            method = _method_for(key)
+            if method is None or (key == "fsrcnn" and not fsrcnn_ready):
+                continue
+            samples = []
+            for image in images:
+                source_mp = image.width * image.height / 1e6
+                for factor in CALIBRATION_FACTORS:
+                    target = (image.width // factor, image.height // factor)
+                    samples.append((source_mp, target[0] * target[1] / 1e6, _measure_ms(method, image, target)))
+            costs[method] = _fit(samples)
+
+    calibration = {"environment": _environment(), "methods": costs, "calibrated_at": time.time()}
+    telemetry.info(
+        "Calibração do método Auto: "
+        + ", ".join(f"{m.split(' (')[0]} {c['ms_per_source_mp']:.1f} ms/MP" for m, c in costs.items())
+    )
+    return calibration
+
+
+def get_calibration() -> dict:
+    """Calibration for the current environment: memory, then disk, then a new benchmark."""
+    global _calibration
+    environment = _environment()
+    if _calibration is not None and _calibration.get("environment") == environment:
+        return _calibration
+    with _calibration_lock:
+        if _calibration is not None and _calibration.get("environment") == environment:
+            return _calibration
+        stored = menezcale_core.read_disk_cache().get(CACHE_KEY)
+        if isinstance(stored, dict) and stored.get("environment") == environment and stored.get("methods"):
+            _calibration = stored
+        else:
+            _calibration = calibrate()
+        return _calibration
+
+
+def predict_ms(method: str, source_size: Tuple[int, int], target_size: Tuple[int, int]) -> Optional[float]:
+    cost = get_calibration()["methods"].get(method)
+    if cost is None:
+        return None
+    source_mp = source_size[0] * source_size[1] / 1e6
+    output_mp = target_size[0] * target_size[1] / 1e6
+    return cost["ms_per_source_mp"] * source_mp + cost["ms_per_output_mp"] * output_mp
+
+
+def choose_method(
+    source_size: Tuple[int, int],
+    target_size: Tuple[int, int],
+    budget_ms: Optional[float] = None,
+) -> str:
+    """Best-quality method whose predicted time fits `budget_ms`; the fastest one if none fits."""
+    if budget_ms is None:
+        budget_ms = float(menezcale_core.get_opt("menezcale_auto_budget_ms", DEFAULT_BUDGET_MS))
+    predictions = []
+    for key in QUALITY_ORDER:
+        method = _method_for(key)
+        predicted = predict_ms(method, source_size, target_size) if method else None
+        if predicted is not None:
+            predictions.append((method, predicted))
+    if not predictions:
+        return menezcale_core.DOWNSCALE_METHODS[0]
+
+    chosen, predicted = next(
+        ((method, ms) for method, ms in predictions if ms <= budget_ms),
+        min(predictions, key=lambda item: item[1]),
+    )
+    telemetry.incr(f"auto_method_{chosen.split(' (')[0].lower()}")
+    telemetry.debug(
+        f"Auto: {chosen.split(' (')[0]} para {source_size[0]}x{source_size[1]} -> "
+        f"{target_size[0]}x{target_size[1]} (~{predicted:.0f} ms previstos, orçamento {budget_ms:.0f} ms)"
+    )
+    return chosen
@@ -0,0 +1,102 @@
+"""
+Backends de reamostragem (Lanczos/Bicubic) usados por apply_downscale.
+
+Todos seguem a mesma interface (ResampleBackend): `available()`,
+`supports(down_method)`, `modes` e `resize_stack(images, size, down_method)`
+para imagens do mesmo tamanho e modo. O backend vem de "Configurações >
+Menezcale > Motor de reamostragem":
+
+- Pillow (padrão): Image.resize por imagem; o lote paraleliza em threads e
+  imagens grandes usam as faixas de menezcale_tiling (no menezcale_core,
+  antes de chegar aqui).
+- NumPy: menezcale_resample (pesos em banda em cache, matmul/BLAS na pilha).
+
+Cópias no NumPy: PIL -> NumPy custa uma cópia por imagem (o Pillow não
+escreve num buffer externo) e mais uma ao empilhar um lote; a volta para
+PIL copia uma vez em Image.fromarray. Qual backend ganha depende do lote,
+do tamanho e dos núcleos: benchmarks/bench_backends.py.
+"""
+
+import abc
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+from PIL import Image
+
+import menezcale_resample
+
+_RESAMPLE = {"lanczos": Image.Resampling.LANCZOS, "bicubic": Image.Resampling.BICUBIC}
+
+
+def _check_stack(backend: "ResampleBackend", images: Sequence[Image.Image], down_method: str) -> str:
+    method = menezcale_resample.method_key(down_method)
+    if method is None or not backend.supports(down_method):
+        raise ValueError(f"Método sem suporte no backend {backend.name}: {down_method}")
+    first = images[0]
+    if first.mode not in backend.modes:
+        raise ValueError(f"Modo sem suporte no backend {backend.name}: {first.mode}")
+    if any(img.size != first.size or img.mode != first.mode for img in images):
+        raise ValueError("resize_stack exige imagens do mesmo tamanho e modo")
+    return method
+
+
+class ResampleBackend(abc.ABC):
+    """Interface of a resample backend. `stacks`: resizes a whole batch in one call."""
+
+    name = ""
+    key = ""
+    stacks = False
+    modes: Tuple[str, ...] = menezcale_resample.SUPPORTED_MODES
+
+    def available(self) -> bool:
+        return True
+
+    def supports(self, down_method: str) -> bool:
+        return menezcale_resample.method_key(down_method) is not None
+
+    @abc.abstractmethod
+    def resize_stack(
+        self, images: Sequence[Image.Image], size: Tuple[int, int], down_method: str
+    ) -> List[Image.Image]:
+        """`images` (same size and mode) resized to `size`; ValueError for unsupported input."""
+
+
+class PillowBackend(ResampleBackend):
+    name = "Pillow"
+    key = "pillow"
+
+    def resize_stack(self, images, size, down_method):
+        if not images:
+            return []
+        resample = _RESAMPLE[_check_stack(self, images, down_method)]
+        return [image.resize(size, resample=resample) for image in images]
+
+
+class NumpyBackend(ResampleBackend):
+    name = "NumPy"
+    key = "numpy"
+    stacks = True
+
+    def available(self) -> bool:
+        return menezcale_resample.available()
+
+    def resize_stack(self, images, size, down_method):
+        return menezcale_resample.resize_stack(images, size, down_method)
+
+
+BACKENDS = OrderedDict((backend.name, backend) for backend in (PillowBackend(), NumpyBackend()))
+DEFAULT = BACKENDS["Pillow"]
+
+
+def names() -> List[str]:
+    """Setting choices."""
+    return list(BACKENDS)
+
+
+def get(name: str) -> Optional[ResampleBackend]:
+    """Backend by its setting name (case-insensitive, prefix allowed: "numpy")."""
+    wanted = str(name or "").strip().lower()
+    for backend_name, backend in BACKENDS.items():
+        if wanted and backend_name.lower().startswith(wanted):
+            return backend
+    return None
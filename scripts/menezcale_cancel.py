@@ -0,0 +1,178 @@
+"""
+Cancelamento cooperativo e prazo por job.
+
+Resize do Pillow, FSRCNN e GFPGAN não param no meio de uma chamada; por
+isso check() é chamado entre etapas, entre faixas/tiles e entre as imagens
+de um lote, e levanta:
+
+- JobCancelled: Interrupt do WebUI (pressionado depois que o job começou),
+  botão "Cancelar" do painel (cancel_all) ou Job.cancel();
+- DeadlineExceeded: o job passou do prazo. apply_downscale troca o método
+  pelo Bicubic e o face restoration é pulado, então o job termina logo em
+  vez de ocupar o worker.
+
+O job vale para a thread atual (job()); bind() leva o mesmo job para as
+threads de um pool. Fora de um job (preview, CLI, workers de processo)
+check() não faz nada.
+"""
+
+import contextlib
+import functools
+import os
+import threading
+import time
+from typing import Callable, Iterator, Optional
+
+import menezcale_telemetry as telemetry
+
+# Workers de processo não carregam o WebUI (ver menezcale_core).
+if os.environ.get("MENEZCALE_NO_WEBUI"):
+    shared = None
+else:
+    try:
+        from modules import shared
+    except Exception:
+        shared = None
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+_local = threading.local()
+_epoch_lock = threading.Lock()
+_cancel_epoch = 0
+
+
+def interrupted() -> bool:
+    state = getattr(shared, "state", None)
+    return bool(getattr(state, "interrupted", False))
+
+
+class Job:
+    """Cancellation state shared by every thread working on one job."""
+
+    __slots__ = ("deadline", "epoch", "interrupt_seen", "cancelled", "degraded", "parent")
+
+    def __init__(self, timeout_s: Optional[float] = None, parent: Optional["Job"] = None):
+        deadline = time.monotonic() + float(timeout_s) if timeout_s and float(timeout_s) > 0 else None
+        if parent is not None and parent.deadline is not None:
+            deadline = parent.deadline if deadline is None else min(deadline, parent.deadline)
+        self.deadline = deadline
+        self.epoch = parent.epoch if parent is not None else _cancel_epoch
+        # O flag do WebUI só volta a False na próxima geração: um Interrupt
+        # anterior ao job não o cancela.
+        self.interrupt_seen = parent.interrupt_seen if parent is not None else interrupted()
+        self.cancelled = False
+        self.degraded = False
+        self.parent = parent
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+    def is_cancelled(self) -> bool:
+        job = self
+        while job is not None:
+            if job.cancelled:
+                return True
+            job = job.parent
+        return self.epoch != _cancel_epoch or (interrupted() and not self.interrupt_seen)
+
+    def deadline_passed(self) -> bool:
+        return self.deadline is not None and time.monotonic() > self.deadline
+
+    def mark_degraded(self) -> None:
+        job = self
+        while job is not None:
+            job.degraded = True
+            job = job.parent
+
+
+def current() -> Optional[Job]:
+    return getattr(_local, "job", None)
+
+
+@contextlib.contextmanager
+def job(timeout_s: Optional[float] = None) -> Iterator[Job]:
+    """
+    Run the block as a cancellable job with an optional deadline (seconds;
+    None or <= 0 means none). Nested jobs keep the outer deadline if it is
+    earlier and are cancelled with the outer job.
+    """
+    outer = current()
+    state = Job(timeout_s, outer)
+    _local.job = state
+    try:
+        yield state
+    finally:
+        _local.job = outer
+
+
+@contextlib.contextmanager
+def no_deadline() -> Iterator[None]:
+    """Suspend the deadline (the Bicubic fallback must finish); cancellation still applies."""
+    state = current()
+    if state is None:
+        yield
+        return
+    deadline, state.deadline = state.deadline, None
+    try:
+        yield
+    finally:
+        state.deadline = deadline
+
+
+def check(deadline: bool = True) -> None:
+    """Raise JobCancelled / DeadlineExceeded (the latter only with `deadline`) for the current job."""
+    state = current()
+    if state is None:
+        return
+    if state.is_cancelled():
+        raise JobCancelled()
+    if deadline and state.deadline_passed():
+        raise DeadlineExceeded()
+
+
+def deadline_passed() -> bool:
+    state = current()
+    return state is not None and state.deadline_passed()
+
+
+def mark_degraded() -> None:
+    """Record that the current job returned a fallback result (callers must not cache it)."""
+    state = current()
+    if state is not None:
+        state.mark_degraded()
+
+
+def degraded() -> bool:
+    state = current()
+    return state is not None and state.degraded
+
+
+def bind(fn: Callable, state: Optional[Job] = None) -> Callable:
+    """`fn` running under `state` (default: the caller's current job), for pool threads."""
+    state = state if state is not None else current()
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        outer = current()
+        _local.job = state
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _local.job = outer
+
+    return run
+
+
+def cancel_all() -> None:
+    """Cancel every job running now (panel "Cancelar"); jobs started afterwards are not affected."""
+    global _cancel_epoch
+    with _epoch_lock:
+        _cancel_epoch += 1
+    telemetry.incr("cancel_requested")
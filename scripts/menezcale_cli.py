@@ -0,0 +1,258 @@
+"""
+Execução headless do Menezcale para pastas de imagens pós-hires.
+
+Percorre um diretório, lê os metadados `parameters` de cada PNG, volta a
+imagem ao tamanho base detectado e grava o resultado em outra pasta. Roda
+sem o pacote `modules` do WebUI; nesse caso FSRCNN e face restoration
+ficam desligados (FSRCNN cai para Lanczos).
+
+Uso:
+    python scripts/menezcale_cli.py ENTRADA SAIDA [--method Lanczos] [--workers N] [--index acervo.sqlite]
+
+Com --index, o cabeçalho de cada arquivo (tamanho base, Hires) vai para um
+índice SQLite por caminho + mtime: novas passadas só leem e processam os
+arquivos novos ou alterados.
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Iterator, Optional, Tuple
+
+from PIL import Image
+
+# Garantir que os módulos auxiliares locais sejam importáveis.
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+if CURRENT_DIR not in sys.path:
+    sys.path.append(CURRENT_DIR)
+
+from menezcale_core import (
+    apply_downscale,
+    apply_face_restore_if_enabled,
+    attach_base_metadata,
+    compute_target_size,
+    detect_original_size,
+    is_hires_allowed,
+)
+import menezcale_save
+import menezcale_telemetry as telemetry
+from menezcale_scan import MetadataIndex
+
+IMAGE_EXTENSIONS = (".png",)
+
+
+def iter_images(root: str, recursive: bool) -> Iterator[str]:
+    """Gera caminhos sob demanda para não listar pastas enormes em memória."""
+    if recursive:
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for name in sorted(filenames):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield os.path.join(dirpath, name)
+        return
+
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                yield entry.path
+
+
+def init_worker(log_level: str, metrics_path: Optional[str]) -> None:
+    """Configura logs e métricas em cada processo do pool."""
+    telemetry.set_log_level(log_level)
+    telemetry.set_sink(metrics_path)
+
+
+def process_file(
+    src_path: str,
+    dst_path: str,
+    down_method: str,
+    require_hires: bool,
+    fmt: str = "PNG",
+    compress_level: int = menezcale_save.DEFAULT_COMPRESS_LEVEL,
+    quality: int = menezcale_save.DEFAULT_QUALITY,
+) -> Tuple[str, Optional[str]]:
+    """Processa um arquivo no worker; devolve (status, detalhe)."""
+    try:
+        with Image.open(src_path) as image:
+            # Os chunks de texto já foram lidos pelo open(); pixels só se for processar.
+            if require_hires and not is_hires_allowed(image):
+                return "skipped", "sem Hires Fix nos metadados"
+
+            original_size = detect_original_size(
+                p=None,
+                image=image,
+                use_auto_original=True,
+                manual_width=0,
+                manual_height=0,
+            )
+            if not original_size:
+                return "skipped", "tamanho original não detectado"
+            image.load()
+
+            metadata = dict(image.info)
+            attach_base_metadata(metadata, original_size, None)
+            target_size = compute_target_size(image, original_size, 1.0, False)
+            result = apply_downscale(image, down_method, target_size, metadata)
+            result = apply_face_restore_if_enabled(result, metadata)
+
+        os.makedirs(os.path.dirname(dst_path) or ".", exist_ok=True)
+        menezcale_save.encode(result, dst_path, fmt, metadata, compress_level, quality)
+        return "processed", None
+    except Exception as err:
+        return "failed", str(err)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Menezcale headless: downscale de uma pasta de PNGs para o tamanho base detectado.",
+    )
+    parser.add_argument("input_dir", help="Pasta com as imagens pós-hires.")
+    parser.add_argument("output_dir", help="Pasta de saída (mantém a estrutura relativa).")
+    parser.add_argument(
+        "--method",
+        default="Lanczos",
+        help="Método de downscale (Lanczos, Bicubic ou FSRCNN). Padrão: Lanczos.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Número de processos (padrão: todos os núcleos).",
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=0,
+        help="Máximo de imagens em processamento ao mesmo tempo (padrão: 2x workers).",
+    )
+    parser.add_argument("--recursive", action="store_true", help="Percorre subpastas.")
+    parser.add_argument("--overwrite", action="store_true", help="Reprocessa saídas já existentes.")
+    parser.add_argument(
+        "--ignore-hires-check",
+        action="store_true",
+        help="Processa também imagens sem Hires Fix nos metadados.",
+    )
+    parser.add_argument(
+        "--format",
+        type=str.upper,
+        default="PNG",
+        choices=list(menezcale_save.FORMATS),
+        help="Formato de saída (PNG guarda os metadados como texto; JPEG/WEBP no EXIF).",
+    )
+    parser.add_argument(
+        "--compress-level",
+        type=int,
+        default=menezcale_save.DEFAULT_COMPRESS_LEVEL,
+        choices=range(10),
+        metavar="0-9",
+        help=f"Compressão PNG (padrão: {menezcale_save.DEFAULT_COMPRESS_LEVEL}; 0 = mais rápido).",
+    )
+    parser.add_argument(
+        "--quality",
+        type=int,
+        default=menezcale_save.DEFAULT_QUALITY,
+        help="Qualidade JPEG/WEBP.",
+    )
+    parser.add_argument(
+        "--index",
+        help=(
+            "Índice SQLite de metadados (caminho + mtime). Arquivos sem mudança desde a última passada "
+            "não são abertos; alterados são reprocessados mesmo com a saída existente."
+        ),
+    )
+    parser.add_argument(
+        "--log-level",
+        default="warning",
+        choices=list(telemetry.LEVELS),
+        help="Nível de log dos workers (padrão: warning; debug mostra cada etapa).",
+    )
+    parser.add_argument(
+        "--metrics",
+        help="Arquivo JSON lines com o tempo de cada etapa (detect, resize, fsrcnn...) por imagem.",
+    )
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+
+    input_dir = os.path.abspath(args.input_dir)
+    output_dir = os.path.abspath(args.output_dir)
+    workers = max(1, args.workers)
+    max_in_flight = max(1, args.max_in_flight or workers * 2)
+
+    counts = {"processed": 0, "skipped": 0, "failed": 0}
+    future_paths = {}
+    index = MetadataIndex(os.path.abspath(args.index)) if args.index else None
+    require_hires = not args.ignore_hires_check
+
+    def collect(futures):
+        for future in futures:
+            src_path = future_paths.pop(future)
+            status, detail = future.result()
+            counts[status] += 1
+            if index is not None and status == "processed":
+                index.mark_processed(src_path)
+            if detail:
+                print(f"[Menezcale] {os.path.relpath(src_path, input_dir)}: {detail}")
+
+    start = time.perf_counter()
+    metrics_path = os.path.abspath(args.metrics) if args.metrics else None
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_worker,
+        initargs=(args.log_level, metrics_path),
+    ) as executor:
+        for src_path in iter_images(input_dir, args.recursive):
+            rel_path = os.path.relpath(src_path, input_dir)
+            dst_path = os.path.join(output_dir, os.path.splitext(rel_path)[0] + menezcale_save.FORMATS[args.format])
+            outdated = False
+            if index is not None:
+                entry = index.scan(src_path)
+                outdated = entry.outdated
+                # Decidido pelo cabeçalho indexado: nem chega a abrir o arquivo.
+                if (require_hires and not entry.hires) or (entry.size and not entry.base_size):
+                    counts["skipped"] += 1
+                    continue
+            if not args.overwrite and not outdated and os.path.exists(dst_path):
+                counts["skipped"] += 1
+                continue
+
+            # Backpressure: nunca mais que max_in_flight imagens decodificadas.
+            if len(future_paths) >= max_in_flight:
+                done, _ = wait(list(future_paths), return_when=FIRST_COMPLETED)
+                collect(done)
+
+            future = executor.submit(
+                process_file,
+                src_path,
+                dst_path,
+                args.method,
+                require_hires,
+                args.format,
+                args.compress_level,
+                args.quality,
+            )
+            future_paths[future] = src_path
+
+        done, _ = wait(list(future_paths))
+        collect(done)
+
+    if index is not None:
+        index.close()
+
+    elapsed = time.perf_counter() - start
+    rate = counts["processed"] / elapsed if elapsed > 0 else 0.0
+    print(
+        f"[Menezcale] Concluído: {counts['processed']} processadas, "
+        f"{counts['skipped']} ignoradas, {counts['failed']} falhas "
+        f"em {elapsed:.1f}s ({rate:.2f} imagens/s, {workers} workers)."
+    )
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""
+Comparação de métodos numa rodada só.
+
+A imagem é decodificada e o alvo detectado uma vez; cada método roda sobre
+a mesma origem (só leitura) em paralelo, o FSRCNN num único job (modelo
+compartilhado). Sem face restoration: é igual para todos os métodos e
+seria o custo dominante.
+
+Sem modelo FSRCNN o apply_downscale cai no Lanczos: o FSRCNN sai da
+comparação e, se for pedido mesmo assim, aparece como "FSRCNN→Lanczos"
+(a grade não mostra um Lanczos com o nome do FSRCNN).
+
+Os tempos por método são medidos dentro de cada job e, como os jobs
+disputam os mesmos núcleos, ficam acima do que cada método leva sozinho;
+servem para comparar os métodos entre si.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+import menezcale_cancel
+import menezcale_telemetry as telemetry
+from menezcale_core import DOWNSCALE_METHODS, apply_downscale, get_fsrcnn_model, is_auto_method
+
+LABEL_BACKGROUND = (24, 24, 24)
+LABEL_COLOR = (240, 240, 240)
+GRID_GAP = 8
+
+Comparison = Tuple[str, Image.Image, float]
+
+
+def short_name(method: str) -> str:
+    return method.split(" (")[0]
+
+
+def _fsrcnn_fallback(method: str) -> bool:
+    return "fsrcnn" in method.lower() and get_fsrcnn_model()[0] is None
+
+
+def label(method: str) -> str:
+    """Short name as shown in the grid and table; marks an FSRCNN run that fell back to Lanczos."""
+    return f"{short_name(method)}→Lanczos" if _fsrcnn_fallback(method) else short_name(method)
+
+
+def comparable_methods() -> List[str]:
+    """Every concrete method, without FSRCNN when its model is unavailable (it would be a second Lanczos)."""
+    return [
+        method for method in DOWNSCALE_METHODS if not is_auto_method(method) and not _fsrcnn_fallback(method)
+    ]
+
+
+def run_methods(
+    image: Image.Image,
+    target_size: Tuple[int, int],
+    metadata: dict,
+    methods: Optional[Sequence[str]] = None,
+    max_workers: Optional[int] = None,
+) -> List[Comparison]:
+    """(method, result, ms) for each method, in `methods` order, run concurrently on one source."""
+    methods = list(methods or comparable_methods())
+    image.load()
+
+    def run(method: str) -> Comparison:
+        start = time.perf_counter()
+        result = apply_downscale(image, method, target_size, metadata)
+        return method, result, (time.perf_counter() - start) * 1000
+
+    workers = max(1, min(max_workers or os.cpu_count() or 1, len(methods)))
+    with telemetry.stage("compare", methods=len(methods)):
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="menezcale-compare") as executor:
+            return list(executor.map(menezcale_cancel.bind(run), methods))
+
+
+def _font(size: int):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow < 10.1: fonte bitmap de tamanho fixo.
+        return ImageFont.load_default()
+
+
+def grid(results: Sequence[Comparison], columns: int = 2) -> Image.Image:
+    """Results side by side, each under a label with the method name and its time."""
+    width = max(result.width for _, result, _ in results)
+    height = max(result.height for _, result, _ in results)
+    font = _font(max(14, min(48, width // 24)))
+    label_height = int(font.size * 1.8) if hasattr(font, "size") else 24
+    columns = max(1, min(columns, len(results)))
+    rows = -(-len(results) // columns)
+
+    canvas = Image.new(
+        "RGB",
+        (columns * width + (columns - 1) * GRID_GAP, rows * (height + label_height) + (rows - 1) * GRID_GAP),
+        LABEL_BACKGROUND,
+    )
+    draw = ImageDraw.Draw(canvas)
+    for position, (method, result, ms) in enumerate(results):
+        x = (position % columns) * (width + GRID_GAP)
+        y = (position // columns) * (height + label_height + GRID_GAP)
+        draw.text((x + label_height // 3, y + label_height // 5), f"{label(method)} - {ms:.0f} ms",
+                  fill=LABEL_COLOR, font=font)
+        canvas.paste(result if result.mode == "RGB" else result.convert("RGB"), (x, y + label_height))
+    return canvas
+
+
+def timing_table(
+    results: Sequence[Comparison],
+    source_size: Tuple[int, int],
+    target_size: Tuple[int, int],
+    wall_ms: float,
+) -> str:
+    """Markdown table, fastest first."""
+    source_mp = source_size[0] * source_size[1] / 1e6
+    lines = [
+        f"{source_size[0]}x{source_size[1]} -> {target_size[0]}x{target_size[1]}, "
+        f"{len(results)} métodos em paralelo: {wall_ms:.0f} ms no total (sem face restoration).",
+        "",
+        "| Método | Tempo (ms) | ms/MP da origem |",
+        "|---|---:|---:|",
+    ]
+    for method, _, ms in sorted(results, key=lambda item: item[2]):
+        lines.append(f"| {label(method)} | {ms:.0f} | {ms / source_mp:.1f} |")
+    return "\n".join(lines)
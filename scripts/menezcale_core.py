@@ -1,27 +1,202 @@
+import hashlib
+import json
+import os
 import re
-import subprocess
 import sys
-from typing import Optional, Tuple
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple
 
 from PIL import Image
 
-from modules import shared
+# Garantir que os módulos auxiliares locais sejam importáveis.
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+if CURRENT_DIR not in sys.path:
+    sys.path.append(CURRENT_DIR)
 
-try:
-    import modules.sd_upscalers as sd_upscalers
-except Exception:
-    sd_upscalers = None
+import menezcale_autoselect
+import menezcale_backends
+import menezcale_cancel
+import menezcale_faces
+import menezcale_procpool
+import menezcale_telemetry as telemetry
+from menezcale_tiling import (
+    get_memory_stats,
+    process_working_bytes,
+    resize_working_bytes,
+    tile_side_for_budget,
+    tiled_process,
+    tiled_resize,
+)
+
+# Workers de processo (menezcale_procpool) rodam sem o WebUI: importar
+# `modules` lá dispararia a inicialização inteira dele em cada worker.
+if os.environ.get("MENEZCALE_NO_WEBUI"):
+    shared = sd_upscalers = face_restoration = upscaler_utils = None
+else:
+    try:
+        from modules import shared
+    except Exception:
+        shared = None
+
+    try:
+        import modules.sd_upscalers as sd_upscalers
+    except Exception:
+        sd_upscalers = None
+
+    try:
+        from modules import face_restoration
+    except Exception:
+        face_restoration = None
+
+    try:
+        from modules import upscaler_utils
+    except Exception:
+        upscaler_utils = None
+
+
+EXTENSION_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_PATH = os.path.join(EXTENSION_DIR, "menezcale_cache.json")
+# Quanto tempo um "sd-parsers indisponível" fica válido antes de nova tentativa.
+SD_PARSERS_RETRY_SECONDS = 7 * 24 * 3600
+
+_sd_parsers_lock = threading.Lock()
+_fsrcnn_lock = threading.Lock()
+_fsrcnn_state = {"resolved": False, "upscaler": None, "model": None}
+_sd_parsers_resolved = False
+_sd_parsers_parse = None
+
+
+# Opções que mudam o downscale num worker de processo (sem WebUI, sem shared.opts):
+# vão junto de cada tarefa, então mudar o ajuste vale já no lote seguinte.
+WORKER_OPTS = (
+    "menezcale_resample_engine",
+    "menezcale_tile_mode",
+    "menezcale_tile_budget_mb",
+    "menezcale_tile_overlap",
+    "menezcale_auto_budget_ms",
+)
+_worker_opts: dict = {}
+
+
+def get_opt(name: str, default):
+    """
+    Read a WebUI option, falling back to `default` outside the WebUI. In a
+    process worker the values from install_worker_opts win.
+    """
+    if name in _worker_opts:
+        return _worker_opts[name]
+    if not shared or not getattr(shared, "opts", None):
+        return default
+    try:
+        value = getattr(shared.opts, name)
+    except Exception:
+        return default
+    return default if value is None else value
+
+
+def worker_opts() -> dict:
+    """The WORKER_OPTS values set in this (WebUI) process, to ship to process workers."""
+    opts = {}
+    for name in WORKER_OPTS:
+        value = get_opt(name, None)
+        if value is not None:
+            opts[name] = value
+    return opts
+
+
+def install_worker_opts(opts: dict) -> None:
+    """In a process worker: make get_opt return the main process's settings."""
+    _worker_opts.clear()
+    _worker_opts.update(opts)
+
+
+DOWNSCALE_METHODS = [
+    "Lanczos (Recomendado para Preservar Qualidade)",
+    "FSRCNN (IA para Downscale Inteligente)",
+    "Progressivo (Pirâmide Rápida para Grandes Reduções)",
+    "Bicubic (Rápido)",
+    "Auto (Melhor Qualidade no Orçamento de Tempo)",
+]
+# Método usado quando o job estoura o prazo (o mais rápido).
+FALLBACK_METHOD = DOWNSCALE_METHODS[3]
+# Margem mínima de redução deixada para o Lanczos final do modo progressivo.
+PROGRESSIVE_GAP = 2.0
 
-try:
-    from modules import face_restoration
-except Exception:
-    face_restoration = None
+
+def tile_budget_bytes() -> int:
+    return max(16, int(get_opt("menezcale_tile_budget_mb", 512))) * 1024 * 1024
+
+
+def should_tile(working_bytes: int) -> bool:
+    mode = str(get_opt("menezcale_tile_mode", "Automático")).lower()
+    if mode.startswith("desl"):
+        return False
+    if mode.startswith("sempre"):
+        return True
+    return working_bytes > tile_budget_bytes()
+
+
+def resize_image(image: Image.Image, size: Tuple[int, int], resample: int) -> Image.Image:
+    """Image.resize, in output strips when the working set exceeds the tile budget."""
+    if should_tile(resize_working_bytes(image, size)):
+        result = tiled_resize(image, size, resample, tile_budget_bytes(), on_tile=menezcale_cancel.check)
+        stats = get_memory_stats()
+        telemetry.incr("tiled_resize")
+        telemetry.debug(
+            f"Resize em {stats['resize_strips']} faixas, "
+            f"pico estimado {stats['resize_peak_bytes'] / 2**20:.0f} MB"
+        )
+        return result
+    return image.resize(size, resample=resample)
+
+
+def resample_backend(down_method: str) -> menezcale_backends.ResampleBackend:
+    """
+    Selected backend when it is available and supports this method,
+    otherwise Pillow (menezcale_backends.DEFAULT).
+    """
+    backend = menezcale_backends.get(get_opt("menezcale_resample_engine", "Pillow"))
+    if backend is None or not backend.supports(down_method) or not backend.available():
+        return menezcale_backends.DEFAULT
+    return backend
+
+
+def resize_with_engine(image: Image.Image, size: Tuple[int, int], down_method: str, resample: int) -> Image.Image:
+    """Resize through the selected backend; above the tile budget (or other modes) in Pillow strips."""
+    backend = resample_backend(down_method)
+    if image.mode in backend.modes and not should_tile(resize_working_bytes(image, size)):
+        return backend.resize_stack([image], size, down_method)[0]
+    return resize_image(image, size, resample)
+
+
+def read_disk_cache() -> dict:
+    try:
+        with open(CACHE_PATH, "r", encoding="utf-8") as fp:
+            data = json.load(fp)
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
+def write_disk_cache(key: str, value) -> None:
+    data = read_disk_cache()
+    data[key] = value
+    try:
+        tmp_path = f"{CACHE_PATH}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fp:
+            json.dump(data, fp, indent=2)
+        os.replace(tmp_path, CACHE_PATH)
+    except Exception as err:
+        telemetry.warning(f"Não foi possível gravar cache em disco ({err}).")
 
 
 def load_sd_parsers():
     """
-    Try to import sd_parsers; if missing, attempt a lightweight pip install.
-    Falls back to None if not available (regex still works).
+    Import sd_parsers without installing anything (install.py handles pip).
+    Returns None if not available (regex still works).
     """
     try:
         from sd_parsers import parse_generation_parameters  # type: ignore
@@ -29,34 +204,187 @@ def load_sd_parsers():
     except Exception:
         pass
 
+    # Algumas versões expõem 'parse' em vez de parse_generation_parameters.
     try:
-        print("[Menezcale] Instalando dependência leve sd-parsers...")
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "sd-parsers"])
-        # Re-tentar import após instalação
-        try:
-            from sd_parsers import parse_generation_parameters  # type: ignore
+        import sd_parsers  # type: ignore
 
-            print("[Menezcale] sd-parsers instalado com sucesso.")
-            return parse_generation_parameters
-        except Exception:
-            # Algumas versões expõem 'parse' em vez de parse_generation_parameters.
+        if hasattr(sd_parsers, "parse"):
+            return getattr(sd_parsers, "parse")
+    except Exception:
+        pass
+    return None
+
+
+def get_sd_parsers():
+    """
+    Resolve sd_parsers on first real use and memoize the result.
+    A previous "unavailable" result on disk is honored until it expires,
+    so nothing is retried on every boot.
+    """
+    global _sd_parsers_resolved, _sd_parsers_parse
+    if _sd_parsers_resolved:
+        return _sd_parsers_parse
+
+    with _sd_parsers_lock:
+        if _sd_parsers_resolved:
+            return _sd_parsers_parse
+
+        entry = read_disk_cache().get("sd_parsers") or {}
+        cached_unavailable = (
+            entry.get("available") is False
+            and entry.get("python") == sys.executable
+            and time.time() - float(entry.get("checked_at", 0)) < SD_PARSERS_RETRY_SECONDS
+        )
+        if cached_unavailable:
+            parse = None
+        else:
+            parse = load_sd_parsers()
+            if entry.get("available") is not (parse is not None):
+                write_disk_cache(
+                    "sd_parsers",
+                    {
+                        "available": parse is not None,
+                        "python": sys.executable,
+                        "checked_at": time.time(),
+                    },
+                )
+
+        if parse is None:
+            telemetry.incr("sd_parsers_unavailable")
+            telemetry.info("sd-parsers indisponível; usando regex fallback.")
+        _sd_parsers_parse = parse
+        _sd_parsers_resolved = True
+        return parse
+
+
+# Metadados ------------------------------------------------------------------
+# Uma única varredura do texto `parameters` cobre tamanho, Hires e fator.
+# Só casam valores numéricos (um "Size: large" no prompt não esconde o
+# "Size: 512x768" da linha de parâmetros); Width e Height só em par adjacente.
+_PARAMS_RE = re.compile(
+    r"Width:\s*(?P<width>\d+),\s*Height:\s*(?P<height>\d+)"
+    r"|Size:\s*(?P<size_w>\d+)\s*[xX]\s*(?P<size_h>\d+)"
+    r"|Hires upscale:\s*(?P<hires_scale>\d+(?:\.\d+)?)"
+    r"|Hires resize:\s*(?P<resize_w>\d+)\s*[xX]\s*(?P<resize_h>\d+)"
+    r"|(?P<hires>(?i:hires))"
+)
+METADATA_CACHE_SIZE = 512
+
+_metadata_cache: "OrderedDict[tuple, ImageMetadata]" = OrderedDict()
+_metadata_lock = threading.Lock()
+
+
+class ImageMetadata:
+    """Registro compacto com o que o Menezcale precisa dos metadados da imagem."""
+
+    __slots__ = (
+        "base_size",
+        "base_source",
+        "hires",
+        "hires_scale",
+        "hires_resize",
+        "menezcale_base",
+        "menezcale_hires",
+    )
+
+    def __init__(self):
+        self.base_size: Optional[Tuple[int, int]] = None
+        self.base_source: Optional[str] = None
+        self.hires = False
+        self.hires_scale: Optional[float] = None
+        self.hires_resize: Optional[Tuple[int, int]] = None
+        self.menezcale_base: Optional[Tuple[int, int]] = None
+        self.menezcale_hires = False
+
+
+def _as_bool(value) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "sim")
+    return bool(value)
+
+
+def _parse_parameters_into(record: ImageMetadata, params_text: str) -> None:
+    fields = {}
+    for match in _PARAMS_RE.finditer(params_text):
+        if match.group("width"):
+            fields.setdefault("Width", (int(match.group("width")), int(match.group("height"))))
+        elif match.group("size_w"):
+            fields.setdefault("Size", (int(match.group("size_w")), int(match.group("size_h"))))
+        elif match.group("hires_scale"):
+            record.hires = True
+            fields.setdefault("Hires upscale", float(match.group("hires_scale")))
+        elif match.group("resize_w"):
+            record.hires = True
+            fields.setdefault("Hires resize", (int(match.group("resize_w")), int(match.group("resize_h"))))
+        else:
+            record.hires = True
+
+    # Mesma semântica do re.search antigo: vale a primeira ocorrência válida.
+    if "Width" in fields:
+        record.base_size = fields["Width"]
+        record.base_source = "regex"
+    elif "Size" in fields:
+        record.base_size = fields["Size"]
+        record.base_source = "Size"
+
+    record.hires_scale = fields.get("Hires upscale")
+    record.hires_resize = fields.get("Hires resize")
+
+    if record.base_size is None:
+        parse_generation_parameters = get_sd_parsers()
+        if parse_generation_parameters:
             try:
-                import sd_parsers  # type: ignore
+                parsed = parse_generation_parameters(params_text)
+                width = parsed.get("Width") or parsed.get("width")
+                height = parsed.get("Height") or parsed.get("height")
+                if width and height:
+                    record.base_size = int(width), int(height)
+                    record.base_source = "sd_parsers"
+            except Exception as err:
+                telemetry.warning(f"Falha ao ler metadados sd_parsers: {err}")
 
-                if hasattr(sd_parsers, "parse"):
-                    print("[Menezcale] sd-parsers instalado; usando sd_parsers.parse.")
-                    return getattr(sd_parsers, "parse")
-            except Exception:
-                pass
-    except Exception as err:
-        print(f"[Menezcale] sd-parsers indisponível ({err}). Usando regex fallback.")
-        return None
 
-    print("[Menezcale] sd-parsers não expôs parse_generation_parameters; usando regex fallback.")
-    return None
+def read_image_metadata(info: Optional[dict]) -> ImageMetadata:
+    """
+    Parse `info` (PIL image.info or PNG text chunks) into an ImageMetadata.
+    Memoized by a hash of the parameters text plus the Menezcale keys in a
+    bounded LRU, so batches with near-identical blobs parse each one once.
+    """
+    info = info or {}
+    params_text = info.get("parameters") or info.get("Parameters") or ""
+    base_w = info.get("menezcale_base_width")
+    base_h = info.get("menezcale_base_height")
+    hires_flag = info.get("menezcale_hires_enabled")
 
+    digest = hashlib.blake2b(
+        params_text.encode("utf-8", "replace"), digest_size=16
+    ).digest() if params_text else b""
+    key = (digest, base_w, base_h, hires_flag)
+
+    with _metadata_lock:
+        record = _metadata_cache.get(key)
+        if record is not None:
+            _metadata_cache.move_to_end(key)
+    if record is not None:
+        telemetry.incr("metadata_cache_hit")
+        return record
+    telemetry.incr("metadata_cache_miss")
+
+    record = ImageMetadata()
+    if base_w and base_h:
+        try:
+            record.menezcale_base = int(base_w), int(base_h)
+        except (TypeError, ValueError):
+            pass
+    record.menezcale_hires = _as_bool(hires_flag) if hires_flag is not None else False
+    if params_text:
+        _parse_parameters_into(record, params_text)
 
-parse_generation_parameters = load_sd_parsers()
+    with _metadata_lock:
+        _metadata_cache[key] = record
+        if len(_metadata_cache) > METADATA_CACHE_SIZE:
+            _metadata_cache.popitem(last=False)
+    return record
 
 
 def log_hires_info(p):
@@ -76,16 +404,17 @@ def log_hires_info(p):
             target_w, target_h = int(base_w * float(hr_scale)), int(base_h * float(hr_scale))
             scale_used = hr_scale
 
-        print(
-            f"[Menezcale] Hires Fix ativo. "
+        telemetry.info(
+            f"Hires Fix ativo. "
             f"Resolução base (antes do hires): {base_w}x{base_h}. "
             + (f"Tamanho final esperado pelo Hires: {target_w}x{target_h}. " if target_w and target_h else "")
             + (f"Fator hires: {scale_used}x." if scale_used else "")
         )
     except Exception as err:
-        print(f"[Menezcale] Não foi possível registrar info do Hires Fix: {err}")
+        telemetry.warning(f"Não foi possível registrar info do Hires Fix: {err}")
 
 
+@telemetry.timed("detect")
 def detect_original_size(
     p,
     image: Image.Image,
@@ -95,56 +424,48 @@ def detect_original_size(
 ) -> Optional[Tuple[int, int]]:
     if not use_auto_original:
         if manual_width and manual_height:
-            print(f"[Menezcale] Usando tamanho manual: {manual_width}x{manual_height}")
+            telemetry.debug(f"Usando tamanho manual: {manual_width}x{manual_height}")
             return int(manual_width), int(manual_height)
         return None
 
-    info = getattr(image, "info", {}) or {}
-    base_w = info.get("menezcale_base_width")
-    base_h = info.get("menezcale_base_height")
-    if base_w and base_h:
-        try:
-            bw, bh = int(base_w), int(base_h)
-            print(f"[Menezcale] Tamanho original de metadata Menezcale: {bw}x{bh}")
-            return bw, bh
-        except Exception:
-            pass
+    metadata = read_image_metadata(getattr(image, "info", None))
+    if metadata.menezcale_base:
+        bw, bh = metadata.menezcale_base
+        telemetry.debug(f"Tamanho original de metadata Menezcale: {bw}x{bh}")
+        return bw, bh
 
     if p and getattr(p, "width", None) and getattr(p, "height", None):
         if p.width > 0 and p.height > 0:
-            print(f"[Menezcale] Tamanho original de p: {p.width}x{p.height}")
+            telemetry.debug(f"Tamanho original de p: {p.width}x{p.height}")
             return int(p.width), int(p.height)
 
-    params_text = info.get("parameters") or info.get("Parameters")
+    if metadata.base_size:
+        width, height = metadata.base_size
+        if metadata.base_source == "sd_parsers":
+            telemetry.debug(f"Tamanho original via sd_parsers: {width}x{height}")
+        elif metadata.base_source == "Size":
+            telemetry.debug(f"Tamanho original de metadados Size: {width}x{height}")
+        else:
+            telemetry.debug(f"Tamanho original de metadados regex: {width}x{height}")
+        return width, height
 
-    if params_text:
-        match = re.search(r"Width:\s*(\d+),\s*Height:\s*(\d+)", params_text)
-        if match:
-            width, height = int(match.group(1)), int(match.group(2))
-            print(f"[Menezcale] Tamanho original de metadados regex: {width}x{height}")
-            return width, height
-
-        size_match = re.search(r"Size:\s*(\d+)\s*[xX]\s*(\d+)", params_text)
-        if size_match:
-            width, height = int(size_match.group(1)), int(size_match.group(2))
-            print(f"[Menezcale] Tamanho original de metadados Size: {width}x{height}")
-            return width, height
+    telemetry.incr("detect_failed")
+    telemetry.info("Não foi possível detectar tamanho original automaticamente.")
+    return None
 
-        if parse_generation_parameters:
-            try:
-                parsed = parse_generation_parameters(params_text)
-                width = parsed.get("Width") or parsed.get("width")
-                height = parsed.get("Height") or parsed.get("height")
-                if width and height:
-                    print(f"[Menezcale] Tamanho original via sd_parsers: {width}x{height}")
-                    return int(width), int(height)
-            except Exception as err:
-                print(f"[Menezcale] Falha ao ler metadados sd_parsers: {err}")
 
-    print("[Menezcale] Não foi possível detectar tamanho original automaticamente.")
-    return None
+def original_size_from_info(info: Optional[dict]) -> Optional[Tuple[int, int]]:
+    """Base size from metadata alone (no `p`, no logging), same priority as detect_original_size."""
+    metadata = read_image_metadata(info)
+    return metadata.menezcale_base or metadata.base_size
+
+
+def hires_from_info(info: Optional[dict]) -> bool:
+    metadata = read_image_metadata(info)
+    return metadata.menezcale_hires or metadata.hires
 
 
+@telemetry.timed("target")
 def compute_target_size(
     image: Image.Image,
     original_size: Optional[Tuple[int, int]],
@@ -158,10 +479,10 @@ def compute_target_size(
         factor = max(0.01, float(down_factor or 1.0))
         width = max(1, int(image.width * factor))
         height = max(1, int(image.height * factor))
-        print(f"[Menezcale] Tamanho alvo por fator manual {factor}: {width}x{height}")
+        telemetry.debug(f"Tamanho alvo por fator manual {factor}: {width}x{height}")
         return width, height
 
-    print("[Menezcale] Sem tamanho original detectado e fator manual desativado; mantendo tamanho atual.")
+    telemetry.info("Sem tamanho original detectado e fator manual desativado; mantendo tamanho atual.")
     return image.width, image.height
 
 
@@ -170,88 +491,445 @@ def apply_downscale(
     down_method: str,
     target_size: Tuple[int, int],
     metadata: dict,
+) -> Image.Image:
+    """
+    Downscale with `down_method`. Checked for cancellation between stages;
+    once the current job (menezcale_cancel) is past its deadline the image
+    is redone with FALLBACK_METHOD, without a deadline.
+    """
+    down_method = resolve_down_method(down_method, image.size, target_size)
+    try:
+        menezcale_cancel.check()
+        return _downscale_with(image, down_method, target_size, metadata)
+    except menezcale_cancel.DeadlineExceeded:
+        telemetry.incr("deadline_fallback")
+        message = f"Prazo do job estourado em {down_method.split(' (')[0]}; usando {FALLBACK_METHOD.split(' (')[0]}."
+        # Num lote todas as imagens seguintes caem aqui: avisa uma vez por job.
+        (telemetry.debug if menezcale_cancel.degraded() else telemetry.warning)(message)
+        menezcale_cancel.mark_degraded()
+        with menezcale_cancel.no_deadline():
+            return _downscale_with(image, FALLBACK_METHOD, target_size, metadata)
+
+
+def _downscale_with(
+    image: Image.Image,
+    down_method: str,
+    target_size: Tuple[int, int],
+    metadata: dict,
 ) -> Image.Image:
     target_w, target_h = target_size
-    print(
-        f"[Menezcale] Downscale alvo {target_w}x{target_h} via {down_method}"
-    )
+    telemetry.debug(f"Downscale alvo {target_w}x{target_h} via {down_method}")
 
     method_key = down_method.lower()
 
-    if "lanczos" in method_key:
-        result = image.resize((target_w, target_h), resample=Image.Resampling.LANCZOS)
-    elif "bicubic" in method_key:
-        result = image.resize((target_w, target_h), resample=Image.Resampling.BICUBIC)
-    elif "fsrcnn" in method_key:
-        result = downscale_with_fsrcnn(image, target_w, target_h, metadata)
+    if "fsrcnn" in method_key:
+        with telemetry.stage("fsrcnn"):
+            result = downscale_with_fsrcnn(image, target_w, target_h, metadata)
     else:
-        result = image.resize((target_w, target_h), resample=Image.Resampling.LANCZOS)
+        with telemetry.stage("resize", method=down_method):
+            if "progressiv" in method_key:
+                result = downscale_progressive(image, target_w, target_h)
+            elif "lanczos" in method_key:
+                result = resize_with_engine(image, (target_w, target_h), down_method, Image.Resampling.LANCZOS)
+            elif "bicubic" in method_key:
+                result = resize_with_engine(image, (target_w, target_h), down_method, Image.Resampling.BICUBIC)
+            else:
+                result = resize_image(image, (target_w, target_h), Image.Resampling.LANCZOS)
 
     result.info = metadata.copy()
     return result
 
 
+def is_auto_method(down_method: str) -> bool:
+    return str(down_method or "").lower().startswith("auto")
+
+
+def resolve_down_method(down_method: str, source_size: Tuple[int, int], target_size: Tuple[int, int]) -> str:
+    """Concrete method for `down_method`; "Auto" picks one from the local calibration."""
+    if not is_auto_method(down_method):
+        return down_method
+    return menezcale_autoselect.choose_method(source_size, target_size)
+
+
+def downscale_progressive(image: Image.Image, target_w: int, target_h: int) -> Image.Image:
+    """
+    Pyramid downscale: one cheap integer box reduce (Image.reduce) to about
+    PROGRESSIVE_GAP x the target, then a single Lanczos pass. Much faster than
+    a plain Lanczos when the reduction factor is 4x-8x.
+    """
+    factor = int(min(image.width / (target_w * PROGRESSIVE_GAP), image.height / (target_h * PROGRESSIVE_GAP)))
+    source = image
+    if factor >= 2:
+        source = image.reduce(factor)
+        telemetry.debug(f"Redução progressiva /{factor} para {source.width}x{source.height}")
+        menezcale_cancel.check()
+    return resize_image(source, (target_w, target_h), Image.Resampling.LANCZOS)
+
+
+def apply_downscale_batch(
+    images: Sequence[Image.Image],
+    down_method: str,
+    target_sizes: Sequence[Tuple[int, int]],
+    metadatas: Sequence[dict],
+    max_workers: Optional[int] = None,
+) -> List[Image.Image]:
+    """
+    Run apply_downscale over a whole batch using a bounded thread pool.
+    Pillow releases the GIL inside resize, so Lanczos/Bicubic scale with cores.
+    FSRCNN runs sequentially because the upscaler model is shared.
+    """
+    if not images:
+        return []
+    menezcale_cancel.check(deadline=False)
+
+    if is_auto_method(down_method):
+        methods = [resolve_down_method(down_method, image.size, size) for image, size in zip(images, target_sizes)]
+        if len(set(methods)) > 1:
+            # Lote com tamanhos diferentes caiu em métodos diferentes (raro): em sequência.
+            return [
+                apply_downscale(image, method, target_size, metadata)
+                for image, method, target_size, metadata in zip(images, methods, target_sizes, metadatas)
+            ]
+        down_method = methods[0]
+
+    backend = resample_backend(down_method)
+    if backend.stacks:
+        return _apply_downscale_stacked(images, down_method, target_sizes, metadatas, backend)
+
+    # Fora do prazo cada imagem cai no Bicubic dentro de apply_downscale (threads).
+    if process_backend_enabled(images) and not menezcale_cancel.deadline_passed():
+        try:
+            return _apply_downscale_processes(images, down_method, target_sizes, metadatas, max_workers)
+        except menezcale_cancel.JobCancelled:
+            raise
+        except Exception as err:
+            telemetry.incr("process_backend_fallback")
+            telemetry.warning(f"Backend de processos falhou ({err}); usando threads.")
+
+    if "fsrcnn" in down_method.lower():
+        workers = 1
+    else:
+        workers = max_workers or os.cpu_count() or 1
+    workers = max(1, min(workers, len(images)))
+
+    if workers == 1:
+        return [
+            apply_downscale(image, down_method, target_size, metadata)
+            for image, target_size, metadata in zip(images, target_sizes, metadatas)
+        ]
+
+    telemetry.debug(f"Downscale em lote de {len(images)} imagens com {workers} threads")
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="menezcale") as executor:
+        return list(
+            executor.map(
+                menezcale_cancel.bind(apply_downscale),
+                images,
+                [down_method] * len(images),
+                target_sizes,
+                metadatas,
+            )
+        )
+
+
+def _apply_downscale_stacked(
+    images: Sequence[Image.Image],
+    down_method: str,
+    target_sizes: Sequence[Tuple[int, int]],
+    metadatas: Sequence[dict],
+    backend: menezcale_backends.ResampleBackend,
+) -> List[Image.Image]:
+    """Stacking backend: one resize call per (source size, mode, target size) group."""
+    groups = OrderedDict()
+    for index, (image, target_size) in enumerate(zip(images, target_sizes)):
+        groups.setdefault((image.size, image.mode, tuple(target_size)), []).append(index)
+
+    results: List[Optional[Image.Image]] = [None] * len(images)
+    for (_, mode, target_size), indices in groups.items():
+        menezcale_cancel.check(deadline=False)
+        group = [images[i] for i in indices]
+        stack = mode in backend.modes and len(group) > 1
+        if stack and not menezcale_cancel.deadline_passed():
+            telemetry.debug(
+                f"Motor {backend.name}: {len(group)} imagens empilhadas para {target_size[0]}x{target_size[1]}"
+            )
+            telemetry.incr(f"{backend.key}_engine_stack")
+            with telemetry.stage("resize", method=down_method, batch=len(group), backend=backend.key):
+                resized = backend.resize_stack(group, target_size, down_method)
+            for i, result in zip(indices, resized):
+                result.info = metadatas[i].copy()
+                results[i] = result
+        else:
+            for i in indices:
+                results[i] = apply_downscale(images[i], down_method, target_sizes[i], metadatas[i])
+    return results
+
+
+def process_backend_enabled(images: Sequence[Image.Image]) -> bool:
+    return (
+        len(images) > 1
+        and str(get_opt("menezcale_batch_backend", "Threads")).lower().startswith("proc")
+        and menezcale_procpool.supports(images)
+    )
+
+
+def _apply_downscale_processes(
+    images: Sequence[Image.Image],
+    down_method: str,
+    target_sizes: Sequence[Tuple[int, int]],
+    metadatas: Sequence[dict],
+    max_workers: Optional[int] = None,
+) -> List[Image.Image]:
+    """Warm process pool, pixels via shared memory; FSRCNN is loaded by path in each worker."""
+    fsrcnn_name = fsrcnn_path = None
+    if "fsrcnn" in down_method.lower():
+        upscaler = find_fsrcnn_upscaler()
+        if upscaler is not None:
+            fsrcnn_name = getattr(upscaler, "name", None)
+            fsrcnn_path = _upscaler_model_path(upscaler)
+    workers = max_workers or int(get_opt("menezcale_process_workers", 0)) or os.cpu_count() or 1
+    pool = menezcale_procpool.get_pool(workers, fsrcnn_name, fsrcnn_path)
+    telemetry.debug(f"Downscale em lote de {len(images)} imagens com {pool.workers} processos")
+    with telemetry.stage("resize", method=down_method, batch=len(images), backend="processes"):
+        return pool.map(
+            images,
+            down_method,
+            target_sizes,
+            metadatas,
+            on_poll=lambda: menezcale_cancel.check(deadline=False),
+            opts=worker_opts(),
+        )
+
+
 def downscale_with_fsrcnn(
     image: Image.Image,
     target_w: int,
     target_h: int,
     metadata: dict,
 ) -> Image.Image:
-    upscaler = find_fsrcnn_upscaler()
-    scale = min(target_w / image.width, target_h / image.height)
-    scale = max(scale, 0.01)
+    upscaler, model = get_fsrcnn_model()
 
     if upscaler:
         try:
-            print(
-                f"[Menezcale] Usando FSRCNN com fator aproximado {scale:.3f}"
+            model_scale = fsrcnn_model_scale(upscaler, model)
+            # Reduz para alvo/escala e deixa uma única passada do modelo chegar no alvo.
+            pre_size = (
+                max(1, round(target_w / model_scale)),
+                max(1, round(target_h / model_scale)),
             )
-            result = upscaler.upscale(image, scale)
+            source = image
+            if image.size != pre_size:
+                source = resize_image(image, pre_size, Image.Resampling.LANCZOS)
+            menezcale_cancel.check()
+            telemetry.debug(f"Usando FSRCNN x{model_scale} a partir de {pre_size[0]}x{pre_size[1]}")
+            if should_tile(process_working_bytes(source, model_scale)):
+                tile_side = tile_side_for_budget(tile_budget_bytes(), model_scale)
+                result = tiled_process(
+                    source,
+                    lambda tile: run_fsrcnn_model(upscaler, model, tile),
+                    model_scale,
+                    tile_side,
+                    overlap=int(get_opt("menezcale_tile_overlap", 16)),
+                    on_tile=menezcale_cancel.check,
+                )
+                stats = get_memory_stats()
+                telemetry.incr("tiled_fsrcnn")
+                telemetry.debug(
+                    f"FSRCNN em {stats['process_tiles']} tiles, "
+                    f"pico estimado {stats['process_peak_bytes'] / 2**20:.0f} MB"
+                )
+            else:
+                result = run_fsrcnn_model(upscaler, model, source)
             if result:
-                result = result.resize((target_w, target_h), Image.Resampling.LANCZOS)
+                if result.size != (target_w, target_h):
+                    # Só acontece quando o alvo não é múltiplo da escala do modelo.
+                    result = result.resize((target_w, target_h), Image.Resampling.LANCZOS)
                 result.info = metadata.copy()
                 return result
+        except (menezcale_cancel.JobCancelled, menezcale_cancel.DeadlineExceeded):
+            raise
         except Exception as err:
-            print(f"[Menezcale] Falha FSRCNN ({err}). Fallback para Lanczos.")
+            telemetry.warning(f"Falha FSRCNN ({err}). Fallback para Lanczos.")
 
-    result = image.resize((target_w, target_h), resample=Image.Resampling.LANCZOS)
+    telemetry.incr("fsrcnn_fallback")
+
+    result = resize_image(image, (target_w, target_h), Image.Resampling.LANCZOS)
     result.info = metadata.copy()
     return result
 
 
+def fsrcnn_model_scale(upscaler, model=None) -> int:
+    scale = getattr(model, "scale", None)
+    if isinstance(scale, int) and scale > 0:
+        return scale
+    match = re.search(r"x(\d+)", getattr(upscaler, "name", "") or "", re.IGNORECASE)
+    if match and int(match.group(1)) > 0:
+        return int(match.group(1))
+    return 2
+
+
+def _upscaler_model_path(upscaler) -> Optional[str]:
+    return getattr(upscaler, "local_data_path", None) or getattr(upscaler, "data_path", None)
+
+
+def get_fsrcnn_model():
+    """
+    Return (upscaler, model) for FSRCNN, resolving the upscaler and loading
+    its weights only once per process. Either item may be None.
+    """
+    if _fsrcnn_state["resolved"]:
+        return _fsrcnn_state["upscaler"], _fsrcnn_state["model"]
+
+    with _fsrcnn_lock:
+        if _fsrcnn_state["resolved"]:
+            return _fsrcnn_state["upscaler"], _fsrcnn_state["model"]
+
+        upscaler = find_fsrcnn_upscaler()
+        _fsrcnn_state["upscaler"] = upscaler
+        if upscaler is not None:
+            scaler = getattr(upscaler, "scaler", None)
+            path = _upscaler_model_path(upscaler)
+            if scaler is not None and path and hasattr(scaler, "load_model"):
+                try:
+                    _fsrcnn_state["model"] = scaler.load_model(path)
+                    telemetry.incr("fsrcnn_model_load")
+                    telemetry.info(f"Modelo FSRCNN carregado e mantido em memória ({path}).")
+                except Exception as err:
+                    telemetry.warning(f"Não foi possível manter o FSRCNN carregado ({err}).")
+        _fsrcnn_state["resolved"] = True
+        return upscaler, _fsrcnn_state["model"]
+
+
+def install_fsrcnn(upscaler, model) -> None:
+    """Use a pre-resolved upscaler/model (process workers load FSRCNN without the WebUI)."""
+    with _fsrcnn_lock:
+        _fsrcnn_state.update({"resolved": True, "upscaler": upscaler, "model": model})
+
+
+def reset_fsrcnn_cache() -> None:
+    """Forget the resolved upscaler/model (e.g. after the model list is refreshed)."""
+    with _fsrcnn_lock:
+        _fsrcnn_state.update({"resolved": False, "upscaler": None, "model": None})
+    menezcale_autoselect.invalidate_environment()
+
+
+def warmup_fsrcnn() -> bool:
+    """Resolve and load FSRCNN ahead of the first click. True if a model is ready."""
+    upscaler, model = get_fsrcnn_model()
+    if upscaler is None:
+        telemetry.info("Warm-up: nenhum upscaler FSRCNN encontrado.")
+        return False
+    return model is not None
+
+
+def run_fsrcnn_model(upscaler, model, image: Image.Image) -> Optional[Image.Image]:
+    """One model pass at the model's native scale."""
+    if model is not None and upscaler_utils and hasattr(upscaler_utils, "upscale_with_model"):
+        return upscaler_utils.upscale_with_model(
+            model,
+            image,
+            tile_size=get_opt("ESRGAN_tile", 192),
+            tile_overlap=get_opt("ESRGAN_tile_overlap", 8),
+        )
+
+    # WebUI sem upscale_with_model: do_upscale recarrega os pesos a cada chamada.
+    scaler = getattr(upscaler, "scaler", None)
+    if scaler is not None and hasattr(scaler, "do_upscale"):
+        return scaler.do_upscale(image, _upscaler_model_path(upscaler))
+    return None
+
+
 def apply_face_restore_if_enabled(
     image: Image.Image,
     metadata: dict,
 ) -> Image.Image:
-    if not face_restoration:
+    if not face_restoration or not shared:
         return image
 
     model_name = getattr(shared.opts, "face_restoration_model", None)
     if not model_name:
         return image
 
+    menezcale_cancel.check(deadline=False)
+    if _face_restore_past_deadline():
+        return image
     try:
-        restored = face_restoration.restore_faces(image)
-        if isinstance(restored, tuple):
-            restored = restored[0]
+        if face_regions_enabled():
+            with telemetry.stage("face_detect"):
+                regions = menezcale_faces.crop_regions(image.size, menezcale_faces.detect_faces(image))
+            if not regions:
+                telemetry.incr("face_restore_skipped")
+                telemetry.debug("Nenhum rosto detectado; face restoration ignorado.")
+                return image
+            menezcale_cancel.check(deadline=False)
+            if _face_restore_past_deadline():
+                return image
+            with telemetry.stage("face_restore", model=model_name, faces=len(regions)):
+                restored = menezcale_faces.restore_regions(image, regions, _restore_faces_pil)
+        else:
+            with telemetry.stage("face_restore", model=model_name):
+                restored = _restore_faces_pil(image)
         if restored is not None:
             restored.info = metadata.copy()
-            print(f"[Menezcale] GFPGAN/face restoration aplicado ({model_name}).")
+            telemetry.debug(f"GFPGAN/face restoration aplicado ({model_name}).")
             return restored
+    except menezcale_cancel.JobCancelled:
+        raise
     except Exception as err:
-        print(f"[Menezcale] Face restoration falhou ({err}).")
+        telemetry.incr("face_restore_failed")
+        telemetry.warning(f"Face restoration falhou ({err}).")
     return image
 
 
-def find_upscaler_by_name(name: str):
-    if not sd_upscalers:
+def face_restore_key() -> Optional[tuple]:
+    """
+    Everything that changes apply_face_restore_if_enabled's output (model,
+    CodeFormer weight, whole image vs face crops), for result cache keys;
+    None when face restoration is off.
+    """
+    model_name = get_opt("face_restoration_model", None)
+    if not model_name:
+        return None
+    # Só o CodeFormer lê o peso (fidelidade x qualidade); no GFPGAN ele não muda nada.
+    weight = get_opt("code_former_weight", 0.5) if "codeformer" in str(model_name).lower() else None
+    return (model_name, weight, face_regions_enabled())
+
+
+def _face_restore_past_deadline() -> bool:
+    """Past the job deadline the (slow) face restoration is skipped, like the Bicubic fallback."""
+    if not menezcale_cancel.deadline_passed():
+        return False
+    telemetry.incr("deadline_skip_face_restore")
+    telemetry.warning("Prazo do job estourado; face restoration ignorado.")
+    menezcale_cancel.mark_degraded()
+    return True
+
+
+def face_regions_enabled() -> bool:
+    """Restore only detected face crops (needs OpenCV); otherwise the whole image."""
+    mode = str(get_opt("menezcale_face_regions", "Imagem inteira")).lower()
+    return mode.startswith("só") and menezcale_faces.available()
+
+
+def _restore_faces_pil(image: Image.Image) -> Optional[Image.Image]:
+    """face_restoration.restore_faces works on RGB numpy arrays, not PIL images."""
+    import numpy as np
+
+    restored = face_restoration.restore_faces(np.asarray(image.convert("RGB")))
+    if isinstance(restored, tuple):
+        restored = restored[0]
+    if restored is None:
         return None
+    if isinstance(restored, Image.Image):
+        return restored
+    return Image.fromarray(np.asarray(restored, dtype=np.uint8))
+
+
+def find_upscaler_by_name(name: str):
     try:
-        if hasattr(sd_upscalers, "get_upscalers"):
-            for upscaler in sd_upscalers.get_upscalers():
-                if getattr(upscaler, "name", "").lower() == name.lower():
-                    return upscaler
-        if hasattr(sd_upscalers, "upscaler_for_name"):
+        for upscaler in _iter_upscalers():
+            if (getattr(upscaler, "name", "") or "").lower() == name.lower():
+                return upscaler
+        if sd_upscalers and hasattr(sd_upscalers, "upscaler_for_name"):
             upscaler = sd_upscalers.upscaler_for_name(name)
             if upscaler:
                 return upscaler
@@ -260,14 +938,19 @@ def find_upscaler_by_name(name: str):
     return None
 
 
+def _iter_upscalers():
+    if sd_upscalers and hasattr(sd_upscalers, "get_upscalers"):
+        yield from sd_upscalers.get_upscalers()
+    # A1111/Forge expõem a lista carregada em shared.sd_upscalers.
+    if shared is not None:
+        yield from getattr(shared, "sd_upscalers", None) or []
+
+
 def find_fsrcnn_upscaler():
-    if not sd_upscalers:
-        return None
     try:
-        if hasattr(sd_upscalers, "get_upscalers"):
-            for upscaler in sd_upscalers.get_upscalers():
-                if "fsrcnn" in getattr(upscaler, "name", "").lower():
-                    return upscaler
+        for upscaler in _iter_upscalers():
+            if "fsrcnn" in (getattr(upscaler, "name", "") or "").lower():
+                return upscaler
     except Exception:
         pass
 
@@ -275,6 +958,7 @@ def find_fsrcnn_upscaler():
     return find_upscaler_by_name("FSRCNN_x2")
 
 
+@telemetry.timed("copy")
 def safe_copy_image(image: Image.Image) -> Image.Image:
     try:
         img = image.copy()
@@ -284,6 +968,78 @@ def safe_copy_image(image: Image.Image) -> Image.Image:
         return image
 
 
+def image_view(image: Image.Image, info: Optional[dict] = None) -> Image.Image:
+    """
+    New Image object sharing `image`'s pixel buffer (no copy) with its own
+    info dict. Views are read-only by convention: every pipeline stage
+    returns a new image, and anything that edits pixels in place must call
+    .copy() first.
+    """
+    try:
+        image.load()
+        view = image._new(image.im)
+    except Exception:
+        return safe_copy_image(image)
+    view.info = dict(image.info if info is None else info)
+    return view
+
+
+# Lado máximo da amostra de pixels no hash (512² é ~1/16 de uma saída 2048²).
+FINGERPRINT_SAMPLE_SIDE = 512
+
+
+def image_fingerprint(image: Image.Image) -> str:
+    """
+    Content hash used to reuse results for the same image: mode, size and a
+    strided pixel sample (nearest-neighbour grid of at most
+    FINGERPRINT_SAMPLE_SIDE per side). Cheap enough to run on every call;
+    the Gradio panel decodes a fresh image per event, so there is no object
+    to memoize on.
+    """
+    import numpy as np
+
+    sample = image
+    if image.width > FINGERPRINT_SAMPLE_SIDE or image.height > FINGERPRINT_SAMPLE_SIDE:
+        sample = image.resize(
+            (min(image.width, FINGERPRINT_SAMPLE_SIDE), min(image.height, FINGERPRINT_SAMPLE_SIDE)),
+            Image.NEAREST,
+        )
+    # sha256 usa as instruções SHA da CPU e fica bem à frente do blake2b.
+    digest = hashlib.sha256(f"{image.mode}:{image.width}x{image.height}".encode())
+    digest.update(memoryview(np.asarray(sample).reshape(-1).view(np.uint8)))
+    return digest.hexdigest()[:32]
+
+
+# O preview do painel tem 256 px de altura; 384 dá folga para telas HiDPI.
+PREVIEW_MAX_SIDE = 384
+
+
+@telemetry.timed("preview_proxy")
+def preview_proxy(image: Image.Image, target_size: Tuple[int, int], max_side: int = PREVIEW_MAX_SIDE):
+    """
+    Small stand-in for `image` whose downscale to the returned target keeps
+    the same reduction ratio, with the target at most `max_side` px.
+    Uses JPEG draft decoding when the file is not loaded yet, otherwise an
+    integer box reduce. Returns (proxy, proxy_target_size).
+    """
+    factor = max(1, int(max(target_size) / max_side + 0.999))
+    if factor == 1:
+        return image, target_size
+    request = (max(1, image.width // factor), max(1, image.height // factor))
+    proxy = image
+    filename = getattr(image, "filename", "")
+    if getattr(image, "format", None) == "JPEG" and filename and getattr(image, "im", None) is None:
+        # Arquivo ainda não decodificado: decodifica direto em escala reduzida (DCT).
+        proxy = Image.open(filename)
+        proxy.draft("RGB", request)
+    if proxy.size != request:
+        reduce_by = max(1, min(proxy.width // request[0], proxy.height // request[1]))
+        proxy = proxy.reduce(reduce_by) if reduce_by > 1 else proxy
+    scale = proxy.width / image.width
+    proxy_target = (max(1, round(target_size[0] * scale)), max(1, round(target_size[1] * scale)))
+    return proxy, proxy_target
+
+
 def attach_base_metadata(
     metadata: dict,
     original_size: Optional[Tuple[int, int]],
@@ -308,10 +1064,4 @@ def is_hires_allowed(image: Optional[Image.Image], hires_available_flag: bool =
         return True
     if image is None:
         return False
-    info = getattr(image, "info", {}) or {}
-    if info.get("menezcale_hires_enabled"):
-        return True
-    params_text = info.get("parameters") or info.get("Parameters")
-    if params_text and re.search(r"hires", params_text, re.IGNORECASE):
-        return True
-    return False
+    return hires_from_info(getattr(image, "info", None))
@@ -0,0 +1,140 @@
+"""
+Imagem do primeiro passe (antes do Hires Fix).
+
+Com a opção ligada, process() envolve p.sample_hr_pass e guarda as imagens
+do primeiro passe, já no tamanho base (p.width x p.height), antes de o
+Hires começar. No postprocess cada uma é associada à saída final
+correspondente num armazenamento limitado (LRU com orçamento em bytes),
+com chave no hash do conteúdo da saída final (image_fingerprint).
+
+Quando o alvo do downscale é exatamente o tamanho do primeiro passe
+("Tamanho original"):
+- "Usar direto": devolve o primeiro passe, sem reamostrar nada;
+- "Misturar": mistura o primeiro passe com o downscale da saída final
+  (peso configurável), para recuperar parte do detalhe do Hires.
+
+Com upscaler latente o WebUI não decodifica o primeiro passe; aqui ele é
+decodificado pelo VAE só para ser guardado (uma passada a mais na GPU).
+"""
+
+from typing import Callable, List, Optional, Tuple
+
+from PIL import Image
+
+import menezcale_telemetry as telemetry
+from menezcale_core import get_opt, image_fingerprint, image_view
+from menezcale_result_cache import ResultCache
+
+MODES = ["Desligado", "Usar direto", "Misturar"]
+DEFAULT_BLEND = 0.5
+DEFAULT_BUDGET_MB = 256
+_CAPTURE_ATTR = "menezcale_firstpass"
+
+store = ResultCache(DEFAULT_BUDGET_MB * 1024 * 1024)
+
+
+def mode() -> str:
+    value = str(get_opt("menezcale_firstpass_mode", MODES[0]))
+    return value if value in MODES else MODES[0]
+
+
+def enabled() -> bool:
+    return mode() != MODES[0]
+
+
+def _to_pil(sample) -> Image.Image:
+    """Decoded VAE sample (C, H, W in [-1, 1]) to RGB, same rounding as the WebUI."""
+    import numpy as np
+
+    array = sample.float().cpu().numpy() if hasattr(sample, "cpu") else np.asarray(sample, dtype=np.float32)
+    array = np.clip((array + 1.0) / 2.0, 0.0, 1.0) * 255.0
+    return Image.fromarray(np.moveaxis(array, 0, 2).astype(np.uint8))
+
+
+def _decode_latents(p, samples):
+    from modules import devices, processing
+
+    return processing.decode_latent_batch(p.sd_model, samples, target_device=devices.cpu, check_for_nans=False)
+
+
+def install(p) -> bool:
+    """Wrap p.sample_hr_pass to keep the first-pass images on `p`. True if installed."""
+    original = getattr(p, "sample_hr_pass", None)
+    if not getattr(p, "enable_hr", False) or original is None or hasattr(p, _CAPTURE_ATTR):
+        return False
+    captured: List[Image.Image] = []
+    setattr(p, _CAPTURE_ATTR, captured)
+
+    def sample_hr_pass(samples, decoded_samples, *args, **kwargs):
+        try:
+            with telemetry.stage("firstpass_capture"):
+                decoded = decoded_samples if decoded_samples is not None else _decode_latents(p, samples)
+                captured.extend(_to_pil(sample) for sample in decoded)
+        except Exception as err:
+            telemetry.incr("firstpass_capture_failed")
+            telemetry.warning(f"Não foi possível guardar o primeiro passe ({err}).")
+        return original(samples, decoded_samples, *args, **kwargs)
+
+    p.sample_hr_pass = sample_hr_pass
+    return True
+
+
+def remember(p, images: List[Image.Image], index_of_first_image: int = 0) -> List[Optional[Image.Image]]:
+    """
+    Pair the captured first passes with the final `images` (skipping the grid
+    before index_of_first_image) and store them by final-image fingerprint.
+    Returns one first pass (or None) per entry of `images`.
+    """
+    captured = getattr(p, _CAPTURE_ATTR, None) or []
+    paired: List[Optional[Image.Image]] = [None] * len(images)
+    if not captured:
+        return paired
+    store.configure(get_opt("menezcale_firstpass_budget_mb", DEFAULT_BUDGET_MB) * 1024 * 1024)
+    for offset, first in enumerate(captured):
+        index = index_of_first_image + offset
+        if index >= len(images):
+            break
+        with telemetry.stage("fingerprint"):
+            fingerprint = image_fingerprint(images[index])
+        store.put(("firstpass_store", fingerprint), first)
+        paired[index] = first
+    # Libera a referência no `p` (que o WebUI ainda segura até o fim do job).
+    captured.clear()
+    telemetry.debug(f"Primeiro passe guardado para {sum(1 for first in paired if first is not None)} imagens.")
+    return paired
+
+
+def lookup(fingerprint: str, target_size: Tuple[int, int]) -> Optional[Image.Image]:
+    """Stored first pass for this final image, only when it is exactly the target size."""
+    if not enabled():
+        return None
+    first = store.get(("firstpass_store", fingerprint))
+    if first is None or first.size != tuple(target_size):
+        return None
+    return first
+
+
+def cache_key(down_method: str) -> tuple:
+    """What, besides the image and target, defines compose()'s output."""
+    if mode() == "Misturar":
+        return (mode(), float(get_opt("menezcale_firstpass_blend", DEFAULT_BLEND)), down_method)
+    return (mode(),)
+
+
+def compose(first: Image.Image, downscale: Callable[[], Image.Image], metadata: dict) -> Image.Image:
+    """
+    "Usar direto": the first pass itself (a view, no resample).
+    "Misturar": blend of downscale() and the first pass, weighted by the blend setting.
+    """
+    if mode() != "Misturar":
+        telemetry.incr("firstpass_direct")
+        return image_view(first, metadata.copy())
+
+    downscaled = downscale()
+    weight = min(1.0, max(0.0, float(get_opt("menezcale_firstpass_blend", DEFAULT_BLEND))))
+    with telemetry.stage("firstpass_blend", weight=weight):
+        first = first if first.mode == downscaled.mode else first.convert(downscaled.mode)
+        result = Image.blend(downscaled, first, weight)
+    telemetry.incr("firstpass_blend")
+    result.info = metadata.copy()
+    return result
@@ -0,0 +1,215 @@
+"""
+Histórico limitado das últimas gerações, sem cópias de pixels.
+
+- As imagens do WebUI são guardadas por referência; os metadados do
+  Menezcale ficam num dict próprio de cada entrada, então a imagem original
+  nunca é alterada.
+- get() devolve views (image_view) que compartilham o buffer: nenhuma
+  etapa do pipeline edita pixels no lugar, e quem precisar editar copia
+  antes (copy on write).
+- Passou do orçamento de bytes em memória: as gerações menos usadas vão
+  para PNG sem compressão numa pasta temporária e voltam ao serem lidas.
+  Passou do número máximo de gerações: a mais antiga é descartada.
+"""
+
+import atexit
+import itertools
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Sequence
+
+from PIL import Image
+
+import menezcale_telemetry as telemetry
+from menezcale_core import image_view
+from menezcale_tiling import image_nbytes
+
+DEFAULT_MAX_GENERATIONS = 8
+DEFAULT_BUDGET_BYTES = 512 * 1024 * 1024
+
+
+class _Slot:
+    """Uma imagem da geração: residente (image) ou em disco (path)."""
+
+    __slots__ = ("image", "path", "info", "nbytes")
+
+    def __init__(self, image: Image.Image, info: dict):
+        self.image: Optional[Image.Image] = image
+        self.path: Optional[str] = None
+        self.info = info
+        self.nbytes = image_nbytes(image)
+
+
+class _Generation:
+    __slots__ = ("gen_id", "created_at", "slots", "size", "tag")
+
+    def __init__(self, gen_id: int, slots: List[_Slot], tag: str = ""):
+        self.gen_id = gen_id
+        self.created_at = time.time()
+        self.slots = slots
+        self.size = slots[-1].image.size
+        self.tag = tag
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(slot.nbytes for slot in self.slots if slot.image is not None)
+
+    @property
+    def label(self) -> str:
+        stamp = time.strftime("%H:%M:%S", time.localtime(self.created_at))
+        count = len(self.slots)
+        return (
+            f"#{self.gen_id} {stamp} - {count} {'imagens' if count != 1 else 'imagem'} "
+            f"{self.size[0]}x{self.size[1]}{f' ({self.tag})' if self.tag else ''}"
+        )
+
+
+class ImageHistory:
+    def __init__(
+        self,
+        max_generations: int = DEFAULT_MAX_GENERATIONS,
+        budget_bytes: int = DEFAULT_BUDGET_BYTES,
+        spill: bool = True,
+    ):
+        self._lock = threading.RLock()
+        self._generations: "OrderedDict[int, _Generation]" = OrderedDict()
+        self._ids = itertools.count(1)
+        self._spill_dir: Optional[str] = None
+        self.max_generations = max_generations
+        self.budget_bytes = budget_bytes
+        self.spill = spill
+
+    def configure(self, max_generations: int, budget_bytes: int, spill: bool) -> None:
+        with self._lock:
+            self.max_generations = max(1, int(max_generations))
+            self.budget_bytes = max(0, int(budget_bytes))
+            self.spill = bool(spill)
+            self._enforce_limits()
+
+    # Escrita -----------------------------------------------------------------
+    def add(self, images: Sequence[Image.Image], infos: Sequence[dict], tag: str = "") -> Optional[int]:
+        """Store a generation by reference; `infos` are the per-image metadata dicts."""
+        if not images:
+            return None
+        slots = [_Slot(image, dict(info)) for image, info in zip(images, infos)]
+        with self._lock:
+            generation = _Generation(next(self._ids), slots, tag)
+            self._generations[generation.gen_id] = generation
+            self._enforce_limits()
+            return generation.gen_id
+
+    def clear(self) -> None:
+        with self._lock:
+            for generation in self._generations.values():
+                self._drop(generation)
+            self._generations.clear()
+
+    # Leitura -----------------------------------------------------------------
+    def latest_id(self) -> Optional[int]:
+        with self._lock:
+            return max(self._generations) if self._generations else None
+
+    def choices(self) -> List[str]:
+        """Labels ("#id hora - N imagens WxH"), newest first, for a dropdown."""
+        with self._lock:
+            generations = sorted(self._generations.values(), key=lambda gen: -gen.gen_id)
+            return [generation.label for generation in generations]
+
+    def resolve(self, selection) -> Optional[int]:
+        """Dropdown value (id or label) -> generation id; empty selects the latest."""
+        if selection in (None, ""):
+            return self.latest_id()
+        if isinstance(selection, int):
+            return selection
+        text = str(selection).lstrip("#").split(" ", 1)[0]
+        return int(text) if text.isdigit() else self.latest_id()
+
+    def get(self, gen_id: Optional[int]) -> List[Image.Image]:
+        """Views of the generation's images (empty if evicted); spilled images are reloaded."""
+        with self._lock:
+            generation = self._generations.get(gen_id) if gen_id is not None else None
+            if generation is None:
+                return []
+            self._generations.move_to_end(gen_id)
+            views = []
+            for slot in generation.slots:
+                if slot.image is None:
+                    slot.image = self._reload(slot)
+                    telemetry.incr("history_reload")
+                views.append(image_view(slot.image, slot.info))
+            self._enforce_limits(keep=gen_id)
+            return views
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "generations": len(self._generations),
+                "resident_bytes": sum(gen.resident_bytes for gen in self._generations.values()),
+                "spilled_images": sum(
+                    1 for gen in self._generations.values() for slot in gen.slots if slot.image is None
+                ),
+            }
+
+    # Limites -----------------------------------------------------------------
+    def _enforce_limits(self, keep: Optional[int] = None) -> None:
+        while len(self._generations) > self.max_generations:
+            _, generation = self._generations.popitem(last=False)
+            self._drop(generation)
+            telemetry.incr("history_evicted")
+
+        resident = sum(gen.resident_bytes for gen in self._generations.values())
+        # Do menos recente para o mais recente; a geração em uso nunca sai.
+        for gen_id in list(self._generations):
+            if resident <= self.budget_bytes:
+                break
+            if gen_id == keep or gen_id == next(reversed(self._generations)):
+                continue
+            generation = self._generations[gen_id]
+            freed = generation.resident_bytes
+            if self.spill and self._spill(generation):
+                telemetry.incr("history_spilled")
+            else:
+                del self._generations[gen_id]
+                self._drop(generation)
+                telemetry.incr("history_evicted")
+            resident -= freed
+
+    def _spill(self, generation: _Generation) -> bool:
+        try:
+            if self._spill_dir is None:
+                self._spill_dir = tempfile.mkdtemp(prefix="menezcale-history-")
+                atexit.register(shutil.rmtree, self._spill_dir, True)
+            for index, slot in enumerate(generation.slots):
+                if slot.image is None:
+                    continue
+                if slot.path is None:
+                    path = os.path.join(self._spill_dir, f"{generation.gen_id}-{index}.png")
+                    # Sem compressão: gravar rápido importa mais que o tamanho no disco.
+                    slot.image.save(path, format="PNG", compress_level=0)
+                    slot.path = path
+                slot.image = None
+            return True
+        except Exception as err:
+            telemetry.warning(f"Não foi possível mover o histórico para o disco ({err}).")
+            return False
+
+    @staticmethod
+    def _reload(slot: _Slot) -> Image.Image:
+        with Image.open(slot.path) as image:
+            image.load()
+            return image
+
+    @staticmethod
+    def _drop(generation: _Generation) -> None:
+        for slot in generation.slots:
+            slot.image = None
+            if slot.path:
+                try:
+                    os.remove(slot.path)
+                except OSError:
+                    pass
+                slot.path = None
@@ -0,0 +1,194 @@
+"""
+Pipeline do Menezcale sem UI: detecção do tamanho base, alvo, downscale e
+face restoration.
+
+Usado pelo painel (menezcale_script), pela API HTTP (menezcale_api) e
+pelos benchmarks; não importa Gradio nem `modules.scripts`.
+
+Com batch > 1 o WebUI coloca a grade no início de processed.images.
+find_grid a reconhece (marca do postprocess, index_of_first_image ou
+tamanho), as etapas pesadas rodam só nas imagens individuais e
+rebuild_grid monta uma grade nova a partir dos resultados já reduzidos.
+"""
+
+import math
+from typing import List, Optional, Sequence, Tuple
+
+from PIL import Image
+
+from menezcale_core import (
+    apply_downscale,
+    apply_downscale_batch,
+    apply_face_restore_if_enabled,
+    attach_base_metadata,
+    compute_target_size,
+    detect_original_size,
+)
+import menezcale_telemetry as telemetry
+
+Prepared = Tuple[dict, Optional[Tuple[int, int]], Tuple[int, int]]
+# Marca posta pelo postprocess no info (do histórico) da entrada que é a grade.
+GRID_INFO_KEY = "menezcale_grid"
+
+
+def find_grid(images: Sequence[Image.Image], index_of_first_image: Optional[int] = None) -> Optional[int]:
+    """
+    Index of the batch grid in `images`, or None. Checks the postprocess
+    marker, then processed.index_of_first_image (grid first), then size: a
+    first image tiled exactly by the (equal-sized) rest.
+    """
+    for index, image in enumerate(images):
+        if (getattr(image, "info", None) or {}).get(GRID_INFO_KEY):
+            return index
+    if index_of_first_image and 0 < index_of_first_image < len(images):
+        return 0
+    if len(images) >= 3:
+        first, rest = images[0], images[1:]
+        sizes = {image.size for image in rest}
+        if len(sizes) == 1:
+            width, height = sizes.pop()
+            if (
+                first.size != (width, height)
+                and first.width % width == 0
+                and first.height % height == 0
+                and (first.width // width) * (first.height // height) >= len(rest)
+            ):
+                return 0
+    return None
+
+
+def split_grid(
+    images: Sequence[Image.Image], index_of_first_image: Optional[int] = None
+) -> Tuple[Optional[Image.Image], List[Image.Image]]:
+    """(grid or None, individual images)."""
+    grid_index = find_grid(images, index_of_first_image)
+    if grid_index is None:
+        return None, list(images)
+    return images[grid_index], [image for index, image in enumerate(images) if index != grid_index]
+
+
+def rebuild_grid(
+    results: Sequence[Image.Image],
+    original_grid: Image.Image,
+    source_size: Tuple[int, int],
+) -> Optional[Image.Image]:
+    """
+    New grid from the downscaled `results` with the original grid's column
+    count (original grid width / `source_size`, the pre-downscale image size).
+    """
+    if not results:
+        return None
+    cell_w = max(image.width for image in results)
+    cell_h = max(image.height for image in results)
+    columns = max(1, min(len(results), round(original_grid.width / max(1, source_size[0]))))
+    rows = math.ceil(len(results) / columns)
+    with telemetry.stage("grid_rebuild", images=len(results)):
+        grid = Image.new(results[0].mode, (columns * cell_w, rows * cell_h))
+        for position, image in enumerate(results):
+            grid.paste(image, ((position % columns) * cell_w, (position // columns) * cell_h))
+    grid.info = {key: value for key, value in original_grid.info.items() if key != GRID_INFO_KEY}
+    telemetry.incr("grid_rebuilt")
+    return grid
+
+
+def prepare_target(
+    image: Image.Image,
+    p,
+    down_factor: float,
+    use_manual_down: bool,
+    use_auto_original: bool,
+    manual_width: int,
+    manual_height: int,
+) -> Prepared:
+    # Cópia rasa: a imagem de entrada pode ser uma view do histórico.
+    original_info = dict(getattr(image, "info", None) or {})
+
+    original_size = detect_original_size(
+        p=p,
+        image=image,
+        use_auto_original=use_auto_original,
+        manual_width=manual_width,
+        manual_height=manual_height,
+    )
+
+    attach_base_metadata(original_info, original_size, p)
+
+    target_size = compute_target_size(
+        image=image,
+        original_size=original_size,
+        down_factor=down_factor,
+        use_manual_down=use_manual_down,
+    )
+    return original_info, original_size, target_size
+
+
+def finish_image(
+    image: Image.Image,
+    original_info: dict,
+    original_size: Optional[Tuple[int, int]],
+    target_size: Tuple[int, int],
+    down_method: str,
+    use_manual_down: bool,
+) -> Image.Image:
+    image = apply_face_restore_if_enabled(image, original_info)
+
+    telemetry.debug(
+        f"Downscale para {target_size[0]}x{target_size[1]} aplicado "
+        f"com {down_method} "
+        f"(alvo {'original' if original_size else ('fator manual' if use_manual_down else 'tamanho atual')})"
+    )
+
+    # Reattach metadata for downstream consumers.
+    image.info.update(original_info)
+    return image
+
+
+def run_pipeline(
+    image: Image.Image,
+    p,
+    down_method: str,
+    down_factor: float,
+    use_manual_down: bool,
+    use_auto_original: bool,
+    manual_width: int,
+    manual_height: int,
+) -> Image.Image:
+    original_info, original_size, target_size = prepare_target(
+        image, p, down_factor, use_manual_down, use_auto_original, manual_width, manual_height
+    )
+
+    image = apply_downscale(image, down_method, target_size, original_info)
+    return finish_image(image, original_info, original_size, target_size, down_method, use_manual_down)
+
+
+def run_pipeline_batch(
+    images: List[Image.Image],
+    p,
+    down_method: str,
+    down_factor: float,
+    use_manual_down: bool,
+    use_auto_original: bool,
+    manual_width: int,
+    manual_height: int,
+) -> List[Image.Image]:
+    """
+    Mesmo fluxo de run_pipeline para várias imagens: detecção e alvo são
+    sequenciais (baratos), o downscale roda em paralelo e o face restore
+    volta a ser sequencial (modelo compartilhado).
+    """
+    prepared = [
+        prepare_target(image, p, down_factor, use_manual_down, use_auto_original, manual_width, manual_height)
+        for image in images
+    ]
+
+    downscaled = apply_downscale_batch(
+        images,
+        down_method,
+        [target_size for _, _, target_size in prepared],
+        [original_info for original_info, _, _ in prepared],
+    )
+
+    return [
+        finish_image(image, original_info, original_size, target_size, down_method, use_manual_down)
+        for image, (original_info, original_size, target_size) in zip(downscaled, prepared)
+    ]
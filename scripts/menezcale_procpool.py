@@ -0,0 +1,250 @@
+"""
+Backend de processos para o downscale em lote.
+
+Threads esbarram no GIL nas partes em Python do pipeline (metadados,
+pré/pós do FSRCNN); processos comuns pagam para serializar imagens de
+vários MB. Aqui os pixels vão e voltam por multiprocessing.shared_memory
+e pelo pipe só passam descritores pequenos (nome do buffer, modo, tamanho,
+método, alvo).
+
+- Workers ficam vivos entre lotes. Com FSRCNN, cada um carrega o modelo
+  uma vez pelo caminho do arquivo (spandrel + torch na CPU, uma thread
+  por worker), sem importar o WebUI.
+- O processo principal aloca os buffers de entrada e de saída e os libera;
+  no máximo 2x workers imagens ficam em voo.
+- Face restoration continua no processo principal (precisa do WebUI).
+- O worker não tem shared.opts: os ajustes que mudam o downscale (motor,
+  tiles; menezcale_core.WORKER_OPTS) vão no descritor de cada tarefa.
+- map() chama `on_poll` enquanto espera os resultados (o core passa o
+  check() do menezcale_cancel); se ele levantar, o que ainda não começou é
+  cancelado e os buffers são liberados.
+
+Os workers usam spawn (fork herdaria CUDA/threads do WebUI). Como em todo
+spawn, cada worker importa o módulo principal do launcher como
+__mp_main__ (sem rodar o main() dele), uma vez por pool. A configuração
+do worker, inclusive o MENEZCALE_NO_WEBUI que mantém o menezcale_core
+longe de `modules`, vai pelo initializer: nada do processo principal é
+alterado.
+"""
+
+import os
+import sys
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import get_context, shared_memory
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from PIL import Image
+
+import menezcale_telemetry as telemetry
+
+SUPPORTED_MODES = ("L", "RGB", "RGBA")
+# Bytes por pixel no buffer compartilhado (layout de Image.tobytes()).
+_MODE_BANDS = {"L": 1, "RGB": 3, "RGBA": 4}
+# Intervalo (s) entre chamadas de on_poll enquanto nenhum resultado chega.
+POLL_SECONDS = 0.25
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Estado do worker ----------------------------------------------------------------
+_worker_ready = False
+
+
+class _SpandrelScaler:
+    """Mesma interface de Upscaler.scaler usada por run_fsrcnn_model, sobre um modelo spandrel."""
+
+    def __init__(self, model):
+        self.model = model
+
+    def do_upscale(self, img: Image.Image, path: Optional[str]) -> Image.Image:
+        import numpy as np
+        import torch
+
+        pixels = np.asarray(img.convert("RGB"), dtype=np.float32) / 255.0
+        tensor = torch.from_numpy(pixels).permute(2, 0, 1).unsqueeze(0)
+        with torch.inference_mode():
+            output = self.model(tensor)
+        output = output.squeeze(0).permute(1, 2, 0).clamp(0, 1).mul(255).round().byte().numpy()
+        return Image.fromarray(output)
+
+
+class _WorkerUpscaler:
+    def __init__(self, name: str, path: str, model):
+        self.name = name
+        self.data_path = path
+        self.scaler = _SpandrelScaler(model)
+
+
+def _init_worker(scripts_dir: str, fsrcnn_name: Optional[str], fsrcnn_path: Optional[str], log_level: str):
+    global _worker_ready
+    # Antes do primeiro import do menezcale_core neste processo.
+    os.environ["MENEZCALE_NO_WEBUI"] = "1"
+    if scripts_dir not in sys.path:
+        sys.path.append(scripts_dir)
+    import menezcale_core
+    import menezcale_telemetry
+
+    menezcale_telemetry.set_log_level(log_level)
+    if fsrcnn_path:
+        try:
+            import torch
+            from spandrel import ModelLoader
+
+            # N workers x N threads do torch só disputariam os mesmos núcleos.
+            torch.set_num_threads(1)
+            model = ModelLoader(device="cpu").load_from_file(fsrcnn_path).eval()
+            menezcale_core.install_fsrcnn(_WorkerUpscaler(fsrcnn_name, fsrcnn_path, model), model)
+        except Exception as err:
+            menezcale_telemetry.warning(f"Worker sem FSRCNN ({err}); usando Lanczos.")
+            menezcale_core.install_fsrcnn(None, None)
+    else:
+        menezcale_core.install_fsrcnn(None, None)
+    _worker_ready = True
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    # Workers de spawn herdam o resource_tracker do processo principal, que é
+    # o dono dos buffers: o registro repetido aqui é idempotente e o unlink
+    # do principal é o único a removê-lo.
+    return shared_memory.SharedMemory(name=name)
+
+
+def _worker_downscale(descriptor: tuple) -> Tuple[str, Tuple[int, int]]:
+    in_name, mode, size, out_name, down_method, target_size, opts = descriptor
+    import menezcale_core
+
+    menezcale_core.install_worker_opts(opts)
+    source = _attach(in_name)
+    output = _attach(out_name)
+    try:
+        image = Image.frombytes(mode, size, source.buf[: size[0] * size[1] * _MODE_BANDS[mode]])
+        result = menezcale_core.apply_downscale(image, down_method, target_size, {})
+        if result.mode not in SUPPORTED_MODES:
+            result = result.convert("RGB")
+        data = result.tobytes()
+        output.buf[: len(data)] = data
+        return result.mode, result.size
+    finally:
+        source.close()
+        output.close()
+
+
+def _noop() -> bool:
+    return _worker_ready
+
+
+# Processo principal ----------------------------------------------------------------
+class ProcessDownscalePool:
+    def __init__(self, workers: int, fsrcnn_name: Optional[str] = None, fsrcnn_path: Optional[str] = None):
+        self.workers = max(1, int(workers))
+        self.fsrcnn_path = fsrcnn_path
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(
+                os.path.dirname(os.path.abspath(__file__)),
+                fsrcnn_name,
+                fsrcnn_path,
+                telemetry.get_log_level(),
+            ),
+        )
+        # Sobe todos os workers agora (com o modelo carregado), não no primeiro lote.
+        wait([self._executor.submit(_noop) for _ in range(self.workers)])
+
+    def map(
+        self,
+        images: Sequence[Image.Image],
+        down_method: str,
+        target_sizes: Sequence[Tuple[int, int]],
+        metadatas: Sequence[dict],
+        on_poll: Optional[Callable[[], None]] = None,
+        opts: Optional[dict] = None,
+    ) -> List[Image.Image]:
+        """
+        Downscale `images` in the workers, in order, with get_opt returning
+        `opts` there. `on_poll` runs between submissions and at least every
+        POLL_SECONDS while waiting; an exception from it cancels the images
+        not started yet and propagates.
+        """
+        opts = dict(opts or {})
+        results: List[Optional[Image.Image]] = [None] * len(images)
+        in_flight = {}
+        max_in_flight = self.workers * 2
+
+        def collect(futures):
+            for future in futures:
+                index, source, output = in_flight.pop(future)
+                try:
+                    mode, size = future.result()
+                    nbytes = size[0] * size[1] * _MODE_BANDS[mode]
+                    result = Image.frombytes(mode, size, output.buf[:nbytes])
+                    result.info = metadatas[index].copy()
+                    results[index] = result
+                finally:
+                    for shm in (source, output):
+                        shm.close()
+                        shm.unlink()
+
+        def wait_for(limit: int):
+            while len(in_flight) > limit:
+                if on_poll is not None:
+                    on_poll()
+                done, _ = wait(list(in_flight), timeout=POLL_SECONDS, return_when=FIRST_COMPLETED)
+                collect(done)
+
+        try:
+            for index, (image, target_size) in enumerate(zip(images, target_sizes)):
+                wait_for(max_in_flight - 1)
+                source, output = self._share(image, target_size)
+                descriptor = (source.name, image.mode, image.size, output.name, down_method, target_size, opts)
+                in_flight[self._executor.submit(_worker_downscale, descriptor)] = (index, source, output)
+            wait_for(0)
+        finally:
+            # Cancelado ou com erro: o que ainda está na fila nem começa. Um worker
+            # que já começou termina sozinho; o buffer dele some quando ele fechar.
+            for future in in_flight:
+                future.cancel()
+            for _, source, output in in_flight.values():
+                for shm in (source, output):
+                    shm.close()
+                    shm.unlink()
+        return results
+
+    @staticmethod
+    def _share(image: Image.Image, target_size: Tuple[int, int]):
+        data = image.tobytes()
+        source = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+        source.buf[: len(data)] = data
+        del data
+        # Saída no pior caso (4 bandas): o FSRCNN pode devolver outro modo.
+        output = shared_memory.SharedMemory(create=True, size=max(1, target_size[0] * target_size[1] * 4))
+        return source, output
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+def supports(images: Sequence[Image.Image]) -> bool:
+    return all(image.mode in SUPPORTED_MODES for image in images)
+
+
+def get_pool(workers: int, fsrcnn_name: Optional[str] = None, fsrcnn_path: Optional[str] = None) -> ProcessDownscalePool:
+    """Warm pool shared across batches; rebuilt when the worker count or FSRCNN model changes."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or (_pool.workers, _pool.fsrcnn_path) != (max(1, int(workers)), fsrcnn_path):
+            if _pool is not None:
+                _pool.shutdown()
+            telemetry.info(f"Iniciando {workers} workers de processo para o downscale em lote.")
+            _pool = ProcessDownscalePool(workers, fsrcnn_name, fsrcnn_path)
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
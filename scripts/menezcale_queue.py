@@ -0,0 +1,113 @@
+"""
+Fila do downscale automático em segundo plano.
+
+O postprocess só prepara o alvo (barato) e enfileira; downscale e face
+restoration rodam num pool pequeno de threads enquanto a GPU já gera o
+próximo lote. Resultados são gravados ao lado das saídas do WebUI e
+entram no histórico do painel.
+
+- Backpressure: no máximo `max_pending` imagens na fila; acima disso o
+  enfileiramento espera uma vaga (memória limitada) em vez de acumular.
+- Cancelamento: com o Interrupt do WebUI (ou o "Cancelar" do painel),
+  jobs ainda não iniciados são cancelados e os em andamento param entre
+  etapas (menezcale_cancel).
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+import menezcale_cancel
+import menezcale_telemetry as telemetry
+from menezcale_cancel import JobCancelled, interrupted
+
+DEFAULT_WORKERS = 1
+DEFAULT_MAX_PENDING = 8
+# Intervalo para reavaliar o Interrupt enquanto espera vaga na fila.
+_WAIT_SLICE_SECONDS = 0.25
+
+
+class DownscaleQueue:
+    def __init__(self, workers: int = DEFAULT_WORKERS, max_pending: int = DEFAULT_MAX_PENDING):
+        self.workers = max(1, int(workers))
+        self.max_pending = max(1, int(max_pending))
+        self._slots = threading.Semaphore(self.max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="menezcale-auto")
+        self._lock = threading.Lock()
+        self._pending = set()
+
+    def submit(self, fn: Callable, *args) -> Optional[Future]:
+        """
+        Queue fn(*args), waiting for a free slot while the queue is full.
+        Returns None when the WebUI was interrupted while waiting.
+        """
+        while not self._slots.acquire(timeout=_WAIT_SLICE_SECONDS):
+            if interrupted():
+                self.cancel_pending()
+                return None
+        telemetry.incr("auto_queued")
+        future = self._executor.submit(self._run, fn, args)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._release)
+        return future
+
+    def _run(self, fn, args):
+        if interrupted():
+            raise JobCancelled()
+        return fn(*args)
+
+    def _release(self, future: Future) -> None:
+        with self._lock:
+            self._pending.discard(future)
+        self._slots.release()
+        if future.cancelled():
+            telemetry.incr("auto_cancelled")
+            return
+        err = future.exception()
+        if isinstance(err, JobCancelled):
+            telemetry.incr("auto_cancelled")
+        elif err is not None:
+            telemetry.incr("auto_failed")
+            telemetry.warning(f"Downscale automático falhou ({err}).")
+        else:
+            telemetry.incr("auto_done")
+
+    def cancel_pending(self) -> int:
+        """Cancel every job that has not started yet; returns how many."""
+        with self._lock:
+            pending = list(self._pending)
+        cancelled = sum(1 for future in pending if future.cancel())
+        if cancelled:
+            telemetry.info(f"Downscale automático: {cancelled} imagens canceladas.")
+        return cancelled
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def shutdown(self, wait: bool = True, cancel: bool = True) -> None:
+        if cancel:
+            self.cancel_pending()
+        self._executor.shutdown(wait=wait)
+
+
+_queue: Optional[DownscaleQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_queue(workers: int = DEFAULT_WORKERS, max_pending: int = DEFAULT_MAX_PENDING) -> DownscaleQueue:
+    """Shared queue; rebuilt (after draining the old one) when the settings change."""
+    global _queue
+    with _queue_lock:
+        if _queue is None or (_queue.workers, _queue.max_pending) != (max(1, int(workers)), max(1, int(max_pending))):
+            old, _queue = _queue, DownscaleQueue(workers, max_pending)
+            if old is not None:
+                # Jobs já enfileirados na fila antiga terminam normalmente.
+                old.shutdown(wait=False, cancel=False)
+        return _queue
+
+
+def check_cancelled() -> None:
+    """Raise JobCancelled between stages once the job was cancelled (the deadline is handled by the stages)."""
+    menezcale_cancel.check(deadline=False)
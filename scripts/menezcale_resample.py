@@ -0,0 +1,239 @@
+"""
+Motor opcional de reamostragem separável em NumPy.
+
+Os pesos do filtro (Lanczos/Bicubic, mesma definição do Pillow) são
+calculados uma vez por (origem, destino, método) e guardados num LRU em
+forma de banda: para cada pixel de saída, só os `taps` pixels de origem
+que o filtro alcança. Cada eixo roda em blocos de BAND_BLOCK pixels de
+saída, cada um um matmul (BLAS) só sobre o trecho de origem que o bloco
+alcança: o custo por pixel de saída acompanha o suporte do filtro, não a
+largura da origem como numa matriz densa. A pilha inteira de imagens do
+mesmo tamanho vai de uma vez. RGBA é reamostrado
+com alpha pré-multiplicado, como o Pillow faz, para a cor de pixels
+transparentes não vazar pelas bordas.
+
+A aritmética segue a do Pillow (Resample.c): coeficientes em ponto fixo
+de PRECISION_BITS bits, arredondamento "meio para cima" e 8 bits entre
+as passadas. L/RGB rodam em float32 (no máximo 1 de diferença para o
+Image.resize); RGBA roda em float64, em que as somas desses coeficientes
+são exatas, porque o pré-multiplicado precisa sair idêntico: com alpha
+baixo, 1 de diferença nele vira dezenas na cor. Compensa em lotes grandes de
+imagens iguais e máquinas com muitos núcleos; numa imagem isolada o Pillow
+costuma ser mais rápido (veja benchmarks/bench_resample.py).
+"""
+
+from functools import lru_cache
+from typing import List, Sequence, Tuple
+
+from PIL import Image
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SUPPORTED_MODES = ("L", "RGB", "RGBA")
+# Limite da pilha (float32; float64 em RGBA) por bloco processado.
+DEFAULT_MAX_STACK_BYTES = 512 * 1024 * 1024
+WEIGHTS_CACHE_SIZE = 32
+# Pixels de saída por bloco denso da banda (matmul/BLAS em cada bloco).
+BAND_BLOCK = 64
+# Bits fracionários dos coeficientes 8 bpc do Pillow (32 - 8 - 2).
+PRECISION_BITS = 22
+
+
+def _lanczos(x):
+    out = np.sinc(x) * np.sinc(x / 3.0)
+    out[(x < -3.0) | (x >= 3.0)] = 0.0
+    return out
+
+
+def _bicubic(x):
+    # Mesmo kernel do Pillow (a = -0.5).
+    a = -0.5
+    x = np.abs(x)
+    near = ((a + 2.0) * x - (a + 3.0)) * x * x + 1.0
+    far = (((x - 5.0) * x + 8.0) * x - 4.0) * a
+    return np.where(x < 1.0, near, np.where(x < 2.0, far, 0.0))
+
+
+_FILTERS = {
+    "lanczos": (_lanczos, 3.0),
+    "bicubic": (_bicubic, 2.0),
+}
+
+
+def available() -> bool:
+    return np is not None
+
+
+def method_key(down_method: str):
+    """'lanczos'/'bicubic' when the engine supports the method, else None."""
+    key = down_method.lower()
+    for name in _FILTERS:
+        if name in key:
+            return name
+    return None
+
+
+@lru_cache(maxsize=WEIGHTS_CACHE_SIZE)
+def filter_weights(src: int, dst: int, method: str):
+    """
+    Banded weights for one axis, following Pillow's precompute_coeffs
+    (antialiased support when downscaling) and normalize_coeffs_8bpc (each
+    weight is a PRECISION_BITS fixed-point value): (indices, weights), both
+    (dst, taps), weights float64; output pixel j = sum_k src[indices[j, k]]
+    * weights[j, k].
+    """
+    kernel, support = _FILTERS[method]
+    scale = src / dst
+    filterscale = max(scale, 1.0)
+    support = support * filterscale
+    taps = int(np.ceil(support)) * 2 + 1
+
+    centers = (np.arange(dst) + 0.5) * scale
+    xmin = np.maximum((centers - support + 0.5).astype(np.int64), 0)
+    xcount = np.minimum((centers + support + 0.5).astype(np.int64), src) - xmin
+
+    offsets = np.arange(taps)
+    positions = xmin[:, None] + offsets[None, :]
+    weights = kernel((positions - centers[:, None] + 0.5) * (1.0 / filterscale))
+    weights[offsets[None, :] >= xcount[:, None]] = 0.0
+    # Soma na ordem dos taps, como o laço do Pillow (o arredondamento da soma muda o coeficiente).
+    totals = np.zeros((dst, 1))
+    for tap in range(taps):
+        totals[:, 0] += weights[:, tap]
+    weights = np.divide(weights, totals, out=np.zeros_like(weights), where=totals != 0)
+    one = float(1 << PRECISION_BITS)
+    weights = np.trunc(weights * one + np.where(weights < 0, -0.5, 0.5)) / one
+
+    # Taps fora da origem têm peso zero; o índice só precisa ser válido.
+    indices = np.minimum(positions, src - 1)
+    indices.setflags(write=False)
+    weights.setflags(write=False)
+    return indices, weights
+
+
+@lru_cache(maxsize=WEIGHTS_CACHE_SIZE)
+def band_blocks(src: int, dst: int, method: str, block: int = BAND_BLOCK, dtype: str = "float32"):
+    """
+    filter_weights cut into dense pieces of `block` output pixels, each over
+    only the source range those outputs reach: (out_start, out_end,
+    in_start, in_end, (in_len, out_len) `dtype` matrix) tuples.
+    """
+    indices, weights = filter_weights(src, dst, method)
+    blocks = []
+    for out_start in range(0, dst, block):
+        out_end = min(dst, out_start + block)
+        idx = indices[out_start:out_end]
+        w = weights[out_start:out_end]
+        used = idx[w != 0]
+        in_start = int(used.min()) if used.size else 0
+        in_end = int(used.max()) + 1 if used.size else 1
+        matrix = np.zeros((in_end - in_start, out_end - out_start), dtype=dtype)
+        cols = np.repeat(np.arange(out_end - out_start), idx.shape[1])
+        # Taps de peso zero podem cair fora do trecho: cortados, não somam nada.
+        np.add.at(matrix, (np.clip(idx - in_start, 0, in_end - in_start - 1).ravel(), cols), w.ravel())
+        matrix.setflags(write=False)
+        blocks.append((out_start, out_end, in_start, in_end, matrix))
+    return tuple(blocks)
+
+
+def _round8(stack) -> None:
+    """In place, Pillow's clip8: round half up, then clamp to 0..255."""
+    stack += 0.5
+    np.floor(stack, out=stack)
+    np.clip(stack, 0.0, 255.0, out=stack)
+
+
+def _resample_stack(stack, size: Tuple[int, int], method: str):
+    """
+    stack: (N, C, H, W) float32/float64 -> (N, C, dst_h, dst_w), same dtype,
+    8-bit values after each pass (Pillow keeps each pass in 8 bits).
+    """
+    src_h, src_w = stack.shape[2:]
+    dst_w, dst_h = size
+    dtype = stack.dtype.name
+    if dst_w != src_w:
+        out = np.empty(stack.shape[:3] + (dst_w,), dtype=dtype)
+        for out_start, out_end, in_start, in_end, matrix in band_blocks(src_w, dst_w, method, dtype=dtype):
+            out[..., out_start:out_end] = stack[..., in_start:in_end] @ matrix
+        stack = out
+        _round8(stack)
+    if dst_h != src_h:
+        out = np.empty(stack.shape[:2] + (dst_h, stack.shape[3]), dtype=dtype)
+        for out_start, out_end, in_start, in_end, matrix in band_blocks(src_h, dst_h, method, dtype=dtype):
+            out[..., out_start:out_end, :] = matrix.T @ stack[..., in_start:in_end, :]
+        stack = out
+        _round8(stack)
+    return stack
+
+
+def _premultiply(stack) -> None:
+    """RGBA (N, H, W, 4) in place: RGB = round(RGB * alpha / 255), Pillow's RGBA -> RGBa."""
+    stack[..., :3] *= stack[..., 3:] / 255.0
+    np.rint(stack[..., :3], out=stack[..., :3])
+
+
+def _unpremultiply(stack) -> None:
+    """
+    Pillow's RGBa -> RGBA on the 8-bit values: RGB = min(255, 255 * RGB //
+    alpha), unchanged where alpha is 0 or 255.
+    """
+    alpha = stack[..., 3:]
+    scaled = np.floor(stack[..., :3] * 255.0 / np.where(alpha > 0, alpha, 1.0))
+    np.minimum(scaled, 255.0, out=scaled)
+    stack[..., :3] = np.where((alpha > 0) & (alpha < 255), scaled, stack[..., :3])
+
+
+def resize_stack(
+    images: Sequence[Image.Image],
+    size: Tuple[int, int],
+    down_method: str,
+    max_stack_bytes: int = DEFAULT_MAX_STACK_BYTES,
+) -> List[Image.Image]:
+    """
+    Resize images that share size and mode to `size` in stacked blocks.
+    Raises ValueError for unsupported modes/methods or mixed sizes.
+    """
+    if np is None:
+        raise ValueError("NumPy indisponível")
+    method = method_key(down_method)
+    if method is None:
+        raise ValueError(f"Método sem suporte no motor NumPy: {down_method}")
+    if not images:
+        return []
+    if all(img.size == tuple(size) for img in images):
+        # Como o Image.resize: mesmo tamanho é cópia (o pré-multiplicado perderia cor).
+        return [img.copy() for img in images]
+
+    first = images[0]
+    if first.mode not in SUPPORTED_MODES:
+        raise ValueError(f"Modo sem suporte no motor NumPy: {first.mode}")
+    if any(img.size != first.size or img.mode != first.mode for img in images):
+        raise ValueError("resize_stack exige imagens do mesmo tamanho e modo")
+
+    bands = len(first.getbands())
+    dtype = np.float64 if first.mode == "RGBA" else np.float32
+    per_image = first.width * first.height * bands * np.dtype(dtype).itemsize
+    chunk = max(1, int(max_stack_bytes // max(per_image, 1)))
+
+    results: List[Image.Image] = []
+    for start in range(0, len(images), chunk):
+        block = images[start:start + chunk]
+        stack = np.stack([np.asarray(img, dtype=dtype) for img in block])
+        if stack.ndim == 3:
+            stack = stack[..., None]
+        if first.mode == "RGBA":
+            _premultiply(stack)
+        # NCHW: as duas passadas viram matmul sobre os dois últimos eixos.
+        out = _resample_stack(np.ascontiguousarray(stack.transpose(0, 3, 1, 2)), size, method)
+        out = out.transpose(0, 2, 3, 1)
+        if first.mode == "RGBA":
+            _unpremultiply(out)
+        out = out.astype(np.uint8)
+        for pixels in out:
+            if bands == 1:
+                pixels = pixels[..., 0]
+            results.append(Image.fromarray(np.ascontiguousarray(pixels)))
+    return results
@@ -0,0 +1,75 @@
+"""
+Cache de resultados endereçado por conteúdo.
+
+As chaves começam pelo hash do conteúdo da imagem de entrada
+(image_fingerprint) e seguem com o que define cada etapa: o downscale usa
+(método, tamanho alvo, motor) e o resultado final acrescenta as opções de
+face restoration (modelo, peso do CodeFormer, rostos ou imagem inteira).
+Trocar só o face restore reaproveita o downscale; voltar a um ajuste
+anterior devolve o resultado na hora.
+
+LRU com orçamento em bytes (tamanho dos pixels). get() devolve views
+(image_view), então quem recebe pode mexer no info sem afetar o cache.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from PIL import Image
+
+import menezcale_telemetry as telemetry
+from menezcale_core import image_view
+from menezcale_tiling import image_nbytes
+
+DEFAULT_BUDGET_BYTES = 512 * 1024 * 1024
+
+
+class ResultCache:
+    def __init__(self, budget_bytes: int = DEFAULT_BUDGET_BYTES):
+        self.budget_bytes = budget_bytes
+        self._entries: "OrderedDict[tuple, Image.Image]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def configure(self, budget_bytes: int) -> None:
+        with self._lock:
+            self.budget_bytes = max(0, int(budget_bytes))
+            self._evict()
+
+    def get(self, key: tuple) -> Optional[Image.Image]:
+        with self._lock:
+            image = self._entries.get(key)
+            if image is not None:
+                self._entries.move_to_end(key)
+        telemetry.incr(f"result_cache_{'hit' if image is not None else 'miss'}_{key[0]}")
+        return image_view(image) if image is not None else None
+
+    def put(self, key: tuple, image: Image.Image) -> None:
+        size = image_nbytes(image)
+        if size > self.budget_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= image_nbytes(previous)
+            self._entries[key] = image_view(image)
+            self._bytes += size
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._bytes > self.budget_bytes and self._entries:
+            _, image = self._entries.popitem(last=False)
+            self._bytes -= image_nbytes(image)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "budget_bytes": self.budget_bytes}
+
+
+results = ResultCache()
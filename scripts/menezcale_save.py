@@ -0,0 +1,196 @@
+"""
+Gravação e codificação dos resultados.
+
+- build_pnginfo: metadados anexados pelo pipeline (`parameters` e
+  menezcale_*) viram chunks de texto do PNG; em JPEG/WebP o `parameters`
+  vai para o EXIF UserComment, como o WebUI faz.
+- save_image: PNG com nível de compressão configurável (o padrão do
+  Pillow, 6, é lento em imagens grandes) ou WebP/JPEG.
+- save_async: mesma coisa numa thread própria, para não segurar o request.
+- encode_preview: caminho rápido para o navegador (JPEG/WebP num arquivo
+  temporário); o Gradio serve o arquivo sem reencodar em PNG. Só para
+  previews: é com perdas.
+- encode_result: resultado final para o navegador, PNG sem perdas com os
+  metadados e compressão rápida, no mesmo diretório temporário.
+"""
+
+import atexit
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+
+import menezcale_telemetry as telemetry
+
+FORMATS = {"PNG": ".png", "WEBP": ".webp", "JPEG": ".jpg"}
+DEFAULT_COMPRESS_LEVEL = 3
+DEFAULT_QUALITY = 92
+# Resultado final no navegador: o arquivo fiel sai em "Salvar resultado"; aqui vale a velocidade.
+RESULT_COMPRESS_LEVEL = 1
+# O Gradio copia o arquivo para o cache dele logo após o retorno.
+PREVIEW_TTL_SECONDS = 300
+_EXIF_IFD = 0x8769
+_USER_COMMENT = 0x9286
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_preview_dir: Optional[str] = None
+_preview_files = deque()
+_preview_lock = threading.Lock()
+
+
+def build_pnginfo(metadata: dict) -> PngInfo:
+    pnginfo = PngInfo()
+    for key, value in (metadata or {}).items():
+        if isinstance(value, (str, int, float, bool)):
+            pnginfo.add_text(str(key), str(value))
+    return pnginfo
+
+
+def _exif_with_parameters(metadata: dict) -> Optional[Image.Exif]:
+    parameters = (metadata or {}).get("parameters")
+    if not isinstance(parameters, str) or not parameters:
+        return None
+    exif = Image.Exif()
+    exif.get_ifd(_EXIF_IFD)[_USER_COMMENT] = b"UNICODE\0" + parameters.encode("utf-16-be")
+    return exif
+
+
+def normalize_format(fmt: str) -> str:
+    fmt = str(fmt or "PNG").upper()
+    return "JPEG" if fmt == "JPG" else (fmt if fmt in FORMATS else "PNG")
+
+
+def encode(
+    image: Image.Image,
+    target,
+    fmt: str = "PNG",
+    metadata: Optional[dict] = None,
+    compress_level: int = DEFAULT_COMPRESS_LEVEL,
+    quality: int = DEFAULT_QUALITY,
+    fast: bool = False,
+) -> None:
+    """Write `image` to a path or file object in `fmt`, with metadata; `fast` favors speed over size."""
+    fmt = normalize_format(fmt)
+    metadata = image.info if metadata is None else metadata
+    if fmt == "PNG":
+        image.save(target, format="PNG", pnginfo=build_pnginfo(metadata), compress_level=int(compress_level))
+        return
+
+    if fmt == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    options = {"quality": int(quality)}
+    exif = _exif_with_parameters(metadata)
+    if exif is not None:
+        options["exif"] = exif
+    if fmt == "WEBP":
+        # method 0-6: 6 comprime mais e é bem mais lento.
+        options["method"] = 0 if fast else 4
+    image.save(target, format=fmt, **options)
+
+
+def save_image(
+    image: Image.Image,
+    directory: str,
+    basename: str,
+    fmt: str = "PNG",
+    metadata: Optional[dict] = None,
+    compress_level: int = DEFAULT_COMPRESS_LEVEL,
+    quality: int = DEFAULT_QUALITY,
+) -> str:
+    """Save under `directory` without overwriting; returns the final path."""
+    fmt = normalize_format(fmt)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, basename + FORMATS[fmt])
+    counter = 1
+    while os.path.exists(path):
+        path = os.path.join(directory, f"{basename}-{counter}{FORMATS[fmt]}")
+        counter += 1
+
+    with telemetry.stage("save", format=fmt):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as fp:
+            encode(image, fp, fmt, metadata, compress_level, quality)
+        os.replace(tmp_path, path)
+    return path
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="menezcale-save")
+        return _executor
+
+
+def save_async(image: Image.Image, directory: str, basename: str, **options) -> Future:
+    """save_image on the background writer; failures are logged, not raised to the UI."""
+
+    def run():
+        try:
+            path = save_image(image, directory, basename, **options)
+            telemetry.debug(f"Resultado gravado em {path}.")
+            return path
+        except Exception as err:
+            telemetry.incr("save_failed")
+            telemetry.warning(f"Falha ao gravar {basename} em {directory} ({err}).")
+            raise
+
+    return _get_executor().submit(run)
+
+
+def default_basename(prefix: str = "menezcale") -> str:
+    return f"{prefix}-{time.strftime('%Y%m%d-%H%M%S')}"
+
+
+def encode_preview(image: Image.Image, fmt: str = "JPEG", quality: int = DEFAULT_QUALITY) -> Optional[str]:
+    """
+    Encode for the browser into a temp file and return its path (Gradio
+    serves it as is). Files older than PREVIEW_TTL_SECONDS are removed.
+    Returns None when fmt is PNG: the caller then returns the PIL image.
+    """
+    fmt = normalize_format(fmt)
+    if fmt == "PNG":
+        return None
+    fd, path = _temp_file(FORMATS[fmt])
+    with telemetry.stage("encode_preview", format=fmt):
+        with os.fdopen(fd, "wb") as fp:
+            encode(image, fp, fmt, {}, quality=quality, fast=True)
+    return path
+
+
+def encode_result(image: Image.Image, compress_level: int = RESULT_COMPRESS_LEVEL) -> str:
+    """Lossless PNG temp file (with the image metadata) for a final result shown in the browser."""
+    fd, path = _temp_file(FORMATS["PNG"])
+    with telemetry.stage("encode_result"):
+        with os.fdopen(fd, "wb") as fp:
+            encode(image, fp, "PNG", compress_level=compress_level)
+    return path
+
+
+def _temp_file(suffix: str):
+    """(fd, path) of a new file in the browser temp dir; drops files past PREVIEW_TTL_SECONDS."""
+    global _preview_dir
+    with _preview_lock:
+        if _preview_dir is None:
+            _preview_dir = tempfile.mkdtemp(prefix="menezcale-preview-")
+            atexit.register(shutil.rmtree, _preview_dir, True)
+        fd, path = tempfile.mkstemp(suffix=suffix, dir=_preview_dir)
+        now = time.time()
+        stale = []
+        while _preview_files and now - _preview_files[0][0] > PREVIEW_TTL_SECONDS:
+            stale.append(_preview_files.popleft()[1])
+        _preview_files.append((now, path))
+    for old in stale:
+        try:
+            os.remove(old)
+        except OSError:
+            pass
+    return fd, path
@@ -0,0 +1,214 @@
+"""
+Varredura de metadados sem decodificar pixels, com índice em disco.
+
+- read_header: em PNG lê só a assinatura, o IHDR e os chunks de texto
+  (tEXt/zTXt/iTXt) até o primeiro IDAT; outros formatos usam Image.open
+  sem load(). Dá o tamanho da imagem e o `parameters` do WebUI.
+- scan_file: tamanho base e Hires a partir desse cabeçalho.
+- MetadataIndex: SQLite com uma linha por arquivo, chave caminho e
+  validade por mtime + tamanho. Numa nova passada sobre um acervo grande
+  só os arquivos novos ou alterados são lidos; o resto sai do índice.
+  Arquivos alterados desde o último processamento ficam marcados como
+  desatualizados até serem processados de novo.
+"""
+
+import os
+import sqlite3
+import struct
+import zlib
+from typing import Dict, Optional, Tuple
+
+from PIL import Image
+
+import menezcale_telemetry as telemetry
+from menezcale_core import hires_from_info, original_size_from_info
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Chunks de texto maiores que isso são pulados (não são metadados do WebUI).
+MAX_TEXT_CHUNK = 4 * 1024 * 1024
+SCHEMA_VERSION = 1
+COMMIT_EVERY = 1000
+
+
+def _decode_text_chunk(chunk_type: bytes, data: bytes) -> Optional[Tuple[str, str]]:
+    key, sep, rest = data.partition(b"\0")
+    if not sep:
+        return None
+    if chunk_type == b"tEXt":
+        return key.decode("latin-1"), rest.decode("latin-1", "replace")
+    if chunk_type == b"zTXt":
+        return key.decode("latin-1"), zlib.decompress(rest[1:]).decode("latin-1", "replace")
+    # iTXt: flag de compressão, método, idioma\0, chave traduzida\0, texto UTF-8.
+    compressed = rest[:1] == b"\1"
+    _, _, rest = rest[2:].partition(b"\0")
+    _, _, text = rest.partition(b"\0")
+    if compressed:
+        text = zlib.decompress(text)
+    return key.decode("latin-1"), text.decode("utf-8", "replace")
+
+
+def read_png_header(path: str) -> Optional[Tuple[Tuple[int, int], Dict[str, str]]]:
+    """(size, text chunks) read from the PNG header only; None if `path` is not a PNG."""
+    info: Dict[str, str] = {}
+    size = None
+    with open(path, "rb") as fp:
+        if fp.read(8) != PNG_SIGNATURE:
+            return None
+        while True:
+            header = fp.read(8)
+            if len(header) < 8:
+                break
+            length, chunk_type = struct.unpack(">I4s", header)
+            if chunk_type in (b"IDAT", b"IEND"):
+                break
+            if chunk_type == b"IHDR":
+                size = struct.unpack(">II", fp.read(length)[:8])
+            elif chunk_type in (b"tEXt", b"zTXt", b"iTXt") and length <= MAX_TEXT_CHUNK:
+                try:
+                    item = _decode_text_chunk(chunk_type, fp.read(length))
+                except (zlib.error, UnicodeDecodeError):
+                    item = None
+                if item is not None:
+                    info.setdefault(*item)
+            else:
+                fp.seek(length, os.SEEK_CUR)
+            fp.seek(4, os.SEEK_CUR)  # CRC
+    if size is None:
+        return None
+    return (int(size[0]), int(size[1])), info
+
+
+def read_header(path: str) -> Tuple[Tuple[int, int], dict]:
+    """Image size and metadata without decoding pixels."""
+    header = read_png_header(path)
+    if header is not None:
+        return header
+    with Image.open(path) as image:
+        return image.size, dict(image.info)
+
+
+class ScanEntry:
+    """O que o índice guarda de cada arquivo."""
+
+    __slots__ = ("path", "mtime_ns", "file_size", "size", "base_size", "hires", "outdated")
+
+    def __init__(
+        self,
+        path: str,
+        mtime_ns: int,
+        file_size: int,
+        size: Optional[Tuple[int, int]],
+        base_size: Optional[Tuple[int, int]],
+        hires: bool,
+        outdated: bool = False,
+    ):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.file_size = file_size
+        self.size = size
+        self.base_size = base_size
+        self.hires = hires
+        self.outdated = outdated
+
+
+def scan_file(path: str, stat: Optional[os.stat_result] = None) -> ScanEntry:
+    stat = stat or os.stat(path)
+    try:
+        with telemetry.stage("scan"):
+            size, info = read_header(path)
+    except Exception as err:
+        telemetry.incr("scan_failed")
+        telemetry.debug(f"Cabeçalho ilegível em {path} ({err}).")
+        return ScanEntry(path, stat.st_mtime_ns, stat.st_size, None, None, False)
+    return ScanEntry(
+        path,
+        stat.st_mtime_ns,
+        stat.st_size,
+        size,
+        original_size_from_info(info),
+        hires_from_info(info),
+    )
+
+
+class MetadataIndex:
+    """
+    Persistent scan index (SQLite). Not thread-safe: use it from the
+    process that walks the folder. Writes are committed in batches.
+    """
+
+    def __init__(self, db_path: str):
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(db_path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self._db.execute("DROP TABLE IF EXISTS files")
+            self._db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY,"
+            " mtime_ns INTEGER NOT NULL,"
+            " file_size INTEGER NOT NULL,"
+            " width INTEGER, height INTEGER,"
+            " base_width INTEGER, base_height INTEGER,"
+            " hires INTEGER NOT NULL,"
+            " outdated INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._pending_writes = 0
+
+    def scan(self, path: str, stat: Optional[os.stat_result] = None) -> ScanEntry:
+        """Cached entry when mtime and size still match; otherwise read the header and store it."""
+        stat = stat or os.stat(path)
+        row = self._db.execute(
+            "SELECT mtime_ns, file_size, width, height, base_width, base_height, hires, outdated"
+            " FROM files WHERE path = ?",
+            (path,),
+        ).fetchone()
+        if row is not None and row[0] == stat.st_mtime_ns and row[1] == stat.st_size:
+            telemetry.incr("index_hit")
+            return ScanEntry(
+                path,
+                row[0],
+                row[1],
+                (row[2], row[3]) if row[2] else None,
+                (row[4], row[5]) if row[4] else None,
+                bool(row[6]),
+                bool(row[7]),
+            )
+
+        telemetry.incr("index_miss")
+        entry = scan_file(path, stat)
+        # Já estava no índice com outro mtime/tamanho: a saída antiga não vale mais.
+        entry.outdated = row is not None
+        size = entry.size or (None, None)
+        base = entry.base_size or (None, None)
+        self._write(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (path, entry.mtime_ns, entry.file_size, size[0], size[1], base[0], base[1], int(entry.hires),
+             int(entry.outdated)),
+        )
+        return entry
+
+    def mark_processed(self, path: str) -> None:
+        self._write("UPDATE files SET outdated = 0 WHERE path = ?", (path,))
+
+    def _write(self, sql: str, params: tuple) -> None:
+        self._db.execute(sql, params)
+        self._pending_writes += 1
+        if self._pending_writes >= COMMIT_EVERY:
+            self.commit()
+
+    def commit(self) -> None:
+        self._db.commit()
+        self._pending_writes = 0
+
+    def close(self) -> None:
+        self.commit()
+        self._db.close()
+
+    def __enter__(self) -> "MetadataIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -1,11 +1,14 @@
 import os
 import sys
-from typing import Optional
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
 
 import gradio as gr
 from PIL import Image
 
 import modules.scripts as scripts
+from modules import script_callbacks, shared
 from modules.processing import Processed, StableDiffusionProcessing
 
 # Garantir que os módulos auxiliares locais sejam importáveis.
@@ -14,15 +17,359 @@ if CURRENT_DIR not in sys.path:
     sys.path.append(CURRENT_DIR)
 
 from menezcale_core import (
+    DOWNSCALE_METHODS,
     apply_downscale,
-    apply_face_restore_if_enabled,
     attach_base_metadata,
-    compute_target_size,
-    detect_original_size,
+    face_restore_key,
+    get_opt,
+    image_fingerprint,
+    image_view,
     is_hires_allowed,
     log_hires_info,
-    safe_copy_image,
+    preview_proxy,
+    resolve_down_method,
+    warmup_fsrcnn,
 )
+import menezcale_api
+import menezcale_autoselect
+import menezcale_backends
+import menezcale_cancel
+import menezcale_compare
+import menezcale_firstpass
+import menezcale_telemetry as telemetry
+from menezcale_history import ImageHistory
+from menezcale_pipeline import (
+    GRID_INFO_KEY,
+    find_grid,
+    finish_image,
+    prepare_target,
+    rebuild_grid,
+    run_pipeline_batch,
+    split_grid,
+)
+from menezcale_queue import JobCancelled, check_cancelled, get_queue, interrupted
+import menezcale_save
+from menezcale_result_cache import results as result_cache
+
+try:
+    from modules import images as webui_images
+except Exception:
+    webui_images = None
+
+
+def _warmup_fsrcnn_in_background():
+    threading.Thread(target=warmup_fsrcnn, name="menezcale-fsrcnn-warmup", daemon=True).start()
+
+
+def _calibrate_in_background():
+    def run():
+        try:
+            menezcale_autoselect.get_calibration()
+        except JobCancelled:
+            telemetry.info("Calibração do método Auto cancelada; refeita no próximo uso do Auto.")
+
+    threading.Thread(target=run, name="menezcale-calibrate", daemon=True).start()
+
+
+def _apply_telemetry_options():
+    telemetry.set_log_level(get_opt("menezcale_log_level", "info"))
+    telemetry.set_memory_tracking(get_opt("menezcale_memory_tracking", False))
+    telemetry.set_sink(get_opt("menezcale_metrics_path", "").strip())
+
+
+def on_ui_settings():
+    section = ("menezcale", "Menezcale")
+    shared.opts.add_option(
+        "menezcale_fsrcnn_warmup",
+        shared.OptionInfo(
+            False,
+            "Pré-carregar o modelo FSRCNN ao iniciar (evita a carga no primeiro clique)",
+            section=section,
+        ),
+    )
+    shared.opts.add_option(
+        "menezcale_resample_engine",
+        shared.OptionInfo(
+            "Pillow",
+            "Motor de reamostragem para Lanczos/Bicubic (NumPy empilha lotes do mesmo tamanho)",
+            gr.Radio,
+            {"choices": menezcale_backends.names()},
+            section=section,
+        ),
+    )
+    shared.opts.add_option(
+        "menezcale_batch_backend",
+        shared.OptionInfo(
+            "Threads",
+            "Downscale em lote: threads ou processos (pixels por memória compartilhada, escala com núcleos)",
+            gr.Radio,
+            {"choices": ["Threads", "Processos"]},
+            section=section,
+        ),
+    )
+    shared.opts.add_option(
+        "menezcale_process_workers",
+        shared.OptionInfo(
+            0,
+            "Processos do downscale em lote (0 = número de núcleos)",
+            gr.Slider,
+            {"minimum": 0, "maximum": 64, "step": 1},
+            section=section,
+        ),
+    )
+    shared.opts.add_option(
+        "menezcale_auto_budget_ms",
+        shared.OptionInfo(
+            menezcale_autoselect.DEFAULT_BUDGET_MS,
+            "Método Auto: tempo máximo previsto por imagem (ms); escolhe o melhor método que cabe",
+            gr.Slider,
+            {"minimum": 50, "maximum": 10000, "step": 50},
+            section=section,
+        ),
+    )
+    shared.opts.add_option(
+        "menezcale_job_timeout_s",
+        shared.OptionInfo(
+            0,
+            "Prazo por job (s, 0 = sem limite); estourado, o downscale cai para Bicubic e o face restoration é pulado",
+            gr.Slider,
+            {"minimum": 0, "maximum": 300, "step": 1},
+            section=section,
+        ),
+    )
+    shared.opts.add_option(
+        "menezcale_firstpass_mode",
+        shared.OptionInfo(
+            menezcale_firstpass.MODES[0],
+            "Primeiro passe (antes do Hires): guardar e usar quando o alvo é o tamanho original",
+            gr.Radio,
+            {"choices": menezcale_firstpass.MODES},
+            section=section,
+        ),
+    )
+    shared.opts.add_option(
+        "menezcale_firstpass_blend",
+        shared.OptionInfo(
+            menezcale_firstpass.DEFAULT_BLEND,
+            "Primeiro passe, modo Misturar: peso do primeiro passe (0 = só o downscale)",
+            gr.Slider,
+            {"minimum": 0.0, "maximum": 1.0, "step": 0.05},
+            section=section,
+        ),
+    )
+    shared.opts.add_option(
+        "menezcale_firstpass_budget_mb",
+        shared.OptionInfo(
+            menezcale_firstpass.DEFAULT_BUDGET_MB,
+            "Memória para os primeiros passes guardados (MB)",
+            gr.Slider,
+            {"minimum": 32, "maximum": 4096, "step": 32},
+            section=section,
+        ),
+    )
+    shared.opts.add_option(
+        "menezcale_tile_mode",
+        shared.OptionInfo(
+            "Automático",
+            "Execução em tiles (resize e FSRCNN) para imagens grandes",
+            gr.Radio,
+            {"choices": ["Automático", "Sempre", "Desligado"]},
+            section=section,
+        ),
+    )
+    shared.opts.add_option(
+        "menezcale_tile_budget_mb",
+        shared.OptionInfo(
+            512,
+            "Orçamento de memória por etapa em tiles (MB)",
+            gr.Slider,
+            {"minimum": 64, "maximum": 8192, "step": 64},
+            section=section,
+        ),
+    )
+    shared.opts.add_option(
+        "menezcale_tile_overlap",
+        shared.OptionInfo(
+            16,
+            "Sobreposição entre tiles do FSRCNN (px, com mistura nas emendas)",
+            gr.Slider,
+            {"minimum": 0, "maximum": 128, "step": 4},
+            section=section,
+        ),
+    )
+    shared.opts.add_option(
+        "menezcale_log_level",
+        shared.OptionInfo(
+            "info",
+            "Nível de log no console (debug mostra cada etapa por imagem)",
+            gr.Radio,
+            {"choices": list(telemetry.LEVELS)},
+            section=section,
+            onchange=_apply_telemetry_options,
+        ),
+    )
+    shared.opts.add_option(
+        "menezcale_memory_tracking",
+        shared.OptionInfo(
+            False,
+            "Medir pico de memória por etapa (tracemalloc; deixa o pipeline mais lento)",
+            section=section,
+            onchange=_apply_telemetry_options,
+        ),
+    )
+    shared.opts.add_option(
+        "menezcale_metrics_path",
+        shared.OptionInfo(
+            "",
+            "Arquivo JSON lines para métricas por etapa (vazio = desligado)",
+            section=section,
+            onchange=_apply_telemetry_options,
+        ),
+    )
+    shared.opts.add_option(
+        "menezcale_face_regions",
+        shared.OptionInfo(
+            "Imagem inteira",
+            "Face restoration: na imagem inteira ou só nos rostos detectados (OpenCV, mais rápido; "
+            "pula imagens em que o Haar cascade não acha rosto)",
+            gr.Radio,
+            {"choices": ["Só rostos", "Imagem inteira"]},
+            section=section,
+        ),
+    )
+    shared.opts.add_option(
+        "menezcale_auto_workers",
+        shared.OptionInfo(
+            1,
+            "Downscale automático: threads em segundo plano",
+            gr.Slider,
+            {"minimum": 1, "maximum": 8, "step": 1},
+            section=section,
+        ),
+    )
+    shared.opts.add_option(
+        "menezcale_auto_queue",
+        shared.OptionInfo(
+            8,
+            "Downscale automático: máximo de imagens na fila (acima disso a geração espera)",
+            gr.Slider,
+            {"minimum": 1, "maximum": 64, "step": 1},
+            section=section,
+        ),
+    )
+    shared.opts.add_option(
+        "menezcale_auto_save",
+        shared.OptionInfo(
+            True,
+            "Downscale automático: gravar os resultados na pasta de saída (sufixo -menezcale)",
+            section=section,
+        ),
+    )
+    shared.opts.add_option(
+        "menezcale_save_dir",
+        shared.OptionInfo(
+            os.path.join("outputs", "menezcale"),
+            "Pasta do botão 'Salvar resultado'",
+            section=section,
+        ),
+    )
+    shared.opts.add_option(
+        "menezcale_save_format",
+        shared.OptionInfo(
+            "PNG",
+            "Formato do 'Salvar resultado' (PNG guarda todos os metadados como texto)",
+            gr.Radio,
+            {"choices": list(menezcale_save.FORMATS)},
+            section=section,
+        ),
+    )
+    shared.opts.add_option(
+        "menezcale_png_compress_level",
+        shared.OptionInfo(
+            menezcale_save.DEFAULT_COMPRESS_LEVEL,
+            "Compressão PNG (0 = mais rápido, 9 = menor arquivo)",
+            gr.Slider,
+            {"minimum": 0, "maximum": 9, "step": 1},
+            section=section,
+        ),
+    )
+    shared.opts.add_option(
+        "menezcale_save_quality",
+        shared.OptionInfo(
+            menezcale_save.DEFAULT_QUALITY,
+            "Qualidade WebP/JPEG",
+            gr.Slider,
+            {"minimum": 50, "maximum": 100, "step": 1},
+            section=section,
+        ),
+    )
+    shared.opts.add_option(
+        "menezcale_api_path_roots",
+        shared.OptionInfo(
+            menezcale_api.DEFAULT_PATH_ROOTS,
+            "Pastas que a API pode ler (campo `paths`; separadas por ;)",
+            section=section,
+        ),
+    )
+    shared.opts.add_option(
+        "menezcale_preview_format",
+        shared.OptionInfo(
+            "JPEG",
+            "Formato enviado ao navegador nos previews do painel (PNG = sem atalho); resultados finais vão sempre em PNG",
+            gr.Radio,
+            {"choices": ["JPEG", "WEBP", "PNG"]},
+            section=section,
+        ),
+    )
+    shared.opts.add_option(
+        "menezcale_result_cache_mb",
+        shared.OptionInfo(
+            512,
+            "Cache de resultados do painel (MB; 0 = desligado)",
+            gr.Slider,
+            {"minimum": 0, "maximum": 8192, "step": 64},
+            section=section,
+        ),
+    )
+    shared.opts.add_option(
+        "menezcale_history_size",
+        shared.OptionInfo(
+            8,
+            "Gerações guardadas no histórico do painel",
+            gr.Slider,
+            {"minimum": 1, "maximum": 64, "step": 1},
+            section=section,
+        ),
+    )
+    shared.opts.add_option(
+        "menezcale_history_budget_mb",
+        shared.OptionInfo(
+            512,
+            "Memória máxima do histórico (MB); o excedente vai para arquivos temporários",
+            gr.Slider,
+            {"minimum": 0, "maximum": 8192, "step": 64},
+            section=section,
+        ),
+    )
+    shared.opts.add_option(
+        "menezcale_history_spill",
+        shared.OptionInfo(
+            True,
+            "Mover gerações antigas do histórico para o disco em vez de descartá-las",
+            section=section,
+        ),
+    )
+
+
+def on_app_started(demo, app):
+    _apply_telemetry_options()
+    menezcale_api.register(app)
+    if get_opt("menezcale_fsrcnn_warmup", False):
+        _warmup_fsrcnn_in_background()
+
+
+script_callbacks.on_ui_settings(on_ui_settings)
+script_callbacks.on_app_started(on_app_started)
 
 
 class MenezcaleScript(scripts.Script):
@@ -34,7 +381,8 @@ class MenezcaleScript(scripts.Script):
     usando a última imagem gerada.
     """
     _hires_available: bool = False
-    _last_image: Optional[Image.Image] = None
+    # Compartilhado entre instâncias: as imagens ficam por referência, com limite de bytes.
+    _history = ImageHistory()
 
     def title(self):
         return "Menezcale"
@@ -49,12 +397,8 @@ class MenezcaleScript(scripts.Script):
             open=False,
         ):
             down_method = gr.Dropdown(
-                choices=[
-                    "Lanczos (Recomendado para Preservar Qualidade)",
-                    "FSRCNN (IA para Downscale Inteligente)",
-                    "Bicubic (Rápido)",
-                ],
-                value="Lanczos (Recomendado para Preservar Qualidade)",
+                choices=DOWNSCALE_METHODS,
+                value=DOWNSCALE_METHODS[0],
                 label="Método de Downscale",
             )
 
@@ -97,6 +441,12 @@ class MenezcaleScript(scripts.Script):
                 visible=False,
             )
 
+            auto_downscale = gr.Checkbox(
+                label="Downscale automático em segundo plano",
+                value=False,
+                info="Cada geração com Hires Fix entra numa fila e é reduzida enquanto a próxima é gerada.",
+            )
+
             gr.Markdown("### Teste Manual de Downscale (pós-upscale)")
 
             manual_input = gr.Image(
@@ -104,13 +454,41 @@ class MenezcaleScript(scripts.Script):
                 type="pil",
                 height=256,
             )
-            load_last = gr.Button("Carregar última imagem gerada")
-            manual_button = gr.Button("Aplicar Downscale")
+            with gr.Row():
+                history_choice = gr.Dropdown(
+                    choices=[],
+                    value=None,
+                    label="Geração",
+                    info="Vazio = última geração.",
+                )
+                refresh_history = gr.Button("Atualizar histórico")
+            load_last = gr.Button("Carregar imagem gerada")
+            with gr.Row():
+                preview_button = gr.Button("Pré-visualizar (rápido)")
+                manual_button = gr.Button("Aplicar Downscale")
+                save_button = gr.Button("Salvar resultado")
+                cancel_button = gr.Button("Cancelar")
             manual_output = gr.Image(
                 label="Preview Downscale",
                 type="pil",
                 height=256,
             )
+            save_status = gr.Markdown("")
+
+            compare_button = gr.Button("Comparar métodos")
+            compare_output = gr.Image(
+                label="Comparação (mesma origem, todos os métodos)",
+                type="pil",
+                height=384,
+            )
+            compare_table = gr.Markdown("")
+
+            batch_button = gr.Button("Aplicar Downscale no lote (geração selecionada)")
+            batch_output = gr.Gallery(
+                label="Lote Downscale",
+                columns=4,
+                height=256,
+            )
 
             # UI interatividade.
             use_auto_original.change(
@@ -128,6 +506,31 @@ class MenezcaleScript(scripts.Script):
                 outputs=down_factor,
             )
 
+            # Carrega o FSRCNN (ou calibra o Auto) assim que o método é escolhido, antes do clique.
+            down_method.change(
+                fn=lambda method: (
+                    _warmup_fsrcnn_in_background() if "fsrcnn" in method.lower()
+                    else _calibrate_in_background() if method.lower().startswith("auto")
+                    else None
+                ),
+                inputs=down_method,
+                outputs=[],
+            )
+
+            preview_button.click(
+                fn=self._preview,
+                inputs=[
+                    manual_input,
+                    down_method,
+                    down_factor,
+                    use_manual_down,
+                    use_auto_original,
+                    manual_width,
+                    manual_height,
+                ],
+                outputs=manual_output,
+            )
+
             manual_button.click(
                 fn=self._manual_test,
                 inputs=[
@@ -142,9 +545,59 @@ class MenezcaleScript(scripts.Script):
                 outputs=manual_output,
             )
 
+            save_button.click(
+                fn=self._save_result,
+                inputs=[
+                    manual_input,
+                    down_method,
+                    down_factor,
+                    use_manual_down,
+                    use_auto_original,
+                    manual_width,
+                    manual_height,
+                ],
+                outputs=save_status,
+            )
+
+            # Fora da fila do Gradio: precisa rodar enquanto o worker está ocupado com o job.
+            cancel_button.click(fn=self._cancel, inputs=[], outputs=save_status, queue=False)
+
+            compare_button.click(
+                fn=self._compare_methods,
+                inputs=[
+                    manual_input,
+                    down_factor,
+                    use_manual_down,
+                    use_auto_original,
+                    manual_width,
+                    manual_height,
+                ],
+                outputs=[compare_output, compare_table],
+            )
+
+            batch_button.click(
+                fn=self._batch_test,
+                inputs=[
+                    down_method,
+                    down_factor,
+                    use_manual_down,
+                    use_auto_original,
+                    manual_width,
+                    manual_height,
+                    history_choice,
+                ],
+                outputs=batch_output,
+            )
+
+            refresh_history.click(
+                fn=lambda: gr.update(choices=self._history.choices(), value=None),
+                inputs=[],
+                outputs=history_choice,
+            )
+
             load_last.click(
                 fn=self._load_last_image,
-                inputs=[],
+                inputs=[history_choice],
                 outputs=[manual_input, manual_output],
             )
 
@@ -155,6 +608,7 @@ class MenezcaleScript(scripts.Script):
             use_auto_original,
             manual_width,
             manual_height,
+            auto_downscale,
         ]
 
     def _manual_test(
@@ -166,27 +620,265 @@ class MenezcaleScript(scripts.Script):
         use_auto_original: bool,
         manual_width: int,
         manual_height: int,
+    ):
+        return self._to_browser(
+            self._run_job(
+                lambda: self._render_full(
+                    image, down_method, down_factor, use_manual_down, use_auto_original, manual_width, manual_height
+                )
+            )
+        )
+
+    @staticmethod
+    def _run_job(fn: Callable, cancelled=None, deadline: bool = True):
+        """fn() as one cancellable job with the configured deadline; `cancelled` if it was cancelled."""
+        try:
+            with menezcale_cancel.job(get_opt("menezcale_job_timeout_s", 0) if deadline else None):
+                return fn()
+        except JobCancelled:
+            telemetry.info("Downscale cancelado.")
+            return cancelled
+
+    @staticmethod
+    def _cancel() -> str:
+        """Stop the panel jobs in progress and the automatic queue (running jobs stop at the next check)."""
+        menezcale_cancel.cancel_all()
+        get_queue(get_opt("menezcale_auto_workers", 1), get_opt("menezcale_auto_queue", 8)).cancel_pending()
+        return "Cancelando: o que está em andamento para na próxima etapa."
+
+    def _save_result(
+        self,
+        image: Optional[Image.Image],
+        down_method: str,
+        down_factor: float,
+        use_manual_down: bool,
+        use_auto_original: bool,
+        manual_width: int,
+        manual_height: int,
+    ) -> str:
+        """Render (or reuse) the full-resolution result and write it in the background."""
+        cancelled = object()
+        result = self._run_job(
+            lambda: self._render_full(
+                image, down_method, down_factor, use_manual_down, use_auto_original, manual_width, manual_height
+            ),
+            cancelled,
+        )
+        if result is cancelled:
+            return "Cancelado."
+        if result is None:
+            return "Nada para salvar."
+        directory = get_opt("menezcale_save_dir", "") or os.path.join("outputs", "menezcale")
+        basename = menezcale_save.default_basename()
+        menezcale_save.save_async(
+            result,
+            directory,
+            basename,
+            fmt=get_opt("menezcale_save_format", "PNG"),
+            compress_level=get_opt("menezcale_png_compress_level", menezcale_save.DEFAULT_COMPRESS_LEVEL),
+            quality=get_opt("menezcale_save_quality", menezcale_save.DEFAULT_QUALITY),
+        )
+        return f"Gravando `{basename}` em `{directory}`."
+
+    @staticmethod
+    def _to_browser(image: Optional[Image.Image], preview: bool = False):
+        """
+        Temp file for Gradio: previews in the (lossy) preview format, or the PIL
+        image when it is PNG; final results always as lossless PNG.
+        """
+        if image is None:
+            return None
+        try:
+            if not preview:
+                return menezcale_save.encode_result(image)
+            path = menezcale_save.encode_preview(
+                image,
+                get_opt("menezcale_preview_format", "JPEG"),
+                get_opt("menezcale_save_quality", menezcale_save.DEFAULT_QUALITY),
+            )
+        except Exception as err:
+            telemetry.warning(f"Falha ao codificar imagem para o navegador ({err}).")
+            path = None
+        return path or image
+
+    def _render_full(
+        self,
+        image: Optional[Image.Image],
+        down_method: str,
+        down_factor: float,
+        use_manual_down: bool,
+        use_auto_original: bool,
+        manual_width: int,
+        manual_height: int,
     ) -> Optional[Image.Image]:
         if image is None:
             return None
         if not is_hires_allowed(image, self._hires_available):
-            print("[Menezcale] Hires Fix não detectado. Downscale bloqueado.")
+            telemetry.info("Hires Fix não detectado. Downscale bloqueado.")
             return None
 
-        print("[Menezcale] Teste manual iniciado")
-        processed_image = self._run_pipeline(
-            image=image,
-            p=None,
-            down_method=down_method,
-            down_factor=down_factor,
-            use_manual_down=use_manual_down,
-            use_auto_original=use_auto_original,
-            manual_width=manual_width,
-            manual_height=manual_height,
+        result_cache.configure(get_opt("menezcale_result_cache_mb", 512) * 1024 * 1024)
+        original_info, original_size, target_size = prepare_target(
+            image, None, down_factor, use_manual_down, use_auto_original, manual_width, manual_height
         )
-        print("[Menezcale] Teste manual concluído")
+        # Auto entra na chave já resolvido: mudar o orçamento pode mudar o resultado.
+        down_method = resolve_down_method(down_method, image.size, target_size)
+        # Chaves por conteúdo + o que define cada etapa (não pelos checkboxes):
+        # ajustes diferentes que levam ao mesmo alvo caem na mesma entrada.
+        with telemetry.stage("fingerprint"):
+            fingerprint = image_fingerprint(image)
+        down_key = self._down_key(fingerprint, down_method, target_size)
+        # Primeiro passe guardado no tamanho do alvo: substitui (ou entra na mistura com) o downscale.
+        first = menezcale_firstpass.lookup(fingerprint, target_size)
+        if first is not None:
+            down_key = ("firstpass", fingerprint, target_size) + menezcale_firstpass.cache_key(down_method)
+        face_key = face_restore_key()
+        final_key = ("final",) + down_key[1:] + face_key if face_key else down_key
+
+        cached = result_cache.get(final_key)
+        if cached is not None:
+            cached.info.update(original_info)
+            return cached
+
+        telemetry.debug("Teste manual iniciado")
+        downscaled = result_cache.get(down_key) if final_key != down_key else None
+        if downscaled is None:
+            if first is not None:
+                downscaled = menezcale_firstpass.compose(
+                    first, lambda: apply_downscale(image, down_method, target_size, original_info), original_info
+                )
+            else:
+                downscaled = apply_downscale(image, down_method, target_size, original_info)
+            # Resultado do fallback por prazo (Bicubic) não vale para a chave do método pedido.
+            if not menezcale_cancel.degraded():
+                result_cache.put(down_key, downscaled)
+        processed_image = finish_image(
+            image_view(downscaled, original_info),
+            original_info,
+            original_size,
+            target_size,
+            down_method,
+            use_manual_down,
+        )
+        if final_key != down_key and not menezcale_cancel.degraded():
+            result_cache.put(final_key, processed_image)
+        telemetry.debug("Teste manual concluído")
         return processed_image
 
+    @staticmethod
+    def _down_key(fingerprint: str, down_method: str, target_size: Tuple[int, int]) -> tuple:
+        return ("downscale", fingerprint, down_method, target_size, get_opt("menezcale_resample_engine", "Pillow"))
+
+    def _compare_methods(
+        self,
+        image: Optional[Image.Image],
+        down_factor: float,
+        use_manual_down: bool,
+        use_auto_original: bool,
+        manual_width: int,
+        manual_height: int,
+    ):
+        """
+        Todos os métodos sobre a mesma origem (alvo detectado uma vez), em
+        paralelo: grade rotulada + tabela de tempos. Os resultados entram no
+        cache, então "Aplicar Downscale" com o método escolhido sai na hora.
+        """
+        if image is None:
+            return None, ""
+        if not is_hires_allowed(image, self._hires_available):
+            telemetry.info("Hires Fix não detectado. Downscale bloqueado.")
+            return None, "Hires Fix não detectado."
+
+        start = time.perf_counter()
+        result_cache.configure(get_opt("menezcale_result_cache_mb", 512) * 1024 * 1024)
+        original_info, _, target_size = prepare_target(
+            image, None, down_factor, use_manual_down, use_auto_original, manual_width, manual_height
+        )
+        # Sem prazo: um fallback para Bicubic trocaria o método e o tempo medidos.
+        results = self._run_job(
+            lambda: menezcale_compare.run_methods(image, target_size, original_info), deadline=False
+        )
+        if results is None:
+            return None, "Cancelado."
+        wall_ms = (time.perf_counter() - start) * 1000
+
+        fingerprint = image_fingerprint(image)
+        for method, result, _ in results:
+            result_cache.put(self._down_key(fingerprint, method, target_size), result)
+        table = menezcale_compare.timing_table(results, image.size, target_size, wall_ms)
+        return self._to_browser(menezcale_compare.grid(results)), table
+
+    def _preview(
+        self,
+        image: Optional[Image.Image],
+        down_method: str,
+        down_factor: float,
+        use_manual_down: bool,
+        use_auto_original: bool,
+        manual_width: int,
+        manual_height: int,
+    ):
+        """
+        Mesmo método aplicado a um proxy pequeno (alvo de até 384 px, mesma
+        razão de redução), sem face restoration. A resolução total só é
+        calculada em "Aplicar Downscale".
+        """
+        if image is None:
+            return None
+        if not is_hires_allowed(image, self._hires_available):
+            telemetry.info("Hires Fix não detectado. Downscale bloqueado.")
+            return None
+
+        with telemetry.stage("preview", method=down_method):
+            original_info, _, target_size = prepare_target(
+                image, None, down_factor, use_manual_down, use_auto_original, manual_width, manual_height
+            )
+            # Auto decide pelo tamanho real, não pelo do proxy.
+            down_method = resolve_down_method(down_method, image.size, target_size)
+            proxy, proxy_target = preview_proxy(image, target_size)
+            result = apply_downscale(proxy, down_method, proxy_target, original_info)
+        return self._to_browser(result, preview=True)
+
+    def _batch_test(
+        self,
+        down_method: str,
+        down_factor: float,
+        use_manual_down: bool,
+        use_auto_original: bool,
+        manual_width: int,
+        manual_height: int,
+        generation=None,
+    ) -> list:
+        # A grade do batch não passa pelo pipeline: é remontada dos resultados.
+        grid, images = split_grid(self._history.get(self._history.resolve(generation)))
+        images = [img for img in images if is_hires_allowed(img, self._hires_available)]
+        if not images:
+            telemetry.info("Nenhuma imagem com Hires Fix na geração selecionada para o lote.")
+            return []
+
+        telemetry.debug(f"Lote iniciado ({len(images)} imagens)")
+        processed_images = self._run_job(
+            lambda: run_pipeline_batch(
+                images=images,
+                p=None,
+                down_method=down_method,
+                down_factor=down_factor,
+                use_manual_down=use_manual_down,
+                use_auto_original=use_auto_original,
+                manual_width=manual_width,
+                manual_height=manual_height,
+            ),
+            [],
+        )
+        if grid is not None and processed_images:
+            processed_images = [rebuild_grid(processed_images, grid, images[0].size)] + processed_images
+        telemetry.debug("Lote concluído")
+        return [self._to_browser(img) for img in processed_images]
+
+    def process(self, p: StableDiffusionProcessing, *args):
+        if menezcale_firstpass.enabled():
+            menezcale_firstpass.install(p)
+
     def postprocess(
         self,
         p: StableDiffusionProcessing,
@@ -197,84 +889,211 @@ class MenezcaleScript(scripts.Script):
         use_auto_original: bool,
         manual_width: int,
         manual_height: int,
+        auto_downscale: bool = False,
     ):
         log_hires_info(p)
 
         if not processed or not processed.images:
-            print("[Menezcale] Nenhuma imagem processada encontrada.")
+            telemetry.info("Nenhuma imagem processada encontrada.")
             return
 
-        # Sempre guarda a última imagem gerada para o botão de carregamento.
-        self._last_image = safe_copy_image(processed.images[-1])
-        attach_base_metadata(
-            getattr(self._last_image, "info", {}),
-            original_size=None,
-            p=p,
+        # Sempre guarda a geração no histórico (por referência, sem copiar pixels).
+        infos = []
+        for img in processed.images:
+            info = dict(getattr(img, "info", None) or {})
+            attach_base_metadata(info, original_size=None, p=p)
+            infos.append(info)
+        grid_index = find_grid(processed.images, getattr(processed, "index_of_first_image", 0))
+        if grid_index is not None:
+            infos[grid_index][GRID_INFO_KEY] = True
+        self._history.configure(
+            get_opt("menezcale_history_size", 8),
+            get_opt("menezcale_history_budget_mb", 512) * 1024 * 1024,
+            get_opt("menezcale_history_spill", True),
         )
+        gen_id = self._history.add(processed.images, infos)
+        views = self._history.get(gen_id)
+        firstpasses = menezcale_firstpass.remember(
+            p, processed.images, getattr(processed, "index_of_first_image", 0)
+        )
+        last_image = views[-1]
 
-        self._hires_available = is_hires_allowed(self._last_image, self._hires_available)
+        self._hires_available = is_hires_allowed(last_image, self._hires_available)
         if not self._hires_available:
-            print("[Menezcale] Imagem sem Hires Fix detectado; controles bloqueados.")
+            telemetry.info("Imagem sem Hires Fix detectado; controles bloqueados.")
             return
-        # Automático desativado: apenas registra a última imagem e sai.
-        print("[Menezcale] Downscale automático desativado. Use o botão 'Aplicar Downscale'.")
-
-    def _load_last_image(self):
-        img = getattr(self, "_last_image", None)
-        if img is None:
-            print("[Menezcale] Nenhuma imagem gerada anteriormente para carregar.")
-            return None, None
-        if not is_hires_allowed(img, self._hires_available):
-            print("[Menezcale] Hires Fix não detectado na última imagem; controles bloqueados.")
-            return None, None
-        try:
-            copy_img = img.copy()
-            copy_img.info = getattr(img, "info", {}).copy()
-            return copy_img, copy_img
-        except Exception as err:
-            print(f"[Menezcale] Falha ao carregar última imagem: {err}")
-            return None, None
+        if not auto_downscale:
+            telemetry.debug("Downscale automático desativado. Use o botão 'Aplicar Downscale'.")
+            return
+        self._queue_auto_downscale(
+            p,
+            processed,
+            views,
+            down_method,
+            down_factor,
+            use_manual_down,
+            use_auto_original,
+            manual_width,
+            manual_height,
+            firstpasses,
+        )
 
-    # Core processing helpers -------------------------------------------------
-    def _run_pipeline(
+    def _queue_auto_downscale(
         self,
-        image: Image.Image,
-        p: Optional[StableDiffusionProcessing],
+        p: StableDiffusionProcessing,
+        processed: Processed,
+        images: List[Image.Image],
         down_method: str,
         down_factor: float,
         use_manual_down: bool,
         use_auto_original: bool,
         manual_width: int,
         manual_height: int,
-    ) -> Image.Image:
-        original_info = getattr(image, "info", {}) or {}
-
-        original_size = detect_original_size(
-            p=p,
-            image=image,
-            use_auto_original=use_auto_original,
-            manual_width=manual_width,
-            manual_height=manual_height,
-        )
+        firstpasses: Optional[List[Optional[Image.Image]]] = None,
+    ):
+        """
+        Prepara os alvos aqui (barato) e enfileira o downscale + face restore;
+        os resultados entram no histórico como uma geração só quando todos
+        terminam.
+        """
+        queue = get_queue(get_opt("menezcale_auto_workers", 1), get_opt("menezcale_auto_queue", 8))
+        if interrupted():
+            queue.cancel_pending()
+            return
 
-        attach_base_metadata(original_info, original_size, p)
+        results: List[Optional[Image.Image]] = [None] * len(images)
+        remaining = [len(images)]
+        lock = threading.Lock()
+        grid_index = find_grid(images, getattr(processed, "index_of_first_image", 0))
+        grid_source = next((img for index, img in enumerate(images) if index != grid_index), None)
 
-        target_size = compute_target_size(
-            image=image,
-            original_size=original_size,
-            down_factor=down_factor,
-            use_manual_down=use_manual_down,
-        )
+        def finish(index: int, result: Optional[Image.Image]):
+            results[index] = result
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            ready = [img for img in results if img is not None]
+            if ready and grid_index is not None:
+                # Cada imagem na sua posição da grade: a que falhou (ou foi pulada) entra
+                # como estava, só reduzida ao tamanho da célula.
+                cell = (max(img.width for img in ready), max(img.height for img in ready))
+                tiles = [
+                    result if result is not None else images[index].resize(cell, Image.Resampling.BICUBIC)
+                    for index, result in enumerate(results)
+                    if index != grid_index
+                ]
+                grid = rebuild_grid(tiles, images[grid_index], grid_source.size)
+                if get_opt("menezcale_auto_save", True):
+                    self._save_auto_grid(grid, p)
+                ready.insert(0, grid)
+            if ready:
+                self._history.add(ready, [img.info for img in ready], tag="downscale")
+                telemetry.debug(f"Downscale automático concluído ({len(ready)} imagens).")
 
-        image = apply_downscale(image, down_method, target_size, original_info)
-        image = apply_face_restore_if_enabled(image, original_info)
+        def on_done(index: int, future):
+            ok = not future.cancelled() and future.exception() is None
+            finish(index, future.result() if ok else None)
 
-        print(
-            f"Menezcale: Downscale para {target_size[0]}x{target_size[1]} aplicado "
-            f"com {down_method} "
-            f"(alvo {'original' if original_size else ('fator manual' if use_manual_down else 'tamanho atual')})"
-        )
+        for index, image in enumerate(images):
+            if index == grid_index or not is_hires_allowed(image, self._hires_available):
+                finish(index, None)
+                continue
+            prepared = prepare_target(
+                image, p, down_factor, use_manual_down, use_auto_original, manual_width, manual_height
+            )
+            first = firstpasses[index] if firstpasses else None
+            future = queue.submit(
+                self._auto_job, image, prepared, down_method, use_manual_down, p, processed, index, first
+            )
+            if future is None:
+                # Interrompido esperando vaga: o resto da geração não entra na fila.
+                for rest in range(index, len(images)):
+                    finish(rest, None)
+                return
+            future.add_done_callback(lambda fut, index=index: on_done(index, fut))
+
+    def _auto_job(
+        self,
+        image: Image.Image,
+        prepared: Tuple[dict, Optional[Tuple[int, int]], Tuple[int, int]],
+        down_method: str,
+        use_manual_down: bool,
+        p: StableDiffusionProcessing,
+        processed: Processed,
+        index: int,
+        first: Optional[Image.Image] = None,
+    ) -> Image.Image:
+        original_info, original_size, target_size = prepared
+        with menezcale_cancel.job(get_opt("menezcale_job_timeout_s", 0)):
+            if first is not None and menezcale_firstpass.enabled() and first.size == tuple(target_size):
+                result = menezcale_firstpass.compose(
+                    first, lambda: apply_downscale(image, down_method, target_size, original_info), original_info
+                )
+            else:
+                result = apply_downscale(image, down_method, target_size, original_info)
+            check_cancelled()
+            result = finish_image(
+                result, original_info, original_size, target_size, down_method, use_manual_down
+            )
+            check_cancelled()
+        if get_opt("menezcale_auto_save", True):
+            self._save_auto_result(result, p, processed, index)
+        return result
+
+    @staticmethod
+    def _save_auto_result(image: Image.Image, p, processed: Processed, index: int):
+        if webui_images is None:
+            return
+        try:
+            infotexts = getattr(processed, "infotexts", None) or []
+            seed_index = index - getattr(processed, "index_of_first_image", 0)
+            seeds = getattr(processed, "all_seeds", None) or []
+            prompts = getattr(processed, "all_prompts", None) or []
+            webui_images.save_image(
+                image,
+                p.outpath_samples,
+                "",
+                seeds[seed_index] if 0 <= seed_index < len(seeds) else None,
+                prompts[seed_index] if 0 <= seed_index < len(prompts) else None,
+                shared.opts.samples_format,
+                info=infotexts[index] if index < len(infotexts) else None,
+                p=p,
+                suffix="-menezcale",
+            )
+        except Exception as err:
+            telemetry.warning(f"Não foi possível gravar o resultado do downscale automático ({err}).")
+
+    @staticmethod
+    def _save_auto_grid(grid: Image.Image, p):
+        if webui_images is None or not getattr(shared.opts, "grid_save", False):
+            return
+        try:
+            webui_images.save_image(
+                grid,
+                p.outpath_grids,
+                "grid",
+                extension=shared.opts.grid_format,
+                info=grid.info.get("parameters"),
+                p=p,
+                grid=True,
+                suffix="-menezcale",
+            )
+        except Exception as err:
+            telemetry.warning(f"Não foi possível gravar a grade do downscale automático ({err}).")
 
-        # Reattach metadata for downstream consumers.
-        image.info.update(original_info)
-        return image
+    def _load_last_image(self, generation=None):
+        try:
+            images = self._history.get(self._history.resolve(generation))
+        except Exception as err:
+            telemetry.warning(f"Falha ao carregar imagem do histórico: {err}")
+            return None, None
+        if not images:
+            telemetry.info("Nenhuma imagem gerada anteriormente para carregar.")
+            return None, None
+        img = images[-1]
+        if not is_hires_allowed(img, self._hires_available):
+            telemetry.info("Hires Fix não detectado na imagem; controles bloqueados.")
+            return None, None
+        # A mesma view (sem cópia) vai para as duas saídas.
+        return img, img
@@ -0,0 +1,214 @@
+"""
+Instrumentação do Menezcale: logs com nível, timers por etapa, memória
+por etapa e contadores, com saída opcional em JSON lines.
+
+- Logs: debug/info/warning pelo logger "menezcale" do módulo logging
+  (prefixo [Menezcale] no stdout, como o resto do console do WebUI). O
+  caminho quente (uma linha por imagem) é debug, então o nível padrão
+  `info` já o deixa em silêncio. Nível via set_log_level() ou
+  MENEZCALE_LOG_LEVEL.
+- Etapas: `with stage("resize"):` acumula contagem, tempo total/máximo e,
+  com o rastreamento de memória ligado, o pico de alocação (tracemalloc,
+  vê NumPy mas não os buffers internos do Pillow) e o crescimento do pico
+  de RSS do processo. O pico do tracemalloc é global: ele só é zerado
+  quando nenhuma etapa está aberta (em nenhuma thread), então etapas
+  aninhadas ou simultâneas dividem a mesma janela e o valor de cada uma é
+  um limite superior.
+- Contadores: incr("metadata_cache_hit"), fallbacks etc.
+- set_sink(path) grava cada etapa concluída como uma linha JSON.
+"""
+
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Optional
+
+from menezcale_tiling import peak_rss_bytes
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "silent": 100}
+
+_lock = threading.Lock()
+_level = LEVELS.get(os.environ.get("MENEZCALE_LOG_LEVEL", "info").lower(), LEVELS["info"])
+_stages = {}
+_counters = {}
+_sink_path: Optional[str] = None
+_sink_file = None
+_track_memory = False
+# Etapas abertas com o rastreamento de memória ligado, em todas as threads.
+_memory_stages = 0
+
+logger = logging.getLogger("menezcale")
+if not logger.handlers:
+    _handler = logging.StreamHandler(sys.stdout)
+    _handler.setFormatter(logging.Formatter("[Menezcale] %(message)s"))
+    logger.addHandler(_handler)
+    logger.propagate = False
+logger.setLevel(_level)
+
+
+def set_log_level(level: str) -> None:
+    global _level
+    _level = LEVELS.get(str(level).lower(), LEVELS["info"])
+    logger.setLevel(_level)
+
+
+def get_log_level() -> str:
+    for name, value in LEVELS.items():
+        if value == _level:
+            return name
+    return "info"
+
+
+def is_enabled(level: str) -> bool:
+    return LEVELS[level] >= _level
+
+
+def _emit(level: str, message: str) -> None:
+    if LEVELS[level] >= _level:
+        logger.log(LEVELS[level], message)
+
+
+def debug(message: str) -> None:
+    _emit("debug", message)
+
+
+def info(message: str) -> None:
+    _emit("info", message)
+
+
+def warning(message: str) -> None:
+    _emit("warning", message)
+
+
+def set_memory_tracking(enabled: bool) -> None:
+    """Turn per-stage peak allocation (tracemalloc) on/off; off by default (overhead)."""
+    global _track_memory
+    _track_memory = bool(enabled)
+    if _track_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not _track_memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def set_sink(path: Optional[str]) -> None:
+    """Append one JSON line per finished stage to `path`; None/empty disables."""
+    global _sink_path, _sink_file
+    with _lock:
+        if _sink_file is not None:
+            _sink_file.close()
+            _sink_file = None
+        _sink_path = path or None
+        if _sink_path:
+            try:
+                _sink_file = open(_sink_path, "a", encoding="utf-8", buffering=1)
+            except OSError as err:
+                _sink_path = None
+                _emit("warning", f"Não foi possível abrir {path} para métricas ({err}).")
+
+
+def incr(counter: str, amount: int = 1) -> None:
+    with _lock:
+        _counters[counter] = _counters.get(counter, 0) + amount
+
+
+def _enter_memory_stage() -> int:
+    """Baseline (current traced bytes) for a stage; the peak is reset only by the first open stage."""
+    global _memory_stages
+    with _lock:
+        if not _memory_stages:
+            tracemalloc.reset_peak()
+        _memory_stages += 1
+        current, _ = tracemalloc.get_traced_memory()
+    return current
+
+
+def _exit_memory_stage() -> int:
+    global _memory_stages
+    with _lock:
+        _memory_stages -= 1
+        _, peak = tracemalloc.get_traced_memory()
+    return peak
+
+
+@contextmanager
+def stage(name: str, **fields):
+    track_memory = _track_memory and tracemalloc.is_tracing()
+    if track_memory:
+        start_current = _enter_memory_stage()
+    rss_before = peak_rss_bytes() if track_memory else None
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        record = {"stage": name, "ms": round(elapsed_ms, 3), **fields}
+        if track_memory:
+            peak = _exit_memory_stage()
+            record["peak_alloc_bytes"] = max(0, peak - start_current)
+            rss_after = peak_rss_bytes()
+            if rss_before is not None and rss_after is not None:
+                record["rss_peak_growth_bytes"] = rss_after - rss_before
+
+        with _lock:
+            entry = _stages.setdefault(
+                name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0, "peak_alloc_bytes": 0}
+            )
+            entry["count"] += 1
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+            entry["last_ms"] = elapsed_ms
+            if "peak_alloc_bytes" in record:
+                entry["peak_alloc_bytes"] = max(entry["peak_alloc_bytes"], record["peak_alloc_bytes"])
+            if _sink_file is not None:
+                record["ts"] = time.time()
+                _sink_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def timed(name: str):
+    """Decorator form of stage()."""
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def snapshot() -> dict:
+    """Aggregated stage timings (with mean) and counters since the last reset()."""
+    with _lock:
+        stages = {
+            name: {**entry, "mean_ms": entry["total_ms"] / entry["count"] if entry["count"] else 0.0}
+            for name, entry in _stages.items()
+        }
+        return {"stages": stages, "counters": dict(_counters)}
+
+
+def reset() -> None:
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+
+
+def format_summary() -> str:
+    """Tabela curta por etapa, ordenada pelo tempo total (quem domina a latência)."""
+    data = snapshot()
+    lines = [f"{'etapa':<14} {'n':>6} {'total ms':>10} {'média ms':>9} {'máx ms':>9}"]
+    for name, entry in sorted(data["stages"].items(), key=lambda item: -item[1]["total_ms"]):
+        lines.append(
+            f"{name:<14} {entry['count']:>6} {entry['total_ms']:>10.1f} "
+            f"{entry['mean_ms']:>9.1f} {entry['max_ms']:>9.1f}"
+        )
+    if data["counters"]:
+        lines.append(", ".join(f"{key}={value}" for key, value in sorted(data["counters"].items())))
+    return "\n".join(lines)
@@ -0,0 +1,222 @@
+"""
+Execução em tiles com memória limitada para imagens muito grandes
+(upscales externos de 4x-8x, 8K-16K).
+
+- tiled_resize: faixas horizontais da saída; cada faixa lê só as linhas de
+  origem que o filtro precisa (com margem) e usa `box` do Pillow, então o
+  resultado é o mesmo do resize inteiro, sem emendas.
+- tiled_process: aplica uma função de escala fixa (ex.: FSRCNN) em tiles
+  com sobreposição e mistura as emendas com máscara em rampa.
+
+O tamanho das faixas/tiles vem de um orçamento em bytes, não do tamanho
+da imagem. As estimativas de pico ficam em get_memory_stats().
+"""
+
+import math
+import sys
+import threading
+from typing import Callable, Optional, Tuple
+
+from PIL import Image, ImageChops
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Bytes por pixel na memória do Pillow (RGB é armazenado como 4 bytes).
+_MODE_BYTES = {"1": 1, "L": 1, "P": 1, "I;16": 2, "I;16B": 2, "I;16L": 2}
+# Metade da largura do kernel (em pixels de origem) por filtro do Pillow.
+_FILTER_SUPPORT = {
+    Image.Resampling.NEAREST: 0.5,
+    Image.Resampling.BOX: 0.5,
+    Image.Resampling.BILINEAR: 1.0,
+    Image.Resampling.HAMMING: 1.0,
+    Image.Resampling.BICUBIC: 2.0,
+    Image.Resampling.LANCZOS: 3.0,
+}
+MIN_STRIP_ROWS = 16
+MIN_TILE_SIDE = 64
+MAX_TILE_SIDE = 4096
+
+_stats_lock = threading.Lock()
+_stats = {
+    "resize_peak_bytes": 0,
+    "resize_strips": 0,
+    "process_peak_bytes": 0,
+    "process_tiles": 0,
+}
+
+
+def image_nbytes(image: Image.Image) -> int:
+    return image.width * image.height * _MODE_BYTES.get(image.mode, 4)
+
+
+def size_nbytes(size: Tuple[int, int], mode: str) -> int:
+    return size[0] * size[1] * _MODE_BYTES.get(mode, 4)
+
+
+def _record(**values) -> None:
+    with _stats_lock:
+        _stats.update(values)
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Process peak RSS (ru_maxrss) or None where unavailable."""
+    if resource is None:
+        return None
+    # Linux devolve KiB; macOS devolve bytes.
+    value = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return value if sys.platform == "darwin" else value * 1024
+
+
+def get_memory_stats() -> dict:
+    """
+    Estimated working-set peak of the last tiled resize/process call (bytes,
+    excluding the source image), pieces used and the process peak RSS.
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["process_peak_rss_bytes"] = peak_rss_bytes()
+    return stats
+
+
+def resize_working_bytes(image: Image.Image, size: Tuple[int, int]) -> int:
+    """Extra memory of a plain Image.resize: horizontal pass buffer + output."""
+    return size_nbytes((size[0], image.height), image.mode) + size_nbytes(size, image.mode)
+
+
+def tiled_resize(
+    image: Image.Image,
+    size: Tuple[int, int],
+    resample: int,
+    budget_bytes: int,
+    on_tile: Optional[Callable[[], None]] = None,
+) -> Image.Image:
+    """
+    Image.resize in horizontal output strips. `on_tile` is called before each
+    strip (e.g. a cancellation check; whatever it raises aborts the resize).
+    """
+    src_w, src_h = image.size
+    dst_w, dst_h = size
+    bpp = _MODE_BYTES.get(image.mode, 4)
+    scale_y = src_h / dst_h
+
+    support = _FILTER_SUPPORT.get(resample, 3.0) * max(scale_y, 1.0)
+    margin = int(math.ceil(support)) + 2
+
+    # Cada linha de saída custa scale_y linhas de origem (crop) + buffers horizontais.
+    row_bytes = (scale_y * src_w + 2 * dst_w) * bpp
+    output_bytes = size_nbytes(size, image.mode)
+    strip_rows = int(max(budget_bytes - output_bytes, 0) // max(row_bytes, 1))
+    strip_rows = max(MIN_STRIP_ROWS, min(dst_h, strip_rows))
+
+    result = Image.new(image.mode, size)
+    peak = 0
+    strips = 0
+    for y0 in range(0, dst_h, strip_rows):
+        if on_tile is not None:
+            on_tile()
+        y1 = min(dst_h, y0 + strip_rows)
+        sy0 = y0 * scale_y
+        sy1 = y1 * scale_y
+        cy0 = max(0, int(math.floor(sy0)) - margin)
+        cy1 = min(src_h, int(math.ceil(sy1)) + margin)
+
+        crop = image.crop((0, cy0, src_w, cy1))
+        strip = crop.resize(
+            (dst_w, y1 - y0),
+            resample=resample,
+            box=(0, sy0 - cy0, src_w, sy1 - cy0),
+        )
+        peak = max(
+            peak,
+            image_nbytes(crop) + size_nbytes((dst_w, cy1 - cy0), image.mode) + image_nbytes(strip),
+        )
+        result.paste(strip, (0, y0))
+        del crop, strip
+        strips += 1
+
+    _record(resize_peak_bytes=peak + output_bytes, resize_strips=strips)
+    return result
+
+
+def process_working_bytes(image: Image.Image, scale: int) -> int:
+    """Entrada + saída em float32 RGB, como um modelo de SR costuma manter."""
+    return image.width * image.height * 12 * (1 + scale * scale)
+
+
+def tile_side_for_budget(budget_bytes: int, scale: int) -> int:
+    """Lado do tile de entrada para que process_working_bytes caiba no orçamento."""
+    per_pixel = 12 * (1 + scale * scale)
+    side = int(math.sqrt(max(budget_bytes, 1) / per_pixel))
+    return max(MIN_TILE_SIDE, min(MAX_TILE_SIDE, side))
+
+
+def _feather_mask(size: Tuple[int, int], left: int, top: int) -> Image.Image:
+    width, height = size
+    mask = Image.new("L", size, 255)
+    ramp = Image.linear_gradient("L")  # 256x256, 0 no topo -> 255 embaixo
+    if top > 0:
+        top_ramp = Image.new("L", size, 255)
+        top_ramp.paste(ramp.resize((width, top)), (0, 0))
+        mask = ImageChops.multiply(mask, top_ramp)
+    if left > 0:
+        left_ramp = Image.new("L", size, 255)
+        left_ramp.paste(ramp.transpose(Image.Transpose.TRANSPOSE).resize((left, height)), (0, 0))
+        mask = ImageChops.multiply(mask, left_ramp)
+    return mask
+
+
+def tiled_process(
+    image: Image.Image,
+    fn: Callable[[Image.Image], Optional[Image.Image]],
+    scale: int,
+    tile_side: int,
+    overlap: int = 16,
+    on_tile: Optional[Callable[[], None]] = None,
+) -> Optional[Image.Image]:
+    """
+    Apply `fn` (which must scale its input by exactly `scale`) tile by tile.
+    Overlapping borders are blended with a linear ramp to hide seams.
+    Returns None if `fn` fails on any tile. `on_tile` is called before each
+    tile, as in tiled_resize.
+    """
+    src_w, src_h = image.size
+    overlap = max(0, min(overlap, tile_side // 4))
+    step = max(1, tile_side - overlap)
+    out_overlap = overlap * scale
+
+    result = Image.new(image.mode, (src_w * scale, src_h * scale))
+    peak = 0
+    tiles = 0
+    for y0 in range(0, src_h, step):
+        for x0 in range(0, src_w, step):
+            x1 = min(src_w, x0 + tile_side)
+            y1 = min(src_h, y0 + tile_side)
+            if on_tile is not None:
+                on_tile()
+            tile = image.crop((x0, y0, x1, y1))
+            out_tile = fn(tile)
+            if out_tile is None:
+                return None
+            expected = ((x1 - x0) * scale, (y1 - y0) * scale)
+            if out_tile.size != expected:
+                out_tile = out_tile.resize(expected, Image.Resampling.LANCZOS)
+            if out_tile.mode != result.mode:
+                out_tile = out_tile.convert(result.mode)
+
+            left = out_overlap if x0 > 0 else 0
+            top = out_overlap if y0 > 0 else 0
+            mask = _feather_mask(out_tile.size, left, top) if (left or top) else None
+            result.paste(out_tile, (x0 * scale, y0 * scale), mask)
+
+            peak = max(peak, image_nbytes(tile) + 2 * image_nbytes(out_tile))
+            tiles += 1
+            if x1 >= src_w:
+                break
+        if y1 >= src_h:
+            break
+
+    _record(process_peak_bytes=peak + image_nbytes(result), process_tiles=tiles)
+    return result
@@ -0,0 +1,13 @@
+"""
+Configuração comum dos testes: scripts/ e o stand-in de `modules` de
+benchmarks/stubs no sys.path, como nos benchmarks.
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Stubs primeiro: nunca usar um `modules` real que esteja no sys.path.
+for path in (os.path.join(ROOT, "benchmarks", "stubs"), os.path.join(ROOT, "scripts")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,132 @@
+"""
+Rotas /menezcale/v1 com o TestClient do FastAPI, fora do WebUI: `modules`
+vem de benchmarks/stubs, como nos benchmarks.
+
+    python -m pytest tests
+"""
+
+import base64
+import io
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Stubs primeiro: nunca usar um `modules` real que esteja no sys.path.
+sys.path.insert(0, os.path.join(ROOT, "benchmarks", "stubs"))
+sys.path.insert(0, os.path.join(ROOT, "scripts"))
+
+pytest.importorskip("httpx")
+fastapi = pytest.importorskip("fastapi")
+from fastapi.testclient import TestClient  # noqa: E402
+from PIL import Image  # noqa: E402
+from PIL.PngImagePlugin import PngInfo  # noqa: E402
+from modules import shared  # noqa: E402
+
+import menezcale_api  # noqa: E402
+
+PARAMETERS = "a cat\nSteps: 20, Sampler: Euler, Size: 64x48, Hires upscale: 2, Hires upscaler: Latent"
+
+
+@pytest.fixture
+def cmd_opts(monkeypatch):
+    monkeypatch.setattr(shared.cmd_opts, "api", True)
+    monkeypatch.setattr(shared.cmd_opts, "nowebui", False)
+    monkeypatch.setattr(shared.cmd_opts, "api_auth", None)
+    return shared.cmd_opts
+
+
+def _client() -> TestClient:
+    app = fastapi.FastAPI()
+    menezcale_api.register(app)
+    return TestClient(app)
+
+
+def _png_b64(size=(128, 96)) -> str:
+    image = Image.new("RGB", size, (200, 120, 40))
+    buffer = io.BytesIO()
+    info = PngInfo()
+    info.add_text("parameters", PARAMETERS)
+    image.save(buffer, format="PNG", pnginfo=info)
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def test_routes_need_webui_api(cmd_opts):
+    cmd_opts.api = False
+    assert _client().get(f"{menezcale_api.ROUTE_PREFIX}/methods").status_code == 404
+
+    cmd_opts.nowebui = True
+    assert _client().get(f"{menezcale_api.ROUTE_PREFIX}/methods").status_code == 200
+
+
+def test_register_once_per_app(cmd_opts):
+    app = fastapi.FastAPI()
+    menezcale_api.register(app)
+    menezcale_api.register(app)
+    paths = [route.path for route in app.routes if route.path.startswith(menezcale_api.ROUTE_PREFIX)]
+    assert len(paths) == len(set(paths)) == 2
+
+
+def test_api_auth(cmd_opts):
+    cmd_opts.api_auth = "alice:s3cret:x, bob:hunter2"
+    client = _client()
+    url = f"{menezcale_api.ROUTE_PREFIX}/methods"
+
+    assert client.get(url).status_code == 401
+    assert client.get(url, auth=("alice", "wrong")).status_code == 401
+    assert client.get(url, auth=("carol", "hunter2")).status_code == 401
+    assert client.get(url, auth=("alice", "s3cret:x")).status_code == 200
+    response = client.post(f"{menezcale_api.ROUTE_PREFIX}/downscale", json={"images": [_png_b64()]})
+    assert response.status_code == 401
+
+
+def test_downscale_streams_one_line_per_image(cmd_opts):
+    response = _client().post(
+        f"{menezcale_api.ROUTE_PREFIX}/downscale",
+        json={"images": [_png_b64(), _png_b64()], "down_method": "Bicubic", "timeout_s": 0},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    rows, summary = lines[:-1], lines[-1]
+
+    assert summary["done"] is True
+    assert sorted(row["index"] for row in rows) == [0, 1]
+    for row in rows:
+        assert row["status"] == "processed"
+        image = Image.open(io.BytesIO(base64.b64decode(row["image"])))
+        assert image.size == (64, 48)
+
+
+def test_downscale_requires_input(cmd_opts):
+    response = _client().post(f"{menezcale_api.ROUTE_PREFIX}/downscale", json={})
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("factor,size", [(0.5, (64, 48)), (0.25, (32, 24))])
+def test_downscale_manual_factor(cmd_opts, factor, size):
+    response = _client().post(
+        f"{menezcale_api.ROUTE_PREFIX}/downscale",
+        json={
+            "images": [_png_b64()],
+            "down_method": "Bicubic",
+            "use_manual_down": True,
+            "use_auto_original": False,
+            "down_factor": factor,
+            "timeout_s": 0,
+        },
+    )
+    row = json.loads(response.text.splitlines()[0])
+    assert row["status"] == "processed"
+    assert Image.open(io.BytesIO(base64.b64decode(row["image"]))).size == size
+
+
+@pytest.mark.parametrize("factor", [0, 1.5, 2.0])
+def test_downscale_rejects_factor_outside_slider_range(cmd_opts, factor):
+    response = _client().post(
+        f"{menezcale_api.ROUTE_PREFIX}/downscale",
+        json={"images": [_png_b64()], "use_manual_down": True, "down_factor": factor},
+    )
+    assert response.status_code == 422
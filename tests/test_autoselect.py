@@ -0,0 +1,58 @@
+"""
+Modelo de custo do método Auto (menezcale_autoselect): ajuste da
+calibração e cache do ambiente.
+"""
+
+import pytest
+
+import menezcale_autoselect
+import menezcale_core
+from modules import shared
+
+
+def _samples(per_source, per_output, sides=(512, 1024), factors=(2, 4)):
+    samples = []
+    for side in sides:
+        source_mp = side * side / 1e6
+        for factor in factors:
+            output_mp = source_mp / factor**2
+            samples.append((source_mp, output_mp, per_source * source_mp + per_output * output_mp))
+    return samples
+
+
+def test_fit_separates_source_and_output_cost():
+    cost = menezcale_autoselect._fit(_samples(12.0, 30.0))
+    assert cost["ms_per_source_mp"] == pytest.approx(12.0)
+    assert cost["ms_per_output_mp"] == pytest.approx(30.0)
+
+
+def test_fit_rejects_zero_source_cost():
+    # Custo que só cresce com a saída: o ajuste daria 0 ms/MP de origem.
+    cost = menezcale_autoselect._fit(_samples(0.0, 40.0))
+    assert cost["ms_per_source_mp"] > 0
+    assert cost["ms_per_output_mp"] == 0.0
+
+
+def test_fit_with_one_source_size_is_not_degenerate():
+    cost = menezcale_autoselect._fit(_samples(12.0, 30.0, sides=(1024,)))
+    assert cost["ms_per_source_mp"] > 0
+
+
+def test_environment_is_cached_per_engine(monkeypatch):
+    calls = []
+    monkeypatch.setattr(menezcale_core, "find_fsrcnn_upscaler", lambda: calls.append(1))
+    monkeypatch.setattr(shared.opts, "menezcale_resample_engine", "Pillow", raising=False)
+    menezcale_autoselect.invalidate_environment()
+
+    first = menezcale_autoselect._environment()
+    assert menezcale_autoselect._environment() is first
+    assert len(calls) == 1
+
+    monkeypatch.setattr(shared.opts, "menezcale_resample_engine", "NumPy")
+    assert menezcale_autoselect._environment()["engine"] == "NumPy"
+    assert len(calls) == 2
+
+    menezcale_core.reset_fsrcnn_cache()
+    menezcale_autoselect._environment()
+    assert len(calls) == 3
+    menezcale_autoselect.invalidate_environment()
@@ -0,0 +1,56 @@
+"""
+Backends de reamostragem (menezcale_backends) e a escolha deles no
+menezcale_core.
+"""
+
+import pytest
+from PIL import Image
+
+import menezcale_backends
+import menezcale_core
+from modules import shared
+
+LANCZOS = menezcale_core.DOWNSCALE_METHODS[0]
+
+
+def test_interface_is_abstract():
+    with pytest.raises(TypeError):
+        menezcale_backends.ResampleBackend()
+
+    class Partial(menezcale_backends.ResampleBackend):
+        name = "partial"
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_setting_choices():
+    assert menezcale_backends.names() == ["Pillow", "NumPy"]
+    assert menezcale_backends.get("numpy") is menezcale_backends.BACKENDS["NumPy"]
+    assert menezcale_backends.get("torch") is None
+
+
+@pytest.mark.parametrize("engine,expected", [("Pillow", "Pillow"), ("NumPy", "NumPy"), ("Torch (CPU)", "Pillow")])
+def test_resample_backend_falls_back_to_pillow(monkeypatch, engine, expected):
+    monkeypatch.setattr(shared.opts, "menezcale_resample_engine", engine, raising=False)
+    assert menezcale_core.resample_backend(LANCZOS).name == expected
+    # FSRCNN/Progressivo não são métodos de backend.
+    assert menezcale_core.resample_backend(menezcale_core.DOWNSCALE_METHODS[1]) is menezcale_backends.DEFAULT
+
+
+def test_pillow_goes_through_backend(monkeypatch):
+    monkeypatch.setattr(shared.opts, "menezcale_resample_engine", "Pillow", raising=False)
+    calls = []
+    backend = menezcale_backends.DEFAULT
+    original = backend.resize_stack
+
+    def spy(images, size, down_method):
+        calls.append((len(images), size))
+        return original(images, size, down_method)
+
+    monkeypatch.setattr(backend, "resize_stack", spy)
+    image = Image.new("RGB", (128, 96), (10, 200, 90))
+    result = menezcale_core.apply_downscale(image, LANCZOS, (64, 48), {})
+
+    assert calls == [(1, (64, 48))]
+    assert result.tobytes() == image.resize((64, 48), Image.Resampling.LANCZOS).tobytes()
@@ -0,0 +1,88 @@
+"""
+Cancelamento e prazo por job (menezcale_cancel) no apply_downscale e no
+cache de resultados do painel.
+"""
+
+import time
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import menezcale_cancel
+from menezcale_cancel import JobCancelled
+from menezcale_core import DOWNSCALE_METHODS, apply_downscale
+from menezcale_result_cache import results as result_cache
+from menezcale_script import MenezcaleScript
+
+LANCZOS = DOWNSCALE_METHODS[0]
+PARAMETERS = "a cat\nSteps: 20, Sampler: Euler, Size: 64x48, Hires upscale: 2, Hires upscaler: Latent"
+
+
+def _image():
+    rng = np.random.default_rng(5)
+    image = Image.fromarray(rng.integers(0, 256, (96, 128, 3), dtype=np.uint8))
+    image.info["parameters"] = PARAMETERS
+    return image
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    result_cache.clear()
+    yield
+    result_cache.clear()
+
+
+def test_cancelled_job_raises():
+    with menezcale_cancel.job() as state:
+        state.cancel()
+        with pytest.raises(JobCancelled):
+            apply_downscale(_image(), LANCZOS, (64, 48), {})
+
+
+def test_cancel_all_stops_running_jobs_only():
+    with menezcale_cancel.job():
+        menezcale_cancel.cancel_all()
+        with pytest.raises(JobCancelled):
+            menezcale_cancel.check()
+    with menezcale_cancel.job():
+        menezcale_cancel.check()
+
+
+def test_run_job_returns_sentinel_when_cancelled():
+    cancelled = object()
+
+    def work():
+        menezcale_cancel.current().cancel()
+        menezcale_cancel.check()
+
+    assert MenezcaleScript._run_job(work, cancelled) is cancelled
+
+
+def test_past_deadline_falls_back_to_bicubic():
+    image = _image()
+    with menezcale_cancel.job(1e-6) as state:
+        time.sleep(0.001)  # prazo já vencido antes do primeiro check()
+        result = apply_downscale(image, LANCZOS, (64, 48), {})
+
+    assert state.degraded
+    expected = image.resize((64, 48), Image.Resampling.BICUBIC)
+    assert np.array_equal(np.asarray(result), np.asarray(expected))
+
+
+def test_degraded_result_is_not_cached():
+    script = MenezcaleScript()
+    image = _image()
+
+    with menezcale_cancel.job(1e-6) as state:
+        time.sleep(0.001)  # prazo já vencido antes do primeiro check()
+        degraded = script._render_full(image, LANCZOS, 1.0, False, True, 0, 0)
+    assert state.degraded and degraded.size == (64, 48)
+    assert result_cache.stats()["entries"] == 0
+
+    with menezcale_cancel.job() as state:
+        full = script._render_full(image, LANCZOS, 1.0, False, True, 0, 0)
+    assert not state.degraded
+    assert result_cache.stats()["entries"] == 1
+    expected = image.resize((64, 48), Image.Resampling.LANCZOS)
+    assert np.array_equal(np.asarray(full), np.asarray(expected))
@@ -0,0 +1,38 @@
+"""
+Comparação de métodos (menezcale_compare): rótulos quando o FSRCNN não
+tem modelo e cai no Lanczos.
+"""
+
+import pytest
+from PIL import Image
+
+import menezcale_compare
+import menezcale_core
+
+FSRCNN = menezcale_core.DOWNSCALE_METHODS[1]
+
+
+@pytest.fixture
+def no_fsrcnn(monkeypatch):
+    monkeypatch.setattr(menezcale_compare, "get_fsrcnn_model", lambda: (None, None))
+
+
+def test_fsrcnn_listed_with_model():
+    assert FSRCNN in menezcale_compare.comparable_methods()
+    assert menezcale_compare.label(FSRCNN) == "FSRCNN"
+
+
+def test_fsrcnn_dropped_without_model(no_fsrcnn):
+    methods = menezcale_compare.comparable_methods()
+    assert FSRCNN not in methods
+    assert methods and not any(menezcale_core.is_auto_method(method) for method in methods)
+
+
+def test_fsrcnn_fallback_is_labelled(no_fsrcnn):
+    image = Image.new("RGB", (64, 48), (90, 160, 30))
+    results = menezcale_compare.run_methods(image, (32, 24), {}, methods=[FSRCNN, menezcale_core.DOWNSCALE_METHODS[0]])
+
+    table = menezcale_compare.timing_table(results, image.size, (32, 24), 1.0)
+    assert "| FSRCNN→Lanczos |" in table
+    assert "| Lanczos |" in table
+    assert menezcale_compare.grid(results).width > 0
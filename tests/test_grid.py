@@ -0,0 +1,91 @@
+"""
+Grade do batch (menezcale_pipeline): find_grid, split_grid e rebuild_grid
+sobre grades montadas como o image_grid do WebUI.
+"""
+
+import numpy as np
+from PIL import Image
+
+from menezcale_pipeline import GRID_INFO_KEY, find_grid, rebuild_grid, split_grid
+
+CELL = (64, 48)
+
+
+def _batch(count, size=CELL):
+    return [Image.new("RGB", size, (30 * index, 255 - 20 * index, 90)) for index in range(count)]
+
+
+def _grid(images, columns, margin=0):
+    """Like modules.images.image_grid: row-major cells, black padding and margins."""
+    width, height = images[0].size
+    rows = -(-len(images) // columns)
+    grid = Image.new("RGB", (columns * width + (columns - 1) * margin, rows * height + (rows - 1) * margin))
+    for position, image in enumerate(images):
+        grid.paste(image, ((position % columns) * (width + margin), (position // columns) * (height + margin)))
+    grid.info = {"parameters": "grid"}
+    return grid
+
+
+def _same(a, b):
+    return a.size == b.size and np.array_equal(np.asarray(a), np.asarray(b))
+
+
+def test_split_and_rebuild_3x3_grid():
+    batch = _batch(9)
+    grid, images = split_grid([_grid(batch, 3)] + batch)
+
+    assert grid is not None and grid.size == (3 * CELL[0], 3 * CELL[1])
+    assert [id(image) for image in images] == [id(image) for image in batch]
+
+    results = [image.resize((32, 24), Image.Resampling.NEAREST) for image in images]
+    rebuilt = rebuild_grid(results, grid, CELL)
+    assert _same(rebuilt, _grid(results, 3))
+    assert rebuilt.info == {"parameters": "grid"}
+
+
+def test_non_square_batch_keeps_padding_cell():
+    batch = _batch(5)
+    images = [_grid(batch, 3)] + batch
+    assert find_grid(images) == 0
+
+    grid, individual = split_grid(images)
+    results = [image.resize((32, 24), Image.Resampling.NEAREST) for image in individual]
+    rebuilt = rebuild_grid(results, grid, CELL)
+    assert rebuilt.size == (3 * 32, 2 * 24)
+    assert _same(rebuilt, _grid(results, 3))
+    # Sexta célula: preenchimento, continua preta.
+    assert rebuilt.crop((64, 24, 96, 48)).getextrema() == ((0, 0), (0, 0), (0, 0))
+
+
+def test_grid_with_margins_needs_index_of_first_image():
+    batch = _batch(4)
+    grid = _grid(batch, 2, margin=4)
+    images = [grid] + batch
+
+    # Com margem a grade não é múltiplo exato da célula: só o index_of_first_image a identifica.
+    assert find_grid(images) is None
+    assert find_grid(images, index_of_first_image=1) == 0
+    found, individual = split_grid(images, index_of_first_image=1)
+    assert found is grid and len(individual) == 4
+
+    rebuilt = rebuild_grid(individual, grid, CELL)
+    assert _same(rebuilt, _grid(batch, 2))
+
+
+def test_marker_wins_and_is_dropped_on_rebuild():
+    batch = _batch(3)
+    grid = _grid(batch, 3)
+    grid.info[GRID_INFO_KEY] = True
+    images = batch[:2] + [grid] + batch[2:]
+
+    assert find_grid(images) == 2
+    found, individual = split_grid(images)
+    assert found is grid and individual == batch
+    assert GRID_INFO_KEY not in rebuild_grid(individual, grid, CELL).info
+
+
+def test_batch_without_grid():
+    batch = _batch(2)
+    assert find_grid(batch) is None
+    assert split_grid(batch) == (None, batch)
+    assert find_grid(_batch(3)) is None
@@ -0,0 +1,105 @@
+"""
+Leitura dos `parameters` do WebUI (menezcale_core.read_image_metadata) e a
+detecção do tamanho original que depende dela.
+"""
+
+import pytest
+from PIL import Image
+
+import menezcale_core
+from menezcale_core import detect_original_size, hires_from_info, read_image_metadata
+
+HIRES = (
+    'masterpiece, 1girl, "red dress, long hair", Size: large\n'
+    "Negative prompt: lowres, bad anatomy, Width: 64\n"
+    "Steps: 28, Sampler: DPM++ 2M Karras, CFG scale: 7, Seed: 1234, Size: 512x768, "
+    "Model hash: 6ce0161689, Model: v1-5-pruned-emaonly, Denoising strength: 0.45, "
+    'Hires upscale: 2, Hires steps: 15, Hires upscaler: 4x-UltraSharp, '
+    'Lora hashes: "detail: 1a2b3c4d, style: 5e6f7a8b", TI hashes: "easynegative: c74b4e810b03", '
+    "Version: v1.9.4"
+)
+NO_HIRES = (
+    "a photo of a cat on a sofa\n"
+    "Negative prompt: blurry\n"
+    "Steps: 20, Sampler: Euler a, CFG scale: 7, Seed: 42, Size: 832x1216, "
+    "Model hash: 31e35c80fc, Model: sd_xl_base_1.0, Version: f2.0.1v1.10.1"
+)
+NO_NEGATIVE = (
+    "landscape, mountains, sunset\n"
+    "Steps: 25, Sampler: DPM++ SDE, CFG scale: 6, Seed: 7, Size: 640x448, "
+    "Denoising strength: 0.5, Hires resize: 1280x896, Hires upscaler: Latent, Version: v1.7.0"
+)
+WIDTH_HEIGHT = "portrait\nSteps: 20, Seed: 1, Width: 576, Height: 1024, Hires upscale: 1.5"
+
+
+@pytest.fixture(autouse=True)
+def fresh_parser(monkeypatch):
+    # Sem sd-parsers: só o regex, igual em toda máquina.
+    monkeypatch.setattr(menezcale_core, "get_sd_parsers", lambda: None)
+    menezcale_core._metadata_cache.clear()
+    yield
+    menezcale_core._metadata_cache.clear()
+
+
+def test_hires_with_size_and_quoted_commas():
+    record = read_image_metadata({"parameters": HIRES})
+    assert record.base_size == (512, 768)
+    assert record.base_source == "Size"
+    assert record.hires is True
+    assert record.hires_scale == 2.0
+    assert record.hires_resize is None
+
+
+def test_without_hires():
+    record = read_image_metadata({"parameters": NO_HIRES})
+    assert record.base_size == (832, 1216)
+    assert record.hires is False
+    assert record.hires_scale is None
+    assert hires_from_info({"parameters": NO_HIRES}) is False
+
+
+def test_missing_negative_prompt_and_hires_resize():
+    record = read_image_metadata({"parameters": NO_NEGATIVE})
+    assert record.base_size == (640, 448)
+    assert record.hires is True
+    assert record.hires_resize == (1280, 896)
+
+
+def test_width_height_pair_wins_over_size():
+    record = read_image_metadata({"parameters": WIDTH_HEIGHT + ", Size: 1x1"})
+    assert record.base_size == (576, 1024)
+    assert record.base_source == "regex"
+    assert record.hires_scale == 1.5
+
+
+def test_non_numeric_and_unpaired_values_are_ignored():
+    record = read_image_metadata({"parameters": "Size: large, Width: 64, Steps: 20, Height: 32"})
+    assert record.base_size is None
+    assert record.hires is False
+
+
+def test_menezcale_keys_and_cache():
+    info = {"parameters": NO_HIRES, "menezcale_base_width": "416", "menezcale_base_height": "608",
+            "menezcale_hires_enabled": "true"}
+    record = read_image_metadata(info)
+    assert record.menezcale_base == (416, 608)
+    assert record.menezcale_hires is True
+    assert read_image_metadata(dict(info)) is record
+    assert read_image_metadata({"parameters": NO_HIRES}) is not record
+
+
+@pytest.mark.parametrize(
+    "parameters, expected",
+    [(HIRES, (512, 768)), (NO_HIRES, (832, 1216)), (NO_NEGATIVE, (640, 448)), (WIDTH_HEIGHT, (576, 1024))],
+)
+def test_detect_original_size(parameters, expected):
+    image = Image.new("RGB", (expected[0] * 2, expected[1] * 2))
+    image.info["parameters"] = parameters
+    assert detect_original_size(None, image, True, 0, 0) == expected
+
+
+def test_detect_original_size_manual():
+    image = Image.new("RGB", (64, 64))
+    image.info["parameters"] = HIRES
+    assert detect_original_size(None, image, False, 300, 200) == (300, 200)
+    assert detect_original_size(None, image, False, 0, 0) is None
@@ -0,0 +1,49 @@
+"""
+Backend de processos (menezcale_procpool): os workers não têm shared.opts,
+então os ajustes do processo principal precisam chegar neles.
+"""
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import menezcale_core
+import menezcale_procpool
+import menezcale_resample
+from modules import shared
+
+LANCZOS = menezcale_core.DOWNSCALE_METHODS[0]
+
+
+@pytest.fixture
+def pool_opts(monkeypatch):
+    yield monkeypatch
+    menezcale_procpool.shutdown_pool()
+
+
+def _images(count=2, size=(301, 203)):
+    rng = np.random.default_rng(3)
+    return [Image.fromarray(rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8)) for _ in range(count)]
+
+
+def test_worker_opts_ships_only_set_values(monkeypatch):
+    monkeypatch.setattr(shared.opts, "menezcale_resample_engine", "NumPy", raising=False)
+    monkeypatch.setattr(shared.opts, "menezcale_tile_mode", None, raising=False)
+    opts = menezcale_core.worker_opts()
+    assert opts["menezcale_resample_engine"] == "NumPy"
+    assert "menezcale_tile_mode" not in opts
+    assert set(opts) <= set(menezcale_core.WORKER_OPTS)
+
+
+def test_process_workers_use_main_process_engine(pool_opts):
+    pool_opts.setattr(shared.opts, "menezcale_resample_engine", "NumPy", raising=False)
+    images = _images()
+    target = (97, 61)
+    results = menezcale_core._apply_downscale_processes(images, LANCZOS, [target] * 2, [{}, {}], max_workers=1)
+
+    expected = menezcale_resample.resize_stack(images, target, "Lanczos")
+    pillow = [image.resize(target, Image.LANCZOS) for image in images]
+    for result, numpy_result, pillow_result in zip(results, expected, pillow):
+        assert np.array_equal(np.asarray(result), np.asarray(numpy_result))
+    # Com o padrão do worker (Pillow) a saída seria outra.
+    assert any(not np.array_equal(np.asarray(r), np.asarray(p)) for r, p in zip(results, pillow))
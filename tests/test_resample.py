@@ -0,0 +1,70 @@
+"""
+Motor NumPy (menezcale_resample.resize_stack) contra o Image.resize do Pillow.
+"""
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import menezcale_resample
+
+FILTERS = {"Lanczos": Image.LANCZOS, "Bicubic": Image.BICUBIC}
+# (origem, destino): fator não inteiro, só um eixo, 4x e tamanhos ímpares.
+SIZES = [
+    ((257, 193), (128, 96)),
+    ((256, 256), (256, 100)),
+    ((640, 480), (160, 120)),
+    ((301, 203), (97, 61)),
+]
+
+
+def _stack(mode, size, count=3, seed=0):
+    rng = np.random.default_rng(seed)
+    channels = len(Image.new(mode, (1, 1)).getbands())
+    shape = (size[1], size[0]) if channels == 1 else (size[1], size[0], channels)
+    images = []
+    for _ in range(count):
+        pixels = rng.integers(0, 256, shape, dtype=np.uint8)
+        if mode == "RGBA":
+            # Alpha baixo é onde o pré-multiplicado amplifica qualquer erro.
+            pixels[..., 3] = rng.choice([0, 1, 3, 50, 128, 255], shape[:2])
+        images.append(Image.fromarray(pixels, mode))
+    return images
+
+
+@pytest.mark.parametrize("mode", ["L", "RGB", "RGBA"])
+@pytest.mark.parametrize("method", sorted(FILTERS))
+@pytest.mark.parametrize("src,dst", SIZES)
+def test_resize_stack_matches_pillow(mode, method, src, dst):
+    images = _stack(mode, src)
+    results = menezcale_resample.resize_stack(images, dst, method)
+
+    assert len(results) == len(images)
+    for image, result in zip(images, results):
+        expected = image.resize(dst, FILTERS[method])
+        assert result.mode == mode and result.size == dst
+        diff = np.abs(np.asarray(result, dtype=np.int16) - np.asarray(expected, dtype=np.int16))
+        assert diff.max() <= 1
+
+
+def test_resize_stack_splits_blocks_like_one_pass():
+    images = _stack("RGB", (200, 150), count=4)
+    whole = menezcale_resample.resize_stack(images, (64, 48), "Lanczos")
+    per_image = 200 * 150 * 3 * 4
+    split = menezcale_resample.resize_stack(images, (64, 48), "Lanczos", max_stack_bytes=per_image)
+    for a, b in zip(whole, split):
+        assert np.array_equal(np.asarray(a), np.asarray(b))
+
+
+def test_resize_stack_same_size_is_copy():
+    images = _stack("RGBA", (64, 48), count=2)
+    results = menezcale_resample.resize_stack(images, (64, 48), "Bicubic")
+    for image, result in zip(images, results):
+        assert result is not image
+        assert np.array_equal(np.asarray(result), np.asarray(image))
+
+
+def test_resize_stack_rejects_mixed_sizes():
+    images = [Image.new("RGB", (32, 32)), Image.new("RGB", (16, 16))]
+    with pytest.raises(ValueError):
+        menezcale_resample.resize_stack(images, (8, 8), "Lanczos")